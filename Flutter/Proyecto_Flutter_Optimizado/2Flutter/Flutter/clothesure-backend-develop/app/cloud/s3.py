@@ -1,12 +1,47 @@
 import boto3
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Sequence, Tuple
 from fastapi import UploadFile
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError, ClientError
 
+logger = logging.getLogger(__name__)
+
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 S3_BUCKET = os.getenv("AWS_S3_BUCKET")
+# Permite apuntar a MinIO u otro S3 local
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+
+# Subidas simultáneas en todo el proceso (todas las peticiones comparten el pool)
+S3_UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", 8))
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", 8))
+S3_MULTIPART_CHUNK_MB = int(os.getenv("S3_MULTIPART_CHUNK_MB", 8))
+S3_MULTIPART_CONCURRENCY = int(os.getenv("S3_MULTIPART_CONCURRENCY", 4))
+
+MB = 1024 * 1024
+
+# Cliente único: es thread-safe y reutiliza su pool de conexiones HTTP, que se
+# dimensiona para las subidas en paralelo y las partes de cada multipart
+s3_client = boto3.client(
+    "s3",
+    endpoint_url=S3_ENDPOINT_URL,
+    config=Config(
+        max_pool_connections=S3_UPLOAD_WORKERS * S3_MULTIPART_CONCURRENCY,
+        retries={"max_attempts": 5, "mode": "adaptive"},
+    ),
+)
+
+transfer_config = TransferConfig(
+    multipart_threshold=S3_MULTIPART_THRESHOLD_MB * MB,
+    multipart_chunksize=S3_MULTIPART_CHUNK_MB * MB,
+    max_concurrency=S3_MULTIPART_CONCURRENCY,
+    use_threads=True,
+)
 
-s3_client = boto3.client("s3")
+upload_executor = ThreadPoolExecutor(max_workers=S3_UPLOAD_WORKERS, thread_name_prefix="s3-upload")
 
 #mover a s3service
 def upload_file_to_s3(file: UploadFile, key: str, content_type: str = "image/jpeg") -> str:
@@ -18,7 +53,8 @@ def upload_file_to_s3(file: UploadFile, key: str, content_type: str = "image/jpe
             ExtraArgs={
             "ACL": "public-read",  
             "ContentType": content_type
-        }
+        },
+            Config=transfer_config
         )
 
         return f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{key}"
@@ -36,9 +72,13 @@ def delete_file_from_s3(object_key: str) -> bool:
         print(f"Error deleting file from S3: {e}")
         return False
 
+def key_from_url(url: str) -> str:
+    """Key de S3 a partir de la URL pública guardada en la base de datos."""
+    return url.split(".amazonaws.com/")[1]
+
 class S3Service:
     def __init__(self):
-        self.s3 = boto3.client("s3")
+        self.s3 = s3_client
         self.bucket_name = S3_BUCKET
 
     def create_album_folder(self, event_id: int, album_id: int):
@@ -54,10 +94,45 @@ class S3Service:
     def upload_photo(self, file, file_key):
         #Sube una foto a S3 y retorna la URL.
         try:
-            self.s3.upload_fileobj(file.file, self.bucket_name, file_key, ExtraArgs={"ACL": "public-read", "ContentType": file.content_type})
+            self.s3.upload_fileobj(file.file, self.bucket_name, file_key, ExtraArgs={"ACL": "public-read", "ContentType": file.content_type}, Config=transfer_config)
             return f"https://{self.bucket_name}.s3.amazonaws.com/{file_key}"
         except ClientError as e:
             raise Exception(f"Error subiendo foto: {str(e)}")    
+
+    def upload_photos(self, uploads: Sequence[Tuple[UploadFile, str]]) -> List[str]:
+        """
+        Sube varias fotos en paralelo en el pool compartido y retorna sus URLs
+        en el mismo orden. Si alguna falla, borra las que sí se subieron y
+        relanza el primer error: no quedan objetos huérfanos.
+        """
+        futures = [upload_executor.submit(self.upload_photo, file, key) for file, key in uploads]
+        wait(futures)
+
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            uploaded = [key for (_, key), future in zip(uploads, futures) if future.exception() is None]
+            self.delete_files(uploaded)
+            raise errors[0]
+        return [future.result() for future in futures]
+
+    def delete_files(self, object_keys: Sequence[str]) -> bool:
+        """Borra varios objetos con DeleteObjects (hasta 1000 keys por llamada)."""
+        ok = True
+        keys = list(object_keys)
+        for start in range(0, len(keys), 1000):
+            batch = keys[start:start + 1000]
+            try:
+                response = self.s3.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+                )
+                for error in response.get("Errors", []):
+                    ok = False
+                    logger.error(f"❌ Error borrando {error.get('Key')} de S3: {error.get('Message')}")
+            except Exception as e:
+                ok = False
+                logger.error(f"❌ Error borrando {len(batch)} objetos de S3: {e}")
+        return ok
         
     def delete_file_from_s3(self, object_key: str) -> bool:
         try:
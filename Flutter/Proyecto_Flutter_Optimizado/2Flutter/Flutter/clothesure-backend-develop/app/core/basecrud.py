@@ -1,9 +1,11 @@
-from typing import TypeVar, Generic, Type, List, Optional, Any
+from typing import TypeVar, Generic, Type, List, Optional, Any, Dict, Iterable, Iterator, Sequence
 
-from sqlalchemy import BinaryExpression
+from sqlalchemy import BinaryExpression, insert, inspect, select, update
 from sqlalchemy.orm import Session, InstrumentedAttribute
 from sqlalchemy.exc import NoResultFound
 
+from app.core.db import commit_or_flush, in_unit_of_work
+
 ModelType = TypeVar("ModelType")
 
 class BaseCRUD(Generic[ModelType]):
@@ -20,25 +22,80 @@ class BaseCRUD(Generic[ModelType]):
     def get_all(self) -> List[ModelType]:
         return self.db.query(self.model).all()
 
+    def get_many(self, values: Iterable[Any], column: Optional[InstrumentedAttribute] = None) -> List[ModelType]:
+        """Registros cuyo `column` (por defecto la clave primaria) está en `values`, en una sola consulta IN."""
+        values = list(dict.fromkeys(values))
+        if not values:
+            return []
+        column = column if column is not None else inspect(self.model).primary_key[0]
+        return list(self.db.scalars(select(self.model).where(column.in_(values))))
+
+    def iter_all(self, *conditions: BinaryExpression, chunk_size: int = 1000) -> Iterator[ModelType]:
+        """
+        Recorre la tabla (filtrada por `conditions`) de `chunk_size` en
+        `chunk_size` filas sin cargarla entera: yield_per usa un cursor del
+        lado del servidor en Postgres. No hacer commit dentro del recorrido,
+        cierra el cursor.
+        """
+        stmt = select(self.model).where(*conditions).execution_options(yield_per=chunk_size)
+        yield from self.db.scalars(stmt)
+
     def create(self, obj_in: ModelType) -> ModelType:
         self.db.add(obj_in)
-        self.db.commit()
-        self.db.refresh(obj_in)
+        commit_or_flush(self.db, obj_in)
         return obj_in
 
+    def bulk_create(self, rows: Sequence[Dict[str, Any]], returning: bool = True, commit: bool = True) -> List[ModelType]:
+        """
+        Inserta todas las filas con INSERT multi-fila. Con returning=True
+        devuelve los objetos creados (con id y defaults del servidor) por
+        INSERT ... RETURNING, sin un refresh por fila. Dentro de una unidad
+        de trabajo no hace commit aunque commit=True.
+        """
+        if not rows:
+            return []
+        stmt = insert(self.model)
+        if returning:
+            created = list(self.db.scalars(stmt.returning(self.model), list(rows)))
+        else:
+            self.db.execute(stmt, list(rows))
+            created = []
+        if commit and not in_unit_of_work(self.db):
+            self._commit_keeping_loaded()
+        return created
+
     def update(self, db_obj: ModelType, obj_in: dict) -> ModelType:
         for field, value in obj_in.items():
             setattr(db_obj, field, value)
-        self.db.commit()
-        self.db.refresh(db_obj)
+        commit_or_flush(self.db, db_obj)
         return db_obj
 
+    def bulk_update(self, rows: Sequence[Dict[str, Any]], commit: bool = True) -> int:
+        """
+        UPDATE por clave primaria desde una lista de dicts (cada uno con la
+        clave primaria y las columnas a cambiar), en un executemany.
+        """
+        if not rows:
+            return 0
+        self.db.execute(update(self.model), list(rows))
+        if commit and not in_unit_of_work(self.db):
+            self.db.commit()
+        return len(rows)
+
     def delete(self, value: Any, column: InstrumentedAttribute) -> bool:
         obj = self.get(value, column)
         if obj:
             self.db.delete(obj)
-            self.db.commit()
+            commit_or_flush(self.db)
             return True
         return False
 
-
+    def _commit_keeping_loaded(self) -> None:
+        # Lo devuelto por RETURNING ya está al día: sin expirar en el commit,
+        # leer los objetos creados no dispara un SELECT por fila.
+        expire_on_commit = self.db.expire_on_commit
+        self.db.expire_on_commit = False
+        try:
+            self.db.commit()
+        finally:
+            self.db.expire_on_commit = expire_on_commit
@@ -1,7 +1,10 @@
 import pika
 import logging
+import queue
+import threading
 import time
-from typing import Optional, Callable
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Callable
 from pika.exceptions import AMQPConnectionError
 import os
 from dotenv import load_dotenv
@@ -9,6 +12,10 @@ from dotenv import load_dotenv
 load_dotenv() 
 logger = logging.getLogger(__name__)
 
+RABBITMQ_POOL_SIZE = int(os.getenv("RABBITMQ_POOL_SIZE", 1))
+RABBITMQ_POOL_TIMEOUT = float(os.getenv("RABBITMQ_POOL_TIMEOUT", 5.0))
+RABBITMQ_POOL_MAX_BACKOFF = float(os.getenv("RABBITMQ_POOL_MAX_BACKOFF", 30.0))
+
 class RabbitMQConnection:  
     def __init__(
         self,
@@ -31,6 +38,8 @@ class RabbitMQConnection:
         self.channel: Optional[pika.channel.Channel] = None
         self._is_connected = False
         self._retry_count = 0
+        # pika no es thread-safe: acquire() da uso exclusivo de la conexión
+        self._lock = threading.RLock()
         
         self.on_connect_callback: Optional[Callable] = None
         self.on_disconnect_callback: Optional[Callable] = None
@@ -122,6 +131,15 @@ class RabbitMQConnection:
         if not self.ensure_connection():
             raise AMQPConnectionError("No se pudo establecer conexión con RabbitMQ")
         return self.channel
+
+    @contextmanager
+    def acquire(self) -> Iterator["RabbitMQConnection"]:
+        """
+        Uso exclusivo de la conexión y su canal mientras dure el bloque.
+        Misma interfaz que RabbitMQConnectionPool.acquire().
+        """
+        with self._lock:
+            yield self
     
     def set_on_connect_callback(self, callback: Callable):
         self.on_connect_callback = callback
@@ -137,4 +155,127 @@ class RabbitMQConnection:
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.disconnect()
\ No newline at end of file
+        self.disconnect()
+
+
+class _PoolSlot:
+    """Una conexión del pool con su estado de reconexión."""
+
+    def __init__(self, connection: RabbitMQConnection, initial_backoff: float, max_backoff: float):
+        self.connection = connection
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.backoff = initial_backoff
+        self.next_retry_at = 0.0
+
+    def ensure_healthy(self) -> bool:
+        """
+        Comprueba la conexión (procesa heartbeats y detecta cierres) y la
+        recrea si hace falta. Durante el backoff no reintenta: devuelve False
+        al momento en lugar de dormir.
+        """
+        conn = self.connection
+        if conn.is_connected():
+            try:
+                conn.connection.process_data_events(time_limit=0)
+                if conn.is_connected():
+                    return True
+            except Exception as e:
+                logger.warning(f"⚠️ Conexión del pool caída: {e}")
+
+        now = time.monotonic()
+        if now < self.next_retry_at:
+            return False
+
+        conn.disconnect()
+        if conn.connect():
+            self.backoff = self.initial_backoff
+            self.next_retry_at = 0.0
+            return True
+
+        self.next_retry_at = now + self.backoff
+        self.backoff = min(self.backoff * 2, self.max_backoff)
+        return False
+
+
+class RabbitMQConnectionPool:
+    """
+    Pool de N conexiones para publicar desde varios hilos.
+
+    Una BlockingConnection de pika (y todos sus canales) solo puede usarse
+    desde un hilo a la vez, así que cada acquire() presta una conexión
+    completa en exclusiva y la devuelve al salir del bloque. Las conexiones
+    se abren al primer uso, se comprueban en cada préstamo y, si están
+    caídas, se recrean con backoff por conexión: un reintento pendiente no
+    bloquea a los hilos que usan las otras.
+    """
+
+    def __init__(
+        self,
+        url: str = None,
+        size: int = RABBITMQ_POOL_SIZE,
+        checkout_timeout: float = RABBITMQ_POOL_TIMEOUT,
+        initial_backoff: float = 0.5,
+        max_backoff: float = RABBITMQ_POOL_MAX_BACKOFF,
+        **connection_kwargs
+    ):
+        self.url = url or os.getenv('CLOUDAMQP_URL')
+        if not self.url:
+            raise ValueError("Debe proporcionarse la URL de CloudAMQP en `url` o `CLOUDAMQP_URL`")
+        self.size = max(1, size)
+        self.checkout_timeout = checkout_timeout
+        self._slots = [
+            _PoolSlot(RabbitMQConnection(url=self.url, **connection_kwargs), initial_backoff, max_backoff)
+            for _ in range(self.size)
+        ]
+        # LIFO: se reutilizan las conexiones ya abiertas antes que las frías
+        self._free: "queue.LifoQueue[_PoolSlot]" = queue.LifoQueue()
+        for slot in self._slots:
+            self._free.put(slot)
+
+    def _checkout(self) -> _PoolSlot:
+        deadline = time.monotonic() + self.checkout_timeout
+        skipped: List[_PoolSlot] = []
+        try:
+            while True:
+                try:
+                    if skipped:
+                        # Ya hubo conexiones caídas: solo se prueban las libres ahora
+                        slot = self._free.get_nowait()
+                    else:
+                        slot = self._free.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    if skipped:
+                        raise AMQPConnectionError("Ninguna conexión del pool de RabbitMQ está disponible")
+                    raise AMQPConnectionError("Pool de RabbitMQ agotado: timeout esperando una conexión")
+
+                if slot.ensure_healthy():
+                    return slot
+                skipped.append(slot)
+        finally:
+            for slot in skipped:
+                self._free.put(slot)
+
+    @contextmanager
+    def acquire(self) -> Iterator[RabbitMQConnection]:
+        """Presta una conexión sana del pool en exclusiva."""
+        slot = self._checkout()
+        try:
+            yield slot.connection
+        finally:
+            self._free.put(slot)
+
+    def connect(self) -> bool:
+        """Abre una conexión para validar la configuración; el resto es lazy."""
+        try:
+            with self.acquire():
+                return True
+        except AMQPConnectionError:
+            return False
+
+    def is_connected(self) -> bool:
+        return any(slot.connection.is_connected() for slot in self._slots)
+
+    def disconnect(self):
+        for slot in self._slots:
+            slot.connection.disconnect()
@@ -1,74 +1,285 @@
 from dotenv import load_dotenv
 import os
 import logging
-from typing import Generator, Optional
+import time
+from contextlib import contextmanager
+from typing import AsyncGenerator, Callable, Generator, Iterator, Optional
 
 from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
+from app.core.metrics import registry
 load_dotenv()
 
 DB_ENGINE = os.getenv("DB_ENGINE", "POSTGRES").upper()
 USE_DYNAMO = os.getenv("USE_DYNAMO", "false").lower() == "true"
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 DB_SCHEMA = os.getenv("DB_SCHEMA", "test")
+# Modo async (asyncpg + AsyncSession) para las rutas de lectura
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() == "true"
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecret")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
-Base = declarative_base()
+# Unidad de trabajo: dentro de get_db (o de `with unit_of_work()`) los
+# repositorios y servicios solo hacen flush y hay un único commit al final.
+# Las rutas declaran Depends(get_db, scope="function") para que ese commit
+# ocurra al volver el handler, antes de enviar la respuesta (con el scope
+# por defecto, "request", FastAPI lo ejecuta después de enviar el cuerpo)
+DB_UNIT_OF_WORK = os.getenv("DB_UNIT_OF_WORK", "true").lower() == "true"
+UNIT_OF_WORK_KEY = "unit_of_work"
+AFTER_COMMIT_KEY = "after_commit_callbacks"
+
+
+class _ModelBase:
+    # Los valores generados por el servidor (ids, created_at, updated_at con
+    # onupdate) vuelven en el mismo INSERT/UPDATE vía RETURNING, sin refresh
+    __mapper_args__ = {"eager_defaults": True}
+
+
+Base = declarative_base(cls=_ModelBase)
 
 DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 50)) 
 DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
 DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
 DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+# Log por evento de pool/sesión (solo para depurar: serializa en el lock de logging)
+DB_DEBUG_LOGGING = os.getenv("DB_DEBUG_LOGGING", "false").lower() == "true"
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger("db")
+if DB_DEBUG_LOGGING:
+    logger.setLevel(logging.DEBUG)
+
+# ----------------------------------------------------------------------
+# Métricas del pool (expuestas en /metrics)
+# ----------------------------------------------------------------------
+session_lifetime = registry.histogram(
+    "db_session_lifetime_seconds", "Duración de las sesiones abiertas por get_db"
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mide cuánto se espera para obtener una conexión."""
+    wait_histogram = registry.histogram(
+        "db_pool_checkout_wait_seconds", "Espera para obtener una conexión del pool"
+    )
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_histogram.observe(time.perf_counter() - started)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    wait_histogram = registry.histogram(
+        "db_async_pool_checkout_wait_seconds", "Espera para obtener una conexión del pool async"
+    )
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_histogram.observe(time.perf_counter() - started)
+
+
+def instrument_engine(target: Engine, prefix: str) -> None:
+    """Registra contadores y gauges del pool de `target` con el prefijo dado."""
+    connects = registry.counter(f"{prefix}_connections_created_total", "Conexiones nuevas a la base de datos")
+    checkouts = registry.counter(f"{prefix}_checkouts_total", "Conexiones tomadas del pool")
+    invalidations = registry.counter(f"{prefix}_invalidations_total", "Conexiones invalidadas")
+    registry.gauge(f"{prefix}_size", "Tamaño configurado del pool", lambda: target.pool.size())
+    registry.gauge(f"{prefix}_checked_out", "Conexiones en uso", lambda: target.pool.checkedout())
+    registry.gauge(f"{prefix}_checked_in", "Conexiones libres en el pool", lambda: target.pool.checkedin())
+    registry.gauge(f"{prefix}_overflow_in_use", "Conexiones de overflow en uso", lambda: max(0, target.pool.overflow()))
+
+    @event.listens_for(target, "connect")
+    def connect_listener(dbapi_connection, connection_record):
+        connects.inc()
+        if DB_DEBUG_LOGGING:
+            logger.debug("Nueva conexión establecida con la base de datos.")
+
+    @event.listens_for(target, "checkout")
+    def checkout_listener(dbapi_connection, connection_record, connection_proxy):
+        checkouts.inc()
+        if DB_DEBUG_LOGGING:
+            logger.debug("Conexión tomada del pool.")
+
+    @event.listens_for(target, "invalidate")
+    def invalidate_listener(dbapi_connection, connection_record, exception):
+        invalidations.inc()
+
+    if DB_DEBUG_LOGGING:
+        @event.listens_for(target, "checkin")
+        def checkin_listener(dbapi_connection, connection_record):
+            logger.debug("Conexión devuelta al pool.")
+
 if not USE_DYNAMO and DB_ENGINE == "POSTGRES":
     if not DATABASE_URL:
         raise ValueError("DATABASE_URL is not set. Please set it in your environment variables.")
 
     engine = create_engine(
         DATABASE_URL,
+        poolclass=InstrumentedQueuePool,
         pool_size=DB_POOL_SIZE,
         max_overflow=DB_MAX_OVERFLOW,
         pool_timeout=DB_POOL_TIMEOUT,
         pool_recycle=DB_POOL_RECYCLE,
         connect_args={"options": f"-c search_path={DB_SCHEMA}"},
-        echo_pool=True,
+        echo_pool="debug" if DB_DEBUG_LOGGING else False,
     )
+    instrument_engine(engine, "db_pool")
 
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
     def get_db() -> Generator[Session, None, None]:
+        """Usar como Depends(get_db, scope="function"): ver DB_UNIT_OF_WORK."""
         db: Optional[Session] = SessionLocal()
-        logger.info(f"🔵 Nueva sesión abierta: id={id(db)}")
+        db.info[UNIT_OF_WORK_KEY] = DB_UNIT_OF_WORK
+        opened_at = time.perf_counter()
+        if DB_DEBUG_LOGGING:
+            logger.debug(f"🔵 Nueva sesión abierta: id={id(db)}")
         try:
             yield db
             db.commit()
-            logger.info(f"Sesión commit y cerrada correctamente: id={id(db)}")
         except Exception as e:
             db.rollback()
             logger.error(f"Error en sesión {id(db)} -> rollback ({e})")
             raise
         finally:
             db.close()
-            logger.info(f"Sesión cerrada (finally): id={id(db)}")
+            session_lifetime.observe(time.perf_counter() - opened_at)
+            if DB_DEBUG_LOGGING:
+                logger.debug(f"Sesión cerrada: id={id(db)}")
 
-    @event.listens_for(engine, "connect")
-    def connect_listener(dbapi_connection, connection_record):
-        logger.info("Nueva conexión establecida con la base de datos.")
-
-    @event.listens_for(engine, "checkout")
-    def checkout_listener(dbapi_connection, connection_record, connection_proxy):
-        logger.info("Conexión tomada del pool.")
-
-    @event.listens_for(engine, "checkin")
-    def checkin_listener(dbapi_connection, connection_record):
-        logger.info("Conexión devuelta al pool.")
+    if DB_ASYNC:
+        # Misma base de datos vía asyncpg: postgresql[+psycopg2]:// -> postgresql+asyncpg://
+        ASYNC_DATABASE_URL = os.getenv(
+            "ASYNC_DATABASE_URL",
+            DATABASE_URL.replace("postgresql+psycopg2://", "postgresql://", 1)
+                        .replace("postgres://", "postgresql://", 1)
+                        .replace("postgresql://", "postgresql+asyncpg://", 1)
+        )
+        async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            poolclass=InstrumentedAsyncQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            connect_args={"server_settings": {"search_path": DB_SCHEMA}},
+        )
+        instrument_engine(async_engine.sync_engine, "db_async_pool")
+        AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+        logger.info("⚡ Modo async habilitado (asyncpg)")
+    else:
+        async_engine = None
+        AsyncSessionLocal = None
 
 else:
     SessionLocal = None
+    async_engine = None
+    AsyncSessionLocal = None
 
     def get_db() -> Generator[None, None, None]:
         yield None
+
+# ----------------------------------------------------------------------
+# Unidad de trabajo
+# ----------------------------------------------------------------------
+def in_unit_of_work(db: Session) -> bool:
+    return bool(db.info.get(UNIT_OF_WORK_KEY))
+
+
+def commit_or_flush(db: Session, *refresh: object) -> None:
+    """
+    Dentro de una unidad de trabajo solo envía los cambios (flush); el commit
+    lo hace quien la abrió. Fuera de ella hace commit y refresca `refresh`,
+    como antes.
+    """
+    if in_unit_of_work(db):
+        db.flush()
+        return
+    db.commit()
+    for obj in refresh:
+        db.refresh(obj)
+
+
+def after_commit(db: Session, callback: Callable[[], None]) -> None:
+    """
+    Ejecuta `callback` cuando la unidad de trabajo hace commit (se descarta
+    si hace rollback). Fuera de una unidad de trabajo se ejecuta ya.
+    Para invalidar cachés sin que otra petición recargue el dato viejo.
+    """
+    if not in_unit_of_work(db):
+        callback()
+        return
+    db.info.setdefault(AFTER_COMMIT_KEY, []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session) -> None:
+    for callback in session.info.pop(AFTER_COMMIT_KEY, []):
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"⚠️ Error en callback after_commit: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_commit(session: Session) -> None:
+    session.info.pop(AFTER_COMMIT_KEY, None)
+
+
+@contextmanager
+def unit_of_work(db: Optional[Session] = None) -> Iterator[Session]:
+    """
+    Un solo commit para todo el bloque (rollback si hay error), para scripts
+    y workers fuera de get_db:
+
+        with unit_of_work() as db:
+            ...
+
+    Sin `db` abre y cierra su propia sesión.
+    """
+    owns_session = db is None
+    if owns_session:
+        if SessionLocal is None:
+            raise RuntimeError("No hay base de datos Postgres configurada")
+        db = SessionLocal()
+    previous = db.info.get(UNIT_OF_WORK_KEY)
+    db.info[UNIT_OF_WORK_KEY] = True
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.info[UNIT_OF_WORK_KEY] = previous
+        if owns_session:
+            db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependencia async equivalente a get_db (requiere DB_ASYNC=true). También
+    con scope="function" para que el commit preceda a la respuesta.
+    """
+    if AsyncSessionLocal is None:
+        raise RuntimeError("El modo async no está habilitado (DB_ASYNC=true)")
+    opened_at = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        finally:
+            session_lifetime.observe(time.perf_counter() - opened_at)
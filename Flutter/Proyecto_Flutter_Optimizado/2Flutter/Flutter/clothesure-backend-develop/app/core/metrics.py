@@ -0,0 +1,130 @@
+"""
+Métricas en proceso (contadores, histogramas y gauges) con exposición en
+formato de texto de Prometheus para el endpoint /metrics.
+
+No depende de prometheus_client: cada métrica se registra en `registry` y
+render() genera el texto completo.
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Buckets en segundos, pensados para esperas de pool y duración de sesiones
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self._value}",
+        ]
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # Último: +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[position] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self._counts), self._sum, self._count
+
+    def render(self) -> List[str]:
+        counts, total, count = self.snapshot()
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+class Gauge:
+    """
+    Valor calculado en el momento de leer (p. ej. tamaño del pool). Con
+    metric_type="counter" expone contadores que ya lleva otro objeto.
+    """
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float], metric_type: str = "gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.metric_type = metric_type
+
+    def render(self) -> List[str]:
+        try:
+            value = self.read()
+        except Exception:
+            return []
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.metric_type}",
+            f"{self.name} {value}",
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(name, lambda: Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(name, lambda: Histogram(name, help_text, buckets))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float], metric_type: str = "gauge") -> Gauge:
+        with self._lock:
+            self._metrics[name] = Gauge(name, help_text, read, metric_type)
+            return self._metrics[name]
+
+    def _register(self, name: str, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Registro compartido por el proceso
+registry = MetricsRegistry()
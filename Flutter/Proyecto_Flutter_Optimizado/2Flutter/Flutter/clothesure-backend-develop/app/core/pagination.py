@@ -0,0 +1,96 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Codifica la posición de una página como un cursor opaco (base64url)."""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    """Decodifica un cursor; lanza HTTP 400 si no es válido."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return values
+
+
+def decode_datetime_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """Cursor (created_at, id) del feed cronológico."""
+    values = decode_cursor(cursor, 2)
+    if values is None:
+        return None
+    try:
+        return datetime.fromisoformat(values[0]), int(values[1])
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _keyset_statement(query, created_at_column, id_column, limit: int, cursor: Optional[str]):
+    """Aplica orden, rango y límite a un Query o a un select()."""
+    position = decode_datetime_cursor(cursor)
+    query = query.order_by(created_at_column.desc(), id_column.desc())
+    if position is not None:
+        query = query.filter(tuple_(created_at_column, id_column) < position)
+    return query.limit(limit + 1)
+
+
+def _keyset_result(rows: list, created_at_column, id_column, limit: int) -> Tuple[list, Optional[str]]:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([
+            getattr(last, created_at_column.key).isoformat(),
+            getattr(last, id_column.key),
+        ])
+    return rows, next_cursor
+
+
+def keyset_page(
+    query: Query,
+    created_at_column: InstrumentedAttribute,
+    id_column: InstrumentedAttribute,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[list, Optional[str]]:
+    """
+    Página descendente por (created_at, id) usando un rango sobre el índice
+    compuesto en lugar de OFFSET. Devuelve (filas, next_cursor).
+    """
+    rows = _keyset_statement(query, created_at_column, id_column, limit, cursor).all()
+    return _keyset_result(rows, created_at_column, id_column, limit)
+
+
+async def keyset_page_async(
+    db: AsyncSession,
+    statement: Select,
+    created_at_column: InstrumentedAttribute,
+    id_column: InstrumentedAttribute,
+    limit: int,
+    cursor: Optional[str] = None,
+    scalars: bool = True
+) -> Tuple[list, Optional[str]]:
+    """
+    Versión async de keyset_page. Con scalars=True devuelve entidades; con
+    False, los Rows de un select() de columnas.
+    """
+    statement = _keyset_statement(statement, created_at_column, id_column, limit, cursor)
+    result = await db.execute(statement)
+    rows = result.scalars().all() if scalars else result.all()
+    return _keyset_result(list(rows), created_at_column, id_column, limit)
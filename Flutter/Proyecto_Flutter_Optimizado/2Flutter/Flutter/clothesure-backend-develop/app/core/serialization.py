@@ -0,0 +1,173 @@
+"""
+Serialización de los mensajes del bus de eventos.
+
+El formato va en las propiedades AMQP: content_type indica el serializador
+y content_encoding='zlib' que el cuerpo está comprimido. Los consumidores
+decodifican cualquier formato registrado, así que el publisher puede cambiar
+de formato (MESSAGE_FORMAT) cuando todos los consumidores estén actualizados.
+
+  - json: el formato de siempre (application/json).
+  - msgpack: binario (application/x-msgpack) y con las claves conocidas
+    abreviadas ('usuario_id' -> 'u', ...). Requiere el paquete msgpack; sin
+    él se publica en JSON.
+
+Los cuerpos mayores que MESSAGE_COMPRESS_THRESHOLD bytes se comprimen con
+zlib (0 desactiva la compresión).
+"""
+
+import json
+import logging
+import os
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_FORMAT = os.getenv("MESSAGE_FORMAT", "json").lower()
+MESSAGE_COMPRESS_THRESHOLD = int(os.getenv("MESSAGE_COMPRESS_THRESHOLD", 1024))
+
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/x-msgpack"
+ZLIB_ENCODING = "zlib"
+
+# Claves frecuentes del bus y su forma corta en el formato binario
+KEY_ALIASES = {
+    'tipo': 't',
+    'evento': 'e',
+    'datos': 'd',
+    'metadata': 'm',
+    'timestamp': 'ts',
+    'event_id': 'id',
+    'usuario_id': 'u',
+    'outfit_id': 'o',
+    'accion': 'a',
+    'photo_id': 'p',
+    'post_id': 'pp',
+    'user_id': 'ui',
+    'reaction_type_id': 'rt',
+    'action': 'ac',
+    'comment': 'c',
+    'source': 's',
+}
+KEY_EXPANSIONS = {alias: key for key, alias in KEY_ALIASES.items()}
+
+
+def _shorten(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {_shorten_key(key): _shorten(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_shorten(item) for item in value]
+    return value
+
+
+def _shorten_key(key: Any) -> Any:
+    if not isinstance(key, str):
+        return key
+    if key in KEY_ALIASES:
+        return KEY_ALIASES[key]
+    # Una clave que coincide con un alias (o ya escapada) se escapa con '~'
+    if key in KEY_EXPANSIONS or key.startswith('~'):
+        return '~' + key
+    return key
+
+
+def _expand(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {_expand_key(key): _expand(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_expand(item) for item in value]
+    return value
+
+
+def _expand_key(key: Any) -> Any:
+    if not isinstance(key, str):
+        return key
+    if key in KEY_EXPANSIONS:
+        return KEY_EXPANSIONS[key]
+    if key.startswith('~'):
+        return key[1:]
+    return key
+
+
+class JsonSerializer:
+    content_type = JSON_CONTENT_TYPE
+
+    def dumps(self, message: Any) -> bytes:
+        if isinstance(message, dict):
+            return json.dumps(message, ensure_ascii=False).encode("utf-8")
+        if isinstance(message, str):
+            return message.encode("utf-8")
+        return json.dumps(message, ensure_ascii=False, default=str).encode("utf-8")
+
+    def loads(self, body: bytes) -> Any:
+        text = body.decode("utf-8")
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return text
+
+
+class MsgpackSerializer:
+    content_type = MSGPACK_CONTENT_TYPE
+
+    def __init__(self):
+        import msgpack
+        self._msgpack = msgpack
+
+    def dumps(self, message: Any) -> bytes:
+        # Igual que en JSON: un dict con valores no serializables es inválido
+        default = None if isinstance(message, dict) else str
+        return self._msgpack.packb(_shorten(message), use_bin_type=True, default=default)
+
+    def loads(self, body: bytes) -> Any:
+        return _expand(self._msgpack.unpackb(body, raw=False, strict_map_key=False))
+
+
+SERIALIZERS: Dict[str, Any] = {JSON_CONTENT_TYPE: JsonSerializer()}
+
+
+def register_serializer(serializer) -> None:
+    """Registra un serializador (dumps/loads/content_type) para publicar y decodificar."""
+    SERIALIZERS[serializer.content_type] = serializer
+
+
+try:
+    register_serializer(MsgpackSerializer())
+except ImportError:
+    pass
+
+
+def get_serializer(name: str = MESSAGE_FORMAT):
+    """Serializador para publicar según MESSAGE_FORMAT ('json' o 'msgpack')."""
+    if name == "msgpack":
+        if MSGPACK_CONTENT_TYPE in SERIALIZERS:
+            return SERIALIZERS[MSGPACK_CONTENT_TYPE]
+        logger.warning("⚠️ Paquete 'msgpack' no instalado, se publica en JSON")
+    return SERIALIZERS[JSON_CONTENT_TYPE]
+
+
+def encode_message(message: Any, serializer=None,
+                   compress_threshold: int = MESSAGE_COMPRESS_THRESHOLD) -> Tuple[bytes, str, Optional[str]]:
+    """Devuelve (cuerpo, content_type, content_encoding)."""
+    serializer = serializer or SERIALIZERS[JSON_CONTENT_TYPE]
+    body = serializer.dumps(message)
+    if compress_threshold and len(body) > compress_threshold:
+        return zlib.compress(body), serializer.content_type, ZLIB_ENCODING
+    # utf-8 en JSON, como publicaban las versiones anteriores
+    return body, serializer.content_type, "utf-8" if serializer.content_type == JSON_CONTENT_TYPE else None
+
+
+def decode_message(body: bytes, properties=None) -> Any:
+    """
+    Decodifica un cuerpo según las propiedades AMQP del mensaje. Sin
+    content_type (publishers antiguos) se asume JSON.
+    """
+    content_type = getattr(properties, 'content_type', None) or JSON_CONTENT_TYPE
+    if getattr(properties, 'content_encoding', None) == ZLIB_ENCODING:
+        body = zlib.decompress(body)
+    serializer = SERIALIZERS.get(content_type)
+    if serializer is None:
+        if content_type == MSGPACK_CONTENT_TYPE:
+            raise ValueError("Mensaje msgpack recibido sin el paquete 'msgpack' instalado")
+        serializer = SERIALIZERS[JSON_CONTENT_TYPE]  # text/plain y similares: texto o JSON
+    return serializer.loads(body)
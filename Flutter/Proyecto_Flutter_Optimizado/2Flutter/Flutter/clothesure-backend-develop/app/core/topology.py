@@ -0,0 +1,93 @@
+"""
+Topología de eventos en RabbitMQ, compartida por publisher y consumidor.
+
+Los eventos se publican en el exchange topic `events_topic` con una routing
+key por tipo de mensaje, y cada cola solo recibe lo suyo:
+
+    reacciones_cola   <- reaction.*        (reaction.like, reaction.unlike)
+                         notification.#, user.#, outfit.#  (tiempo real)
+    persistencia_cola <- persistence.#     (persistence.photo.created, ...)
+
+El exchange fanout `events_exchange` se mantiene para la migración
+(EVENTS_ROUTING):
+
+    fanout  publicar y enlazar solo por events_exchange (comportamiento previo).
+    dual    las colas siguen enlazadas a events_exchange, así que los
+            publishers viejos funcionan, pero los nuevos publican por
+            events_topic. Valor por defecto durante el despliegue.
+    topic   se quitan los bindings de events_exchange: usar cuando ya no
+            quede ningún publisher en la versión anterior.
+"""
+
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import QueueConfig
+
+logger = logging.getLogger(__name__)
+
+EVENTS_EXCHANGE = "events_topic"
+LEGACY_EXCHANGE = "events_exchange"
+EVENTS_ROUTING = os.getenv("EVENTS_ROUTING", "dual").lower()
+
+QUEUE_BINDINGS = {
+    'reacciones_cola': ('reaction.*', 'notification.#', 'user.#', 'outfit.#'),
+    'persistencia_cola': ('persistence.#',),
+}
+
+# 'tipo' del mensaje -> prefijo de su routing key
+ROUTING_PREFIXES = {
+    'reaccion': 'reaction',
+    'persistencia': 'persistence',
+    'usuario': 'user',
+    'outfit': 'outfit',
+    'notificacion': 'notification',
+    'notification': 'notification',
+}
+
+
+def routing_key_for(message: Any) -> str:
+    """
+    Routing key de un mensaje según su 'tipo':
+    reaction.like, persistence.photo.created, user.<evento>, ...
+    """
+    if not isinstance(message, dict):
+        return 'unrouted'
+    prefix = ROUTING_PREFIXES.get(message.get('tipo'), 'unrouted')
+    if prefix == 'reaction':
+        suffix = message.get('accion') or 'like'
+    else:
+        suffix = message.get('evento') or 'event'
+    return f"{prefix}.{str(suffix).replace('_', '.')}"
+
+
+def resolve_target(message: Any, exchange: Optional[str] = None, routing_key: str = '',
+                   mode: str = EVENTS_ROUTING) -> Tuple[str, str]:
+    """
+    (exchange, routing_key) de un mensaje. Un exchange explícito se respeta
+    tal cual; si no, se elige según EVENTS_ROUTING.
+    """
+    if exchange is not None:
+        return exchange, routing_key
+    if mode == 'fanout':
+        return LEGACY_EXCHANGE, ''
+    return EVENTS_EXCHANGE, routing_key or routing_key_for(message)
+
+
+def declare_topology(channel, mode: str = EVENTS_ROUTING) -> None:
+    """Declara exchanges, colas y bindings (idempotente)."""
+    channel.exchange_declare(exchange=LEGACY_EXCHANGE, exchange_type='fanout', durable=True)
+    channel.exchange_declare(exchange=EVENTS_EXCHANGE, exchange_type='topic', durable=True)
+
+    for queue, keys in QUEUE_BINDINGS.items():
+        config: Dict[str, Any] = QueueConfig.get_queue_config(queue)
+        channel.queue_declare(queue=queue, durable=config.get('durable', True), arguments=config.get('arguments'))
+
+        if mode == 'topic':
+            channel.queue_unbind(queue=queue, exchange=LEGACY_EXCHANGE)
+        else:
+            channel.queue_bind(exchange=LEGACY_EXCHANGE, queue=queue)
+        if mode != 'fanout':
+            for key in keys:
+                channel.queue_bind(exchange=EVENTS_EXCHANGE, queue=queue, routing_key=key)
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, JSON, Index, text
+from app.core.db import Base
+from sqlalchemy.sql import func
+
+class OutboxEvent(Base):
+    """
+    Evento pendiente de publicar en RabbitMQ, escrito en la misma transacción
+    que el cambio de dominio. El relay del worker lo publica y marca
+    published_at; si falla lo reintenta a partir de next_attempt_at y, agotados
+    los intentos, lo marca con dead_at.
+    """
+    __tablename__ = "outbox"
+    __table_args__ = (
+        # Solo se recorren las filas pendientes, en orden de inserción
+        Index("ix_outbox_pending", "id", postgresql_where=text("published_at IS NULL")),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    event_id = Column(String(36), nullable=False, unique=True)  # message_id para deduplicar
+    exchange = Column(String(255), nullable=False, default="events_exchange")
+    routing_key = Column(String(255), nullable=False, default="")
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, server_default=func.now())
+    published_at = Column(DateTime, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=True)  # reintento o plazo del relay que lo reclamó
+    dead_at = Column(DateTime, nullable=True)  # descartado tras OUTBOX_MAX_ATTEMPTS intentos
@@ -1,10 +1,15 @@
 # app/dto/photo_dto.py
-from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, Index, func
 from app.core.db import Base
 from sqlalchemy.sql import func
 
 class PhotoReaction(Base):
     __tablename__ = "photo_reactions"
+    __table_args__ = (
+        # Una reacción por (foto, usuario, tipo): el INSERT ... ON CONFLICT DO
+        # NOTHING del EngagementSink se apoya en él (scripts/create_photo_reactions_unique_index.py)
+        Index("uq_photo_reactions_photo_user_type", "photo_id", "user_id", "reaction_type_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     photo_id = Column(Integer, ForeignKey("test.photos.id", ondelete="CASCADE"), nullable=False)
@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON, Index
 from app.core.db import Base
 from sqlalchemy.sql import func
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # Índice para paginación por cursor (created_at, id) del feed cronológico
+        # (se crea en bases existentes con scripts/create_posts_keyset_index.py)
+        Index("ix_posts_created_at_id", "created_at", "id"),
+    )
 
     # Campos existentes (sin cambios)
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
@@ -14,7 +19,7 @@ class Post(Base):
     hide_location = Column(Boolean, nullable=False, default=False)
     hide_votes = Column(Boolean, nullable=False, default=False)
     hide_comments = Column(Boolean, nullable=False, default=False)
-    # style_tags = Column(JSON, nullable=True)  # Comentado porque no existe en la DB real
+    style_tags = Column(JSON, nullable=True)  # Generados por tagging_service (worker / backfill)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     created_by = Column(Integer, ForeignKey("users.user_id"), nullable=True)
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Integer
+from app.core.db import Base
+
+class ReactionType(Base):
+    # Catálogo de tipos de reacción (photo_reactions.reaction_type_id);
+    # solo se mapea el id, que es lo que se valida
+    __tablename__ = "reaction_types"
+
+    id = Column(Integer, primary_key=True)
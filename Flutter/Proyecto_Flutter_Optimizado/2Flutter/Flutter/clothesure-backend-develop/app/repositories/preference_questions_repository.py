@@ -1,7 +1,8 @@
 from app.core.basecrud import BaseCRUD
 from app.models.preference_questions_model import PreferenceQuestion
+from app.models.preference_options_model import PreferenceOption
 from app.interfaces.preference_questions_repository import IPreferenceQuestionRepository
-from typing import List
+from typing import List, Tuple
 
 class PreferenceQuestionsRepository(BaseCRUD[PreferenceQuestion], IPreferenceQuestionRepository):
     def __init__(self, db):
@@ -13,4 +14,20 @@ class PreferenceQuestionsRepository(BaseCRUD[PreferenceQuestion], IPreferenceQue
     
     def get_ordered(self) -> List[PreferenceQuestion]:
         """Obtiene todas las preguntas ordenadas por campo 'order'."""
-        return self.db.query(PreferenceQuestion).order_by(PreferenceQuestion.order).all()
\ No newline at end of file
+        return self.db.query(PreferenceQuestion).order_by(PreferenceQuestion.order).all()
+
+    def get_catalog(self) -> List[Tuple[PreferenceQuestion, List[PreferenceOption]]]:
+        """Preguntas ordenadas con sus opciones, en una sola consulta (LEFT JOIN)."""
+        rows = (
+            self.db.query(PreferenceQuestion, PreferenceOption)
+            .outerjoin(PreferenceOption, PreferenceOption.question_id == PreferenceQuestion.id)
+            .order_by(PreferenceQuestion.order, PreferenceOption.id)
+            .all()
+        )
+        catalog: List[Tuple[PreferenceQuestion, List[PreferenceOption]]] = []
+        for question, option in rows:
+            if not catalog or catalog[-1][0] is not question:
+                catalog.append((question, []))
+            if option is not None:
+                catalog[-1][1].append(option)
+        return catalog
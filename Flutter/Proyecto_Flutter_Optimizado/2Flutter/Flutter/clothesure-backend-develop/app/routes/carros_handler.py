@@ -10,7 +10,7 @@ router = APIRouter(prefix="/carros", tags=["Carros"])
 
 #create, read, update, delete
 @router.post("/", response_model=CarroResponseDTO)
-def create_carro(data: CarroCreateDTO, db: Session = Depends(get_db)):
+def create_carro(data: CarroCreateDTO, db: Session = Depends(get_db, scope="function")):
     service = get_carros_service(db)
     return service.create(data.dict())
 
@@ -21,7 +21,7 @@ def buscar_carros(
     year: Optional[int] = Query(None, description="Año del carro"),
     precio_min: Optional[float] = Query(None, description="Precio mínimo"),
     precio_max: Optional[float] = Query(None, description="Precio máximo"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     service = get_carros_service(db)
 
@@ -43,7 +43,7 @@ def buscar_carros(
     return carros
 
 @router.get("/{carro_id}", response_model=CarroResponseDTO)
-def get_carro(carro_id: int, db: Session = Depends(get_db)):
+def get_carro(carro_id: int, db: Session = Depends(get_db, scope="function")):
     service = get_carros_service(db)
     carro = service.get(carro_id, Carro.id)
     if not carro:
@@ -51,12 +51,12 @@ def get_carro(carro_id: int, db: Session = Depends(get_db)):
     return carro
 
 @router.get("/", response_model=list[CarroResponseDTO])
-def list_carros(db: Session = Depends(get_db)):
+def list_carros(db: Session = Depends(get_db, scope="function")):
     service = get_carros_service(db)
     return service.list_all()
 
 @router.put("/{carro_id}", response_model=CarroResponseDTO)
-def update_carro(carro_id: int, data: CarroUpdateDTO, db: Session = Depends(get_db)):
+def update_carro(carro_id: int, data: CarroUpdateDTO, db: Session = Depends(get_db, scope="function")):
     service = get_carros_service(db)
     carro = service.update(carro_id, Carro.id, data.dict(exclude_unset=True))
     if not carro:
@@ -64,7 +64,7 @@ def update_carro(carro_id: int, data: CarroUpdateDTO, db: Session = Depends(get_
     return carro
 
 @router.delete("/{carro_id}")
-def delete_carro(carro_id: int, db: Session = Depends(get_db)):
+def delete_carro(carro_id: int, db: Session = Depends(get_db, scope="function")):
     service = get_carros_service(db)
     deleted = service.delete(carro_id, Carro.id)
     if not deleted:
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import registry
+
+router = APIRouter(tags=["Metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Métricas del proceso (pool de conexiones, sesiones y cachés) en formato Prometheus."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
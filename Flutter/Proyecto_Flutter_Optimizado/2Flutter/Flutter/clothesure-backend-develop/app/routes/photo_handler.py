@@ -1,21 +1,29 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import uuid
 from app.models.photo_model import Photo
+from app.models.reaction_type_model import ReactionType
 from app.dto.photo_dto import PhotoOut
 from app.factories.repository_factory import get_photo_service
-from app.cloud.s3 import S3Service, delete_file_from_s3
-from app.security.dependencies import get_current_user
-from app.core.db import get_db
-from app.services import publisher  # Importar publisher global
+from app.cloud.s3 import S3Service, delete_file_from_s3, key_from_url
+from app.security.dependencies import get_current_user, get_current_user_async
+from app.core.db import get_db, get_async_db
+from app.services.publisher import get_publisher
+from app.services.outbox_service import add_outbox_event
+from app.services.counter_service import with_pending_counts
 
 router = APIRouter()
+# Variantes async de las lecturas calientes (DB_ASYNC=true)
+async_router = APIRouter()
 
 
 @router.post("/photos", response_model=PhotoOut)
 def upload_photo(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user)
 ):
     file_key = f"users/{current_user.user_id}/photos/{uuid.uuid4()}_{file.filename}"
@@ -28,22 +36,21 @@ def upload_photo(
         updated_by=current_user.user_id
     )
     db.add(photo)
+    db.flush()
+
+    # El evento se guarda en el outbox en el mismo commit que la foto
+    add_outbox_event(db, 'photo_created', {'photo_id': photo.id, 'user_id': current_user.user_id})
     db.commit()
     db.refresh(photo)
 
-    # Publicar evento de creación de foto
-    publisher.publish_persistence_event(
-        event_type='photo_created',
-        data={'photo_id': photo.id, 'user_id': current_user.user_id}
-    )
-
     return photo
 
 
 @router.get("/photos/{photo_id}", response_model=PhotoOut)
 def get_photo(
     photo_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user)
 ):
     service = get_photo_service(db)
@@ -55,22 +62,26 @@ def get_photo(
     if photo.created_by != current_user.user_id:
         raise HTTPException(status_code=403, detail="No tienes permiso para ver esta foto")
 
-    # Publicar evento de visualización (triggers se encargarán de incrementar el contador)
-    publisher.publish_photo_view(
-        photo_id=photo.id,
-        user_id=current_user.user_id,
-        metadata={'source': 'api'}
-    )
+    # El worker persiste la vista y views_count en lote (EngagementSink)
+    app_publisher = get_publisher(request)
+    if app_publisher:
+        app_publisher.publish_photo_view(
+            photo_id=photo.id,
+            user_id=current_user.user_id,
+            metadata={'source': 'api'}
+        )
 
-    return photo
+    # Contadores con los deltas que el worker aún no escribió
+    return with_pending_counts([PhotoOut.from_orm(photo)])[0]
 
 
 @router.post("/photos/{photo_id}/reaction")
 def add_reaction(
     photo_id: int,
+    request: Request,
     action: str = 'like',  # like/unlike
     reaction_type_id: int = 1,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user)
 ):
     service = get_photo_service(db)
@@ -78,13 +89,23 @@ def add_reaction(
     if not photo:
         raise HTTPException(status_code=404, detail="Foto no encontrada")
 
-    # Publicar evento de reacción (triggers en DB se encargarán de actualizar counters)
-    publisher.publish_photo_reaction(
+    if action not in ('like', 'unlike'):
+        raise HTTPException(status_code=400, detail="Acción inválida: usa 'like' o 'unlike'")
+
+    # Un tipo inexistente violaría la FK al escribir el lote en el worker
+    if db.scalar(select(ReactionType.id).where(ReactionType.id == reaction_type_id)) is None:
+        raise HTTPException(status_code=400, detail="Tipo de reacción inválido")
+
+    # El worker persiste la reacción y reactions_count en lote (EngagementSink)
+    app_publisher = get_publisher(request)
+    if not app_publisher or not app_publisher.publish_photo_reaction(
         photo_id=photo.id,
         user_id=current_user.user_id,
         reaction_type_id=reaction_type_id,
-        metadata={'action': action, 'source': 'api'}
-    )
+        action=action,
+        metadata={'source': 'api'}
+    ):
+        raise HTTPException(status_code=503, detail="No se pudo registrar la reacción")
 
     return {"message": f"Reacción '{action}' enviada para photo_id={photo.id}"}
 
@@ -93,7 +114,8 @@ def add_reaction(
 def add_comment(
     photo_id: int,
     comment: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user)
 ):
     service = get_photo_service(db)
@@ -101,13 +123,15 @@ def add_comment(
     if not photo:
         raise HTTPException(status_code=404, detail="Foto no encontrada")
 
-    # Publicar evento de comentario (triggers en DB se encargarán de incrementar comments_count)
-    publisher.publish_photo_comment(
+    # El worker persiste el comentario y comments_count en lote (EngagementSink)
+    app_publisher = get_publisher(request)
+    if not app_publisher or not app_publisher.publish_photo_comment(
         photo_id=photo.id,
         user_id=current_user.user_id,
         comment=comment,
         metadata={'source': 'api'}
-    )
+    ):
+        raise HTTPException(status_code=503, detail="No se pudo registrar el comentario")
 
     return {"message": f"Comentario enviado para photo_id={photo.id}"}
 
@@ -115,7 +139,7 @@ def add_comment(
 @router.delete("/photos/{photo_id}", response_model=PhotoOut)
 def delete_photo(
     photo_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user)
 ):
     service = get_photo_service(db)
@@ -128,17 +152,44 @@ def delete_photo(
         raise HTTPException(status_code=403, detail="No tienes permiso para eliminar esta foto")
 
     try:
-        s3_key = photo.url.split(".amazonaws.com/")[1]
-        delete_file_from_s3(s3_key)
+        s3_key = key_from_url(photo.url)
     except IndexError:
         raise HTTPException(status_code=400, detail="Formato de URL S3 inválido")
 
-    service.delete(photo_id, Photo.id)
+    deleted_photo = PhotoOut.from_orm(photo)
+    db.delete(photo)
+    add_outbox_event(db, 'photo_deleted', {'photo_id': photo_id, 'user_id': current_user.user_id})
+    db.commit()
 
-    # Publicar evento de eliminación de foto
-    publisher.publish_persistence_event(
-        event_type='photo_deleted',
-        data={'photo_id': photo.id, 'user_id': current_user.user_id}
-    )
+    # El objeto de S3 se borra cuando el commit ya está hecho
+    delete_file_from_s3(s3_key)
 
-    return photo
+    return deleted_photo
+
+
+@async_router.get("/photos/{photo_id}", response_model=PhotoOut)
+async def get_photo_async(
+    photo_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user=Depends(get_current_user_async)
+):
+    photo = (await db.execute(select(Photo).where(Photo.id == photo_id))).scalars().first()
+
+    if not photo:
+        raise HTTPException(status_code=404, detail="Foto no encontrada")
+
+    if photo.created_by != current_user.user_id:
+        raise HTTPException(status_code=403, detail="No tienes permiso para ver esta foto")
+
+    # El publisher de pika es bloqueante: se publica fuera del event loop
+    app_publisher = get_publisher(request)
+    if app_publisher:
+        await run_in_threadpool(
+            app_publisher.publish_photo_view,
+            photo.id,
+            current_user.user_id,
+            {'source': 'api'}
+        )
+
+    return (await run_in_threadpool(with_pending_counts, [PhotoOut.from_orm(photo)]))[0]
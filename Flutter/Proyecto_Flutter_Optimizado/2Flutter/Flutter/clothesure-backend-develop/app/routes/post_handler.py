@@ -1,31 +1,239 @@
 from fastapi import (
-    APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+    APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request
 )
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.responses import JSONResponse
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
 import uuid
 from app.models.post_model import Post
 from app.models.photo_model import Photo
-from app.security.dependencies import get_current_user
-from app.core.db import get_db
-from app.cloud.s3 import S3Service, delete_file_from_s3
+from app.models.user_preference_model import UserPreference
+from app.security.dependencies import get_current_user, get_current_user_async
+from app.core.db import get_db, get_async_db
+from app.core.pagination import encode_cursor, decode_cursor, keyset_page, keyset_page_async
+from app.cloud.s3 import S3Service, key_from_url
 from app.dto.posts_dto import PostOut
 from app.dto.user_dto import UserInPost
 from app.dto.photo_dto import PhotoOut
-from app.services.matching_service import get_top_matching_posts
+from app.services.post_tag_index import post_tag_index, get_post_tags
+from app.services.feed_cache import feed_cache
+from app.services.publisher import get_publisher
+from app.services.post_loader import PostLoader, AsyncPostLoader
+from app.services.read_models import (
+    PostRead, PhotoRead, POST_COLUMNS, from_rows, get_posts_by_ids, select_posts, select_photos
+)
+from app.services.tagging_service import compute_and_store_post_tags, generar_tags_por_estilo
 from app.repositories.user_preference_repository import UserPreferenceRepository
 
 router = APIRouter(prefix="/posts", tags=["Posts"])
+# Variantes async de las lecturas calientes; main.py las registra antes que
+# `router` cuando DB_ASYNC=true
+async_router = APIRouter(prefix="/posts", tags=["Posts"])
 
 def str_to_bool(value: Optional[str]) -> bool:
     if value is None:
         return False
     return str(value).lower() in ("true", "1", "t", "yes")
 
+def post_to_feed_dict(post: PostRead) -> dict:
+    return {
+        "id": post.id,
+        "user_id": post.user_id,
+        "ocation": post.ocation,
+        "location": post.location,
+        "style": post.style,
+        "style_tags": get_post_tags(post),
+        "hide_location": post.hide_location,
+        "hide_votes": post.hide_votes,
+        "hide_comments": post.hide_comments,
+        "created_at": post.created_at,
+        "updated_at": post.updated_at
+    }
+
+def schedule_post_tags(request: Request, db: Session, post: Post, event_type: str) -> List[str]:
+    """
+    Devuelve los style_tags del post para el índice en memoria de este
+    proceso (el matcher precompilado es barato) y encola su persistencia en
+    posts.style_tags para el worker. Si RabbitMQ no está disponible los
+    tags se guardan en el momento.
+    """
+    publisher = get_publisher(request)
+    if publisher and publisher.publish_persistence_event(event_type, {"post_id": post.id}):
+        return generar_tags_por_estilo(post.style, post.ocation)
+
+    tags = compute_and_store_post_tags(db, post.id)
+    db.commit()
+    return tags or []
+
+def upload_post_photos(files: List[UploadFile], folder: str) -> Tuple[List[str], List[str]]:
+    """
+    Sube en paralelo las fotos de un post bajo `folder`.
+    Devuelve (keys, urls) en el orden de `files`; si falla alguna subida no
+    queda ningún objeto en S3.
+    """
+    keys = [f"{folder}/{uuid.uuid4()}_{file.filename}" for file in files]
+    urls = S3Service().upload_photos(list(zip(files, keys)))
+    return keys, urls
+
+def photo_keys(photos: List[Photo]) -> List[str]:
+    keys = []
+    for photo in photos:
+        try:
+            keys.append(key_from_url(photo.url))
+        except (AttributeError, IndexError):
+            pass
+    return keys
+
+def preferences_to_dict(prefs) -> dict:
+    """Preferencias del usuario en el formato que espera el matching."""
+    return {
+        "style_personal": prefs.style_personal,
+        "occasions": prefs.occasions or [],
+        "favorite_items": prefs.favorite_items or [],
+        "body_shape": prefs.body_shape,
+        "shoes": prefs.shoes or [],
+        "accessories": prefs.accessories
+    }
+
+def rank_feed_page(
+    user_preferences: dict,
+    limit: int,
+    cursor: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> Tuple[List[Tuple[int, float, float]], Optional[str]]:
+    """
+    Página del ranking (post_id, score, created_ts) desde el índice de tags,
+    que debe estar construido. Con `user_id` la página sale del ranking
+    materializado del usuario (feed_cache) en lugar de recalcularse.
+    El cursor codifica (score, created_at, id) del último post entregado.
+    """
+    after = decode_cursor(cursor, 3)
+    if after is not None:
+        try:
+            after = (float(after[0]), float(after[1]), int(after[2]))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+
+    if user_id is not None:
+        ranked = feed_cache.get_page(user_id, user_preferences, limit + 1, after)
+    else:
+        ranked = post_tag_index.top_matching(user_preferences, limit=limit + 1, min_score=0.0, after=after)
+    page = ranked[:limit]
+    next_cursor = None
+    if len(ranked) > limit:
+        last_id, last_score, last_timestamp = page[-1]
+        next_cursor = encode_cursor([last_score, last_timestamp, last_id])
+    return page, next_cursor
+
+def ranked_posts_to_feed(page: List[Tuple[int, float, float]], posts: List[PostRead]) -> List[dict]:
+    """Respuesta del feed en el orden del ranking, con su matching_score."""
+    posts_by_id = {post.id: post for post in posts}
+    posts_response = []
+    for post_id, score, _ in page:
+        post = posts_by_id.get(post_id)
+        if post is None:
+            continue
+        post_dict = post_to_feed_dict(post)
+        post_dict["matching_score"] = score
+        posts_response.append(post_dict)
+    return posts_response
+
+def get_ranked_feed_page(
+    db: Session,
+    user_preferences: dict,
+    limit: int,
+    cursor: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Obtiene una página del feed personalizado usando el índice de tags.
+    Solo se cargan de la base de datos los posts de la página solicitada.
+    """
+    post_tag_index.ensure_built(db)
+    page, next_cursor = rank_feed_page(user_preferences, limit, cursor, user_id)
+    if not page:
+        return [], None
+
+    posts = get_posts_by_ids(db, [post_id for post_id, _, _ in page])
+    return ranked_posts_to_feed(page, posts), next_cursor
+
+async def get_ranked_feed_page_async(
+    db: AsyncSession,
+    user_preferences: dict,
+    limit: int,
+    cursor: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Versión async de get_ranked_feed_page."""
+    await db.run_sync(post_tag_index.ensure_built)
+    page, next_cursor = rank_feed_page(user_preferences, limit, cursor, user_id)
+    if not page:
+        return [], None
+
+    result = await db.execute(select_posts().where(Post.id.in_([post_id for post_id, _, _ in page])))
+    return ranked_posts_to_feed(page, from_rows(PostRead, result)), next_cursor
+
+def keyset_posts(db: Session, limit: int, cursor: Optional[str] = None) -> Tuple[List[PostRead], Optional[str]]:
+    """Página del feed cronológico (created_at, id) como modelos de lectura."""
+    rows, next_cursor = keyset_page(db.query(*POST_COLUMNS), Post.created_at, Post.id, limit, cursor)
+    return from_rows(PostRead, rows), next_cursor
+
+async def keyset_posts_async(db: AsyncSession, limit: int, cursor: Optional[str] = None) -> Tuple[List[PostRead], Optional[str]]:
+    """Versión async de keyset_posts."""
+    rows, next_cursor = await keyset_page_async(
+        db, select_posts(), Post.created_at, Post.id, limit, cursor, scalars=False
+    )
+    return from_rows(PostRead, rows), next_cursor
+
+def post_detail_dict(post: PostRead, photos: List[PhotoRead]) -> dict:
+    return {
+        "id": post.id,
+        "ocation": post.ocation,
+        "location": post.location,
+        "style": post.style,
+        "hide_location": post.hide_location,
+        "hide_votes": post.hide_votes,
+        "hide_comments": post.hide_comments,
+        "photos": [{"id": p.id, "url": p.url} for p in photos],
+    }
+
+def generic_feed_dict(post: PostRead) -> dict:
+    post_dict = post_to_feed_dict(post)
+    post_dict.update({
+        "matching_score": 0,  # Sin personalización
+        "matching_explanation": "Sin personalización - completa tu encuesta para recomendaciones personalizadas"
+    })
+    return post_dict
+
+def test_schema_response(prefs, posts_response: List[dict], next_cursor: Optional[str], limit: int, cursor: Optional[str]) -> dict:
+    personalized = bool(prefs and prefs.completed_survey)
+    if personalized:
+        response_message = f"Posts personalizados basados en tus preferencias (estilo: {prefs.style_personal})"
+    else:
+        response_message = "Feed genérico - completa tu encuesta para obtener recomendaciones personalizadas"
+    if not posts_response and not cursor:
+        response_message = "No hay posts en el esquema test"
+
+    return {
+        "success": True,
+        "message": response_message,
+        "posts": posts_response,
+        "next_cursor": next_cursor,
+        "schema": "test",
+        "user_preferences_applied": personalized,
+        "pagination": {
+            "limit": limit,
+            "cursor": cursor,
+            "returned": len(posts_response)
+        }
+    }
+
 @router.post("/", response_model=PostOut, status_code=status.HTTP_201_CREATED)
 def create_post(
+    request: Request,
     ocation: Optional[str] = Form(None),
     location: Optional[str] = Form(None),
     style: Optional[str] = Form(None),
@@ -33,14 +241,25 @@ def create_post(
     hide_votes: Optional[str] = Form("false"),     
     hide_comments: Optional[str] = Form("false"),  
     files: List[UploadFile] = File(...),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
+    hide_location_bool = str_to_bool(hide_location)
+    hide_votes_bool = str_to_bool(hide_votes)
+    hide_comments_bool = str_to_bool(hide_comments)
+
+    # Las fotos se suben antes de abrir la transacción; la conexión de la
+    # autenticación vuelve al pool mientras tanto
+    db.close()
     try:
-        hide_location_bool = str_to_bool(hide_location)
-        hide_votes_bool = str_to_bool(hide_votes)
-        hide_comments_bool = str_to_bool(hide_comments)
+        uploaded_keys, photo_urls = upload_post_photos(
+            files, f"users/{current_user.user_id}/posts/{uuid.uuid4().hex}"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error subiendo las fotos: {str(e)}")
 
+    committed = False
+    try:
         post = Post(
             ocation=ocation,
             location=location,
@@ -58,10 +277,7 @@ def create_post(
         db.flush()
 
         saved_photos = []
-        for index, file in enumerate(files):
-            file_key = f"users/{current_user.user_id}/posts/{post.id}/{uuid.uuid4()}_{file.filename}"
-            photo_url = S3Service().upload_photo(file, file_key)
-
+        for index, photo_url in enumerate(photo_urls):
             photo = Photo(
                 post_id=post.id,
                 url=photo_url,
@@ -78,11 +294,15 @@ def create_post(
             saved_photos.append(photo)
 
         db.commit()
+        committed = True
 
         db.refresh(post)
         for photo in saved_photos:
             db.refresh(photo)
 
+        tags = schedule_post_tags(request, db, post, "post_created")
+        post_tag_index.add_post(post.id, tags, post.created_at)
+
         post_dict = post.__dict__.copy()
         post_dict.update({
             "user_id": post.created_by,
@@ -98,6 +318,8 @@ def create_post(
 
     except Exception as e:
         db.rollback() 
+        if not committed:
+            S3Service().delete_files(uploaded_keys)
         raise HTTPException(status_code=500, detail=f"Error creando el post: {str(e)}")
 
 # ---
@@ -105,32 +327,24 @@ def create_post(
 @router.get("/{post_id}")
 def get_post(
     post_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
-    post = db.query(Post).filter(
-        Post.id == post_id, Post.created_by == current_user.user_id
+    row = db.execute(
+        select_posts().where(Post.id == post_id, Post.created_by == current_user.user_id)
     ).first()
-    if not post:
+    if not row:
         raise HTTPException(status_code=404, detail="Post no encontrado o no tienes permiso para verlo.")
 
-    photos = db.query(Photo).filter(Photo.post_id == post.id).all()
+    photos = from_rows(PhotoRead, db.execute(select_photos([post_id])))
     
-    return {
-        "id": post.id,
-        "ocation": post.ocation,
-        "location": post.location,
-        "style": post.style,
-        "hide_location": post.hide_location,
-        "hide_votes": post.hide_votes,
-        "hide_comments": post.hide_comments,
-        "photos": [{"id": p.id, "url": p.url} for p in photos],
-    }
+    return post_detail_dict(PostRead(*row), photos)
 
 # ---
 
 @router.put("/{post_id}")
 def update_post(
+    request: Request,
     post_id: int,
     ocation: Optional[str] = Form(None),
     location: Optional[str] = Form(None),
@@ -140,7 +354,7 @@ def update_post(
     hide_comments: Optional[bool] = Form(None),
     files: Optional[List[UploadFile]] = File(None), 
     delete_photo_ids: Optional[List[int]] = Form(None), 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     post = db.query(Post).filter(
@@ -149,8 +363,40 @@ def update_post(
     if not post:
         raise HTTPException(status_code=404, detail="Post no encontrado o no tienes permiso para editarlo.")
 
+    new_keys: List[str] = []
+    if files:
+        last_index = (
+            db.query(Photo.order_index).filter(Photo.post_id == post.id).order_by(Photo.order_index.desc()).first()
+        )
+        start_index = last_index[0] + 1 if last_index else 0
+
+        # Sin transacción abierta durante las subidas
+        db.close()
+        try:
+            new_keys, new_urls = upload_post_photos(files, f"users/{current_user.user_id}/posts/{post_id}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error subiendo las fotos: {str(e)}")
+
+        post = db.get(Post, post_id)
+        if not post:
+            S3Service().delete_files(new_keys)
+            raise HTTPException(status_code=404, detail="Post no encontrado o no tienes permiso para editarlo.")
+
+        for i, photo_url in enumerate(new_urls, start=start_index):
+            new_photo = Photo(
+                post_id=post.id,
+                url=photo_url,
+                order_index=i,
+                reactions_count=0,
+                comments_count=0,
+                views_count=0,
+                created_by=current_user.user_id,
+                updated_by=current_user.user_id
+            )
+            db.add(new_photo)
+
     if ocation is not None:
-        post.caption = ocation
+        post.ocation = ocation
     if location is not None:
         post.location = location
     
@@ -164,47 +410,34 @@ def update_post(
     if hide_comments is not None:
         post.hide_comments = hide_comments
 
+    removed_keys: List[str] = []
     if delete_photo_ids:
         photos_to_delete = db.query(Photo).filter(
             Photo.id.in_(delete_photo_ids), Photo.post_id == post.id
         ).all()
+        removed_keys = photo_keys(photos_to_delete)
         for photo in photos_to_delete:
-            try:
-                s3_key = photo.url.split(".amazonaws.com/")[1]
-                delete_file_from_s3(s3_key)
-            except Exception:
-                pass
             db.delete(photo)
 
-    if files:
-        last_index = (
-            db.query(Photo.order_index).filter(Photo.post_id == post.id).order_by(Photo.order_index.desc()).first()
-        )
-        start_index = last_index[0] + 1 if last_index else 0
-        for i, file in enumerate(files, start=start_index):
-            file_key = f"users/{current_user.user_id}/posts/{post.id}/{uuid.uuid4()}_{file.filename}"
-            photo_url = S3Service().upload_photo(file, file_key)
-
-            new_photo = Photo(
-                post_id=post.id,
-                url=photo_url,
-                order_index=i,
-                reactions_count=0,
-                comments_count=0,
-                views_count=0,
-                created_by=current_user.user_id,
-                updated_by=current_user.user_id
-            )
-            db.add(new_photo)
-
     post.updated_at = datetime.utcnow()
-    db.commit()
+    try:
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        S3Service().delete_files(new_keys)
+        raise HTTPException(status_code=500, detail=f"Error actualizando el post: {str(e)}")
+
+    # Los objetos de las fotos borradas se eliminan cuando el commit ya está hecho
+    if removed_keys:
+        S3Service().delete_files(removed_keys)
+    tags = schedule_post_tags(request, db, post, "post_updated")
+    post_tag_index.update_post(post.id, tags)
     return {"message": "Post actualizado correctamente"}
 
 @router.delete("/{post_id}")
 def delete_post(
     post_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     post = db.query(Post).filter(
@@ -214,137 +447,55 @@ def delete_post(
         raise HTTPException(status_code=404, detail="Post no encontrado o no tienes permiso para borrarlo.")
 
     photos = db.query(Photo).filter(Photo.post_id == post.id).all()
+    removed_keys = photo_keys(photos)
     for photo in photos:
-        try:
-            s3_key = photo.url.split(".amazonaws.com/")[1]
-            delete_file_from_s3(s3_key)
-        except Exception:
-            pass
         db.delete(photo)
 
     db.delete(post)
     db.commit()
+    S3Service().delete_files(removed_keys)
+    post_tag_index.remove_post(post_id)
     return {"message": "Post eliminado correctamente"}
 
 @router.get("/test-schema")
 def get_test_schema_posts(
     limit: int = 50,
-    offset: int = 0,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user)
 ):
     """
     Endpoint para obtener todos los posts del esquema test.
     Utiliza la funcionalidad completa del sistema de matching y recomendaciones.
+    Paginación por cursor: enviar `next_cursor` de la respuesta anterior.
     """
     try:
-        # 1. Obtener todos los posts del esquema test
-        all_posts = db.query(Post).order_by(Post.created_at.desc()).all()
-        
-        if not all_posts:
-            return {
-                "success": True,
-                "message": "No hay posts en el esquema test",
-                "posts": [],
-                "total_count": 0,
-                "has_more": False,
-                "schema": "test"
-            }
-        
-        # 2. Verificar si el usuario tiene preferencias para personalización
+        # 1. Verificar si el usuario tiene preferencias para personalización
         user_pref_repo = UserPreferenceRepository(db)
         prefs = user_pref_repo.get_by_user_id(str(current_user.user_id))
         
-        posts_response = []
-        
         if prefs and prefs.completed_survey:
             # Usuario tiene preferencias - aplicar matching personalizado
             print(f" Usuario {current_user.user_id} tiene preferencias - aplicando matching personalizado")
             
-            # Convertir posts a formato para matching
-            posts_for_matching = []
-            for post in all_posts:
-                post_dict = {
-                    "id": post.id,
-                    "user_id": post.user_id,
-                    "ocation": post.ocation,
-                    "location": post.location,
-                    "style": post.style,
-                    "style_tags": [],  # No existe en la DB real, usar array vacío
-                    "hide_location": post.hide_location,
-                    "hide_votes": post.hide_votes,
-                    "hide_comments": post.hide_comments,
-                    "created_at": post.created_at,
-                    "updated_at": post.updated_at
-                }
-                posts_for_matching.append(post_dict)
-            
-            # Calcular matching scores
-            user_preferences = {
-                "style_personal": prefs.style_personal,
-                "occasions": prefs.occasions or [],
-                "favorite_items": prefs.favorite_items or [],
-                "body_shape": prefs.body_shape,
-                "shoes": prefs.shoes or [],
-                "accessories": prefs.accessories
-            }
-            
-            # Obtener posts con mejor matching
-            matching_posts = get_top_matching_posts(
-                user_preferences=user_preferences,
-                posts=posts_for_matching,
-                limit=limit + offset,
-                min_score=0.0
+            # Puntuar solo candidatos del índice y cargar la página pedida
+            posts_response, next_cursor = get_ranked_feed_page(
+                db, preferences_to_dict(prefs), limit, cursor, user_id=str(current_user.user_id)
             )
             
-            # Aplicar paginación
-            paginated_posts = matching_posts[offset:offset + limit]
-            
-            posts_response = paginated_posts
-            
-            response_message = f"Posts personalizados basados en tus preferencias (estilo: {prefs.style_personal})"
-            
         else:
             # Usuario sin preferencias - mostrar todos los posts ordenados por fecha
             print(f"📋 Usuario {current_user.user_id} sin preferencias - mostrando feed genérico")
             
-            paginated_posts = all_posts[offset:offset + limit]
-            
-            for post in paginated_posts:
-                post_dict = {
-                    "id": post.id,
-                    "user_id": post.user_id,
-                    "ocation": post.ocation,
-                    "location": post.location,
-                    "style": post.style,
-                    "style_tags": [],  # No existe en la DB real, usar array vacío
-                    "hide_location": post.hide_location,
-                    "hide_votes": post.hide_votes,
-                    "hide_comments": post.hide_comments,
-                    "created_at": post.created_at,
-                    "updated_at": post.updated_at,
-                    "matching_score": 0,  # Sin personalización
-                    "matching_explanation": "Sin personalización - completa tu encuesta para recomendaciones personalizadas"
-                }
-                posts_response.append(post_dict)
-            
-            response_message = "Feed genérico - completa tu encuesta para obtener recomendaciones personalizadas"
+            paginated_posts, next_cursor = keyset_posts(db, limit, cursor)
+            posts_response = [generic_feed_dict(post) for post in paginated_posts]
         
-        return {
-            "success": True,
-            "message": response_message,
-            "posts": posts_response,
-            "total_count": len(all_posts),
-            "has_more": (offset + limit) < len(all_posts),
-            "schema": "test",
-            "user_preferences_applied": bool(prefs and prefs.completed_survey),
-            "pagination": {
-                "limit": limit,
-                "offset": offset,
-                "returned": len(posts_response)
-            }
-        }
+        # Fotos y autores de toda la página en dos consultas
+        PostLoader(db).attach(posts_response)
+        return test_schema_response(prefs, posts_response, next_cursor, limit, cursor)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error en endpoint test-schema: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al obtener posts del esquema test: {str(e)}")
@@ -352,12 +503,13 @@ def get_test_schema_posts(
 @router.get("/feed/for-you")
 def get_personalized_feed(
     limit: int = 20,
-    offset: int = 0,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user)
 ):
     """
     Feed personalizado basado en preferencias del usuario.
+    Paginación por cursor: enviar `next_cursor` de la respuesta anterior.
     """
     try:
         # 1. Verificar si usuario tiene preferencias
@@ -365,67 +517,111 @@ def get_personalized_feed(
         prefs = user_pref_repo.get_by_user_id(str(current_user.user_id))
         
         if not prefs or not prefs.completed_survey:
-            # Si no tiene preferencias, devolver feed genérico
-            posts = db.query(Post).order_by(Post.created_at.desc()).offset(offset).limit(limit).all()
+            # Si no tiene preferencias, devolver feed genérico (cursor por created_at, id)
+            posts, next_cursor = keyset_posts(db, limit, cursor)
             
             return {
                 "success": True,
                 "requires_survey": True,
                 "message": "Completa tu encuesta para personalizar el feed",
-                "posts": [post.__dict__ for post in posts],
-                "total_count": len(posts),
-                "has_more": len(posts) == limit
+                "posts": PostLoader(db).attach([post_to_feed_dict(post) for post in posts]),
+                "next_cursor": next_cursor
             }
         
-        # 2. Obtener todos los posts disponibles
-        all_posts = db.query(Post).order_by(Post.created_at.desc()).all()
-        
-        # 3. Convertir posts a formato para matching
-        posts_for_matching = []
-        for post in all_posts:
-            post_dict = {
-                "id": post.id,
-                "user_id": post.user_id,
-                "ocation": post.ocation,
-                "location": post.location,
-                "style": post.style,
-                "style_tags": [],  # No existe en la DB real, usar array vacío
-                "hide_location": post.hide_location,
-                "hide_votes": post.hide_votes,
-                "hide_comments": post.hide_comments,
-                "created_at": post.created_at,
-                "updated_at": post.updated_at
-            }
-            posts_for_matching.append(post_dict)
+        # 2. Puntuar solo los candidatos del índice (top-k con heap) y cargar la página
+        paginated_posts, next_cursor = get_ranked_feed_page(
+            db, preferences_to_dict(prefs), limit, cursor, user_id=str(current_user.user_id)
+        )
         
-        # 4. Calcular matching scores
-        user_preferences = {
-            "style_personal": prefs.style_personal,
-            "occasions": prefs.occasions or [],
-            "favorite_items": prefs.favorite_items or [],
-            "body_shape": prefs.body_shape,
-            "shoes": prefs.shoes or [],
-            "accessories": prefs.accessories
+        return {
+            "success": True,
+            "requires_survey": False,
+            "posts": PostLoader(db).attach(paginated_posts),
+            "next_cursor": next_cursor
         }
         
-        # 5. Obtener posts con mejor matching
-        matching_posts = get_top_matching_posts(
-            user_preferences=user_preferences,
-            posts=posts_for_matching,
-            limit=limit + offset,  # Obtener más para paginación
-            min_score=0.0
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener feed personalizado: {str(e)}")
+
+# ---
+# Rutas async (DB_ASYNC=true). Las rutas fijas van antes que /{post_id}.
+
+async def get_user_preferences_async(db: AsyncSession, user_id: int) -> Optional[UserPreference]:
+    result = await db.execute(select(UserPreference).where(UserPreference.user_id == str(user_id)))
+    return result.scalars().first()
+
+@async_router.get("/test-schema")
+async def get_test_schema_posts_async(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user=Depends(get_current_user_async)
+):
+    try:
+        prefs = await get_user_preferences_async(db, current_user.user_id)
+        if prefs and prefs.completed_survey:
+            posts_response, next_cursor = await get_ranked_feed_page_async(
+                db, preferences_to_dict(prefs), limit, cursor, user_id=str(current_user.user_id)
+            )
+        else:
+            paginated_posts, next_cursor = await keyset_posts_async(db, limit, cursor)
+            posts_response = [generic_feed_dict(post) for post in paginated_posts]
+
+        await AsyncPostLoader(db).attach(posts_response)
+        return test_schema_response(prefs, posts_response, next_cursor, limit, cursor)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener posts del esquema test: {str(e)}")
+
+@async_router.get("/feed/for-you")
+async def get_personalized_feed_async(
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user=Depends(get_current_user_async)
+):
+    try:
+        prefs = await get_user_preferences_async(db, current_user.user_id)
+        if not prefs or not prefs.completed_survey:
+            posts, next_cursor = await keyset_posts_async(db, limit, cursor)
+            return {
+                "success": True,
+                "requires_survey": True,
+                "message": "Completa tu encuesta para personalizar el feed",
+                "posts": await AsyncPostLoader(db).attach([post_to_feed_dict(post) for post in posts]),
+                "next_cursor": next_cursor
+            }
+
+        paginated_posts, next_cursor = await get_ranked_feed_page_async(
+            db, preferences_to_dict(prefs), limit, cursor, user_id=str(current_user.user_id)
         )
-        
-        # 6. Aplicar paginación
-        paginated_posts = matching_posts[offset:offset + limit]
-        
         return {
             "success": True,
             "requires_survey": False,
-            "posts": paginated_posts,
-            "total_count": len(matching_posts),
-            "has_more": (offset + limit) < len(matching_posts)
+            "posts": await AsyncPostLoader(db).attach(paginated_posts),
+            "next_cursor": next_cursor
         }
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al obtener feed personalizado: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error al obtener feed personalizado: {str(e)}")
+
+@async_router.get("/{post_id}")
+async def get_post_async(
+    post_id: int,
+    db: AsyncSession = Depends(get_async_db, scope="function"),
+    current_user=Depends(get_current_user_async),
+):
+    row = (await db.execute(
+        select_posts().where(Post.id == post_id, Post.created_by == current_user.user_id)
+    )).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Post no encontrado o no tienes permiso para verlo.")
+
+    photos = from_rows(PhotoRead, await db.execute(select_photos([post_id])))
+    return post_detail_dict(PostRead(*row), photos)
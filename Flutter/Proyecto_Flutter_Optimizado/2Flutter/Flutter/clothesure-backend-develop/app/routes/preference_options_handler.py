@@ -5,22 +5,25 @@ from fastapi.responses import JSONResponse
 from app.dto.preference_options_dto import PreferenceOptionCreate, PreferenceOptionUpdate, PreferenceOptionOut
 from app.factories.repository_factory import get_preference_options_service
 from app.security.dependencies import get_current_user
-from app.core.db import get_db
+from app.core.db import get_db, after_commit
+from app.services.survey_catalog import survey_catalog
 
 router = APIRouter(prefix="/preference-options", tags=["Preference Options"])
 
 @router.post("/", response_model=PreferenceOptionOut, status_code=status.HTTP_201_CREATED)
 def create_preference_option(
     data: PreferenceOptionCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_preference_options_service(db)
-    return service.create(data.dict(), current_user.user_id)
+    created = service.create(data.dict(), current_user.user_id)
+    after_commit(db, survey_catalog.invalidate)
+    return created
 
 @router.get("/", response_model=List[PreferenceOptionOut])
 def list_preference_options(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_preference_options_service(db)
@@ -29,7 +32,7 @@ def list_preference_options(
 @router.get("/{option_id}", response_model=PreferenceOptionOut)
 def get_preference_option(
     option_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_preference_options_service(db)
@@ -42,24 +45,26 @@ def get_preference_option(
 def update_preference_option(
     option_id: int,
     data: PreferenceOptionUpdate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_preference_options_service(db)
     updated_obj = service.update(option_id, service.repo.model.id, data.dict(exclude_unset=True), current_user.user_id)
     if not updated_obj:
         raise HTTPException(status_code=404, detail="Opción no encontrada")
+    after_commit(db, survey_catalog.invalidate)
     return updated_obj
 
 @router.delete("/{option_id}", status_code=status.HTTP_200_OK)
 def delete_preference_option(
     option_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_preference_options_service(db)
     try:
         service.delete(option_id, service.repo.model.id)
+        after_commit(db, survey_catalog.invalidate)
         return JSONResponse(content={"message": "Opción eliminada correctamente."})
     except HTTPException as e:
         if e.status_code == 403:
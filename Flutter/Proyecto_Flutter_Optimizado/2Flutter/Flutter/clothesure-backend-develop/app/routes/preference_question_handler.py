@@ -5,7 +5,8 @@ from fastapi.responses import JSONResponse
 from app.dto.preference_question_dto import PreferenceQuestionCreate, PreferenceQuestionUpdate, PreferenceQuestionOut
 from app.factories.repository_factory import get_preference_question_service
 from app.security.dependencies import get_current_user
-from app.core.db import get_db
+from app.core.db import get_db, after_commit
+from app.services.survey_catalog import survey_catalog
 from app.models.preference_questions_model import PreferenceQuestion
 from app.models.preference_options_model import PreferenceOption
 
@@ -14,15 +15,17 @@ router = APIRouter(prefix="/preference-questions", tags=["Preference Questions"]
 @router.post("/", response_model=PreferenceQuestionOut, status_code=status.HTTP_201_CREATED)
 def create_preference_question(
     data: PreferenceQuestionCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_preference_question_service(db)
-    return service.create(data.dict(), current_user.user_id)
+    created = service.create(data.dict(), current_user.user_id)
+    after_commit(db, survey_catalog.invalidate)
+    return created
 
 
 @router.get("/", response_model=List[PreferenceQuestionOut])
-def list_preference_questions(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+def list_preference_questions(db: Session = Depends(get_db, scope="function"), current_user=Depends(get_current_user)):
     questions = db.query(PreferenceQuestion).filter(PreferenceQuestion.is_active == True).all()
     options = db.query(PreferenceOption).filter(PreferenceOption.question_id.in_([q.id for q in questions])).all()
     options_by_question = {}
@@ -39,7 +42,7 @@ def list_preference_questions(db: Session = Depends(get_db), current_user=Depend
 @router.get("/{question_id}", response_model=PreferenceQuestionOut)
 def get_preference_question(
     question_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_preference_question_service(db)
@@ -53,24 +56,26 @@ def get_preference_question(
 def update_preference_question(
     question_id: int,
     data: PreferenceQuestionUpdate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_preference_question_service(db)
     updated_obj = service.update(question_id, service.repo.model.id, data.dict(exclude_unset=True), current_user.user_id)
     if not updated_obj:
         raise HTTPException(status_code=404, detail="Pregunta no encontrada")
+    after_commit(db, survey_catalog.invalidate)
     updated_obj.options
     return updated_obj
 @router.delete("/{question_id}", status_code=status.HTTP_200_OK)
 def delete_preference_question(
     question_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_preference_question_service(db)
     try:
         service.delete(question_id, service.repo.model.id)
+        after_commit(db, survey_catalog.invalidate)
         return JSONResponse(content={"message": "Pregunta eliminada correctamente."})
     except HTTPException as e:
         if e.status_code == 403:
@@ -3,18 +3,21 @@ Handler para endpoints de preferencias de usuario.
 Incluye endpoints para encuesta inicial y gestión de preferencias.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from functools import partial
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, validator
 
-from app.core.db import get_db
+from app.core.db import get_db, after_commit
 from app.models.preference_questions_model import PreferenceQuestion
 from app.models.preference_options_model import PreferenceOption
 from app.models.user_preference_model import UserPreference
 from app.repositories.preference_questions_repository import PreferenceQuestionsRepository
 from app.repositories.preference_options_repository import PreferenceOptionsRepository
 from app.repositories.user_preference_repository import UserPreferenceRepository
+from app.services.feed_cache import feed_cache
+from app.services.survey_catalog import survey_catalog, etag_matches
 
 router = APIRouter()
 
@@ -73,56 +76,28 @@ class UserPreferencesResponse(BaseModel):
     message: Optional[str] = None
 
 @router.get("/questions", response_model=SurveyQuestionsResponse)
-def get_survey_questions(db: Session = Depends(get_db)):
+def get_survey_questions(request: Request, db: Session = Depends(get_db, scope="function")):
     """
     Devuelve todas las preguntas de la encuesta con sus opciones.
     Ordena por campo 'order'.
+
+    El catálogo sale ya serializado de survey_catalog (una sola consulta al
+    recargarse). Con If-None-Match igual al ETag actual responde 304.
     """
     try:
-        # Obtener preguntas ordenadas
-        questions_repo = PreferenceQuestionsRepository(db)
-        questions = questions_repo.get_all()
-        
-        # Obtener opciones para cada pregunta
-        options_repo = PreferenceOptionsRepository(db)
-        
-        questions_data = []
-        for question in questions:
-            options = options_repo.get_by_question_id(question.id)
-            options_data = [
-                {
-                    "id": opt.id,
-                    "text": opt.text,
-                    "value": opt.value,
-                    "requires_text": opt.requires_text
-                }
-                for opt in options
-            ]
-            
-            question_data = {
-                "id": question.id,
-                "question_text": question.question_text,
-                "question_type": question.question_type,
-                "order": question.order,
-                "max_selections": question.max_selections,
-                "has_illustrations": question.has_illustrations,
-                "has_color_circles": question.has_color_circles,
-                "options": options_data
-            }
-            questions_data.append(question_data)
-        
-        return SurveyQuestionsResponse(
-            success=True,
-            questions=questions_data
-        )
-        
+        entry = survey_catalog.get(db)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener preguntas: {str(e)}")
 
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
 @router.post("/answers", response_model=SurveyAnswersResponse)
 def save_survey_answers(
     request: SurveyAnswersRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Guarda las respuestas de la encuesta inicial.
@@ -160,6 +135,9 @@ def save_survey_answers(
                 completed_survey=True
             )
         
+        # El ranking materializado del feed depende de las preferencias
+        after_commit(db, partial(feed_cache.invalidate, request.user_id))
+        
         return SurveyAnswersResponse(
             success=True,
             message="Encuesta completada exitosamente",
@@ -177,7 +155,7 @@ def save_survey_answers(
 @router.get("/{user_id}", response_model=UserPreferencesResponse)
 def get_user_preferences(
     user_id: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Obtiene las preferencias guardadas de un usuario.
@@ -221,7 +199,7 @@ def get_user_preferences(
 def update_user_preferences(
     user_id: str,
     request: SurveyAnswersRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     Actualiza preferencias de un usuario.
@@ -249,6 +227,7 @@ def update_user_preferences(
             request.answers,
             completed_survey=True
         )
+        after_commit(db, partial(feed_cache.invalidate, user_id))
         
         return SurveyAnswersResponse(
             success=True,
@@ -12,7 +12,7 @@ router = APIRouter(prefix="/user-devices", tags=["User Devices"])
 @router.post("/", response_model=UserDeviceOut, status_code=status.HTTP_201_CREATED)
 def create_user_device(
     data: UserDeviceCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_user_device_service(db)
@@ -20,7 +20,7 @@ def create_user_device(
 
 @router.get("/", response_model=List[UserDeviceOut])
 def list_user_devices(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_user_device_service(db)
@@ -29,7 +29,7 @@ def list_user_devices(
 @router.get("/{device_id}", response_model=UserDeviceOut)
 def get_user_device(
     device_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_user_device_service(db)
@@ -42,7 +42,7 @@ def get_user_device(
 def update_user_device(
     device_id: int,
     data: UserDeviceUpdate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_user_device_service(db)
@@ -54,7 +54,7 @@ def update_user_device(
 @router.delete("/{device_id}", status_code=status.HTTP_200_OK)
 def delete_user_device(
     device_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_user_device_service(db)
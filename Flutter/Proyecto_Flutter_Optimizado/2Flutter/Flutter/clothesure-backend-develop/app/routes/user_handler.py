@@ -1,10 +1,12 @@
+from functools import partial
 from fastapi import APIRouter, Depends, Form
 from typing import List
 from sqlalchemy.orm import Session
 from app.dto.user_dto import UserCreate, UserOut, PasswordResetRequest
 from app.models.user_model import User
+from app.services.read_models import UserRead
 from app.factories.repository_factory import  get_user_service,get_user_device_service
-from app.core.db import get_db
+from app.core.db import get_db, after_commit
 from passlib.context import CryptContext
 from app.models.user_device_model import UserDevice
 from app.dto.user_device_dto import UserDeviceOut
@@ -15,6 +17,7 @@ import os
 from fastapi.security import OAuth2PasswordBearer
 from app.services.email_helper import send_password_reset_email
 from app.security.dependencies import get_current_user
+from app.security.user_cache import auth_user_cache
 from fastapi import HTTPException, Request,Header
 from app.security.dependencies import get_current_user
 
@@ -25,11 +28,13 @@ router = APIRouter()
 
 #get current user information
 @router.get("/me", response_model=UserOut)
-def read_current_user(current_user: User = Depends(get_current_user)):
+def read_current_user(current_user: UserRead = Depends(get_current_user)):
+    # Modelo de lectura de la caché de autenticación o de un select() de
+    # columnas: /me no hidrata ningún User del ORM
     return current_user
 
 @router.post("/register/", response_model=UserOut)
-def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
+def register_user(user_data: UserCreate, db: Session = Depends(get_db, scope="function")):
     service = get_user_service(db)
     return service.register_user(db, user_data.dict())
 
@@ -44,7 +49,7 @@ def login_user(
     device_name: str = Form(None),
     device_os: str = Form(None),
     browser: str = Form(None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     user_service = get_user_service(db)
     device_service = get_user_device_service(db)
@@ -73,7 +78,7 @@ async def login_with_google(request: Request):
     return await oauth.google.authorize_redirect(request, redirect_uri)
 
 @router.get("/auth/callback")
-async def auth_callback(request: Request, db: Session = Depends(get_db)):
+async def auth_callback(request: Request, db: Session = Depends(get_db, scope="function")):
     token = await oauth.google.authorize_access_token(request)
     user_info = await oauth.google.userinfo(token=token)
 
@@ -104,18 +109,20 @@ def update_user(user_id: int,
                 username: str,
                 email: str,
                 phone: str,
-                db: Session = Depends(get_db),
-                current_user: User = Depends(get_current_user)):
+                db: Session = Depends(get_db, scope="function"),
+                current_user: UserRead = Depends(get_current_user)):
     service = get_user_service(db)
     
-    return service.update(user_id,User.user_id, {
+    updated_user = service.update(user_id,User.user_id, {
         "full_name": username,
         "email": email,
         "phone": phone
     }, current_user.user_id)
+    after_commit(db, partial(auth_user_cache.invalidate_user, user_id))
+    return updated_user
 
 @router.post("/password/forgot")
-def forgot_password(email: str = Form(...), db: Session = Depends(get_db)):
+def forgot_password(email: str = Form(...), db: Session = Depends(get_db, scope="function")):
     service = get_user_service(db)
     user = service.get(email, User.email)
     if not user:
@@ -127,35 +134,38 @@ def forgot_password(email: str = Form(...), db: Session = Depends(get_db)):
     }
 
 @router.post("/password/reset")
-def reset_password(request: PasswordResetRequest, db: Session = Depends(get_db)):
+def reset_password(request: PasswordResetRequest, db: Session = Depends(get_db, scope="function")):
     service = get_user_service(db)
     user = service.reset_password_with_token(db, request.token, request.new_password)
+    after_commit(db, partial(auth_user_cache.invalidate_user, user.user_id))
     return {"msg": "Contraseña actualizada exitosamente", "user_id": user.user_id}
 
 @router.post("/logout")
-def logout(session_token: str = Header(...), db: Session = Depends(get_db)):
+def logout(session_token: str = Header(...), db: Session = Depends(get_db, scope="function")):
     device_service = get_user_device_service(db)
     device = device_service.logout_device(db, session_token=session_token)
 
     if not device:
         raise HTTPException(status_code=404, detail="Device/session not found")
+    after_commit(db, partial(auth_user_cache.invalidate_user, device.user_id))
 
     return {"detail": "Logged out successfully", "device_id": device.id}
 
 @router.post("/logout_all")
-def logout_all(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def logout_all(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db, scope="function")):
     user_service = get_user_service(db)
     user_payload = user_service.get_current_user_from_token(token)
     user_id = user_payload["user_id"]
 
     device_service = get_user_device_service(db)
     device_service.logout_all_devices(db, user_id=user_id)
+    after_commit(db, partial(auth_user_cache.invalidate_user, user_id))
 
     return {"detail": f"All sessions for user {user_id} have been logged out"}
 
 
 @router.get("/sessions", response_model=List[UserDeviceOut])
-def list_sessions(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def list_sessions(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db, scope="function")):
     user_service = get_user_service(db)
     user_payload = user_service.get_current_user_from_token(token)
     user_id = user_payload["user_id"]
@@ -170,8 +180,8 @@ def list_sessions(token: str = Depends(oauth2_scheme), db: Session = Depends(get
 def change_password(
     old_password: str = Form(...),
     new_password: str = Form(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_db, scope="function"),
+    current_user: UserRead = Depends(get_current_user)
 ):
     service = get_user_service(db)
     updated_user = service.update_password(
@@ -180,4 +190,5 @@ def change_password(
         old_password=old_password,
         new_password=new_password
     )
+    after_commit(db, partial(auth_user_cache.invalidate_user, current_user.user_id))
     return {"msg": "Contraseña cambiada exitosamente", "user_id": updated_user.user_id}
\ No newline at end of file
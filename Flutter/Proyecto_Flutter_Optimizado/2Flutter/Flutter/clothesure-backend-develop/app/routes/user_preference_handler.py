@@ -12,7 +12,7 @@ router = APIRouter(prefix="/user-preferences", tags=["User Preferences"])
 @router.post("/", response_model=UserPreferenceOut, status_code=status.HTTP_201_CREATED)
 def save_user_preference(
     data: UserPreferenceCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_user_preference_service(db)
@@ -24,7 +24,7 @@ def save_user_preference(
 
 @router.get("/", response_model=List[UserPreferenceOut])
 def list_user_preferences(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_user_preference_service(db)
@@ -33,7 +33,7 @@ def list_user_preferences(
 @router.get("/{preference_id}", response_model=UserPreferenceOut)
 def get_user_preference(
     preference_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_user_preference_service(db)
@@ -44,7 +44,7 @@ def get_user_preference(
 def update_user_preference(
     preference_id: int,
     data: UserPreferenceUpdate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_user_preference_service(db)
@@ -56,7 +56,7 @@ def update_user_preference(
 @router.delete("/{preference_id}", status_code=status.HTTP_200_OK)
 def delete_user_preference(
     preference_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user=Depends(get_current_user),
 ):
     service = get_user_preference_service(db)
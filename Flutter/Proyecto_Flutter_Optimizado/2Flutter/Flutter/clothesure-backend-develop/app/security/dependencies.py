@@ -2,32 +2,57 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from app.core.db import SECRET_KEY, ALGORITHM
-from app.models.user_model import User
-from app.factories.repository_factory import get_user_service
-from app.core.db import get_db
+from app.services.read_models import UserRead, get_user_read, select_user
+from app.core.db import get_db, get_async_db
+from app.security.user_cache import auth_user_cache
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login/")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+def _decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
 
-    service = get_user_service(db)
-    user = service.get(int(user_id), User.user_id)
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db, scope="function")) -> UserRead:
+    cached_user = auth_user_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
+    payload = _decode_token(token)
+    user_id = payload.get("sub")
+
+    user = get_user_read(db, int(user_id))
 
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+
+    auth_user_cache.set(token, user, payload.get("exp"))
+    return user
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db, scope="function")) -> UserRead:
+    """Versión async de get_current_user para las rutas en modo DB_ASYNC."""
+    cached_user = auth_user_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
+    payload = _decode_token(token)
+    row = (await db.execute(select_user(int(payload["sub"])))).first()
+    if row is None:
+        raise _credentials_exception()
+    user = UserRead(*row)
 
+    auth_user_cache.set(token, user, payload.get("exp"))
     return user
@@ -0,0 +1,114 @@
+"""
+Caché de usuarios autenticados para get_current_user.
+
+Guarda por token (hash SHA-256) una copia de las columnas del usuario
+(devuelta como UserRead, sin pasar por el ORM), de modo que las requests autenticadas no decodifican el JWT ni hacen un SELECT
+sobre users en cada llamada. Cada entrada vive como mucho AUTH_CACHE_TTL
+segundos y nunca más allá del `exp` del token. La caché es un LRU acotado
+y se invalida por usuario al cambiar la contraseña, al hacer logout y al
+actualizar el usuario.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import fields
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.core.metrics import registry
+from app.services.read_models import UserRead
+
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", 60))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))
+
+# El hash de la contraseña no se guarda en memoria
+SNAPSHOT_COLUMNS = tuple(field.name for field in fields(UserRead))
+
+
+class AuthenticatedUserCache:
+    def __init__(self, ttl: int = AUTH_CACHE_TTL, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[UserRead]:
+        """Usuario (copia desacoplada de la sesión) o None si no está en caché."""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                self._discard_locked(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            values = entry[2]
+        return UserRead(**values)
+
+    def set(self, token: str, user: UserRead, token_exp: Optional[float] = None) -> None:
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, float(token_exp))
+        values = {column: getattr(user, column) for column in SNAPSHOT_COLUMNS}
+        key = self._key(token)
+        with self._lock:
+            self._discard_locked(key)
+            self._entries[key] = (expires_at, user.user_id, values)
+            self._keys_by_user.setdefault(user.user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard_locked(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Descarta todos los tokens cacheados de un usuario."""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._discard_locked(key)
+
+    def invalidate_token(self, token: str) -> None:
+        with self._lock:
+            self._discard_locked(self._key(token))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _discard_locked(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_user.get(entry[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[entry[1]]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# Instancia compartida por el proceso de la API
+auth_user_cache = AuthenticatedUserCache()
+
+registry.gauge("auth_cache_hits_total", "Usuarios resueltos desde la caché", lambda: auth_user_cache.hits, "counter")
+registry.gauge("auth_cache_misses_total", "Usuarios leídos de la base de datos", lambda: auth_user_cache.misses, "counter")
+registry.gauge("auth_cache_entries", "Tokens en la caché de usuarios", lambda: len(auth_user_cache._entries))
@@ -0,0 +1,328 @@
+"""
+Publisher no bloqueante para el proceso de la API.
+
+Los handlers solo encolan el mensaje en un outbox en memoria (acotado) y
+vuelven de inmediato. Un hilo de I/O dueño de la conexión a RabbitMQ lo
+vacía en lotes con publisher confirms (MessagePublisher.publish_batch_messages)
+y reintenta con backoff lo no confirmado, sin que un broker lento o una
+reconexión frenen las peticiones.
+
+Cuando el outbox está lleno se aplica la política configurada:
+  - block: el handler espera hueco hasta PUBLISHER_BLOCK_TIMEOUT segundos,
+  - drop_oldest: se descarta el mensaje más antiguo,
+  - spill: el mensaje se escribe en un archivo JSONL en disco y el hilo de
+    I/O lo reenvía cuando el outbox se vacía (también tras un reinicio).
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.core.connection import RabbitMQConnection, RabbitMQConnectionPool, RABBITMQ_POOL_SIZE
+from app.core.metrics import registry
+from app.core.topology import resolve_target
+from app.core.serialization import get_serializer
+from app.services.publisher import MessagePublisher
+
+logger = logging.getLogger(__name__)
+
+PUBLISHER_MODE = os.getenv("PUBLISHER_MODE", "async").lower()
+PUBLISHER_QUEUE_SIZE = int(os.getenv("PUBLISHER_QUEUE_SIZE", 10000))
+PUBLISHER_OVERFLOW_POLICY = os.getenv("PUBLISHER_OVERFLOW_POLICY", "spill").lower()
+PUBLISHER_BLOCK_TIMEOUT = float(os.getenv("PUBLISHER_BLOCK_TIMEOUT", 1.0))
+PUBLISHER_BATCH_SIZE = int(os.getenv("PUBLISHER_BATCH_SIZE", 500))
+PUBLISHER_SPILL_DIR = os.getenv("PUBLISHER_SPILL_DIR", os.path.join(tempfile.gettempdir(), "clothesure-outbox"))
+PUBLISHER_MAX_BACKOFF = float(os.getenv("PUBLISHER_MAX_BACKOFF", 30.0))
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "spill")
+
+# (exchange, routing_key, persistent, mensaje, momento de encolado)
+Envelope = Tuple[str, str, bool, Any, float]
+
+enqueued_total = registry.counter("publisher_enqueued_total", "Mensajes aceptados en el outbox")
+published_total = registry.counter("publisher_published_total", "Mensajes confirmados por el broker")
+dropped_total = registry.counter("publisher_dropped_total", "Mensajes descartados por outbox lleno o nack")
+spilled_total = registry.counter("publisher_spilled_total", "Mensajes escritos a disco por outbox lleno")
+retried_total = registry.counter("publisher_retried_total", "Mensajes reencolados por falta de confirm")
+publish_latency = registry.histogram(
+    "publisher_publish_latency_seconds", "Tiempo desde que se encola un mensaje hasta su confirm"
+)
+
+
+class AsyncMessagePublisher(MessagePublisher):
+    """
+    Misma interfaz que MessagePublisher (publish_persistence_event, ...),
+    pero publish_message solo encola. No toca la conexión en __init__: la
+    abre y configura el hilo de I/O en start().
+    """
+
+    def __init__(
+        self,
+        connection: RabbitMQConnection,
+        max_queue: int = PUBLISHER_QUEUE_SIZE,
+        policy: str = PUBLISHER_OVERFLOW_POLICY,
+        batch_size: int = PUBLISHER_BATCH_SIZE,
+        block_timeout: float = PUBLISHER_BLOCK_TIMEOUT,
+        spill_dir: str = PUBLISHER_SPILL_DIR,
+        serializer=None
+    ):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Política de outbox desconocida: {policy} (opciones: {', '.join(OVERFLOW_POLICIES)})")
+        self.connection = connection
+        self.serializer = serializer or get_serializer()
+        self.max_queue = max_queue
+        self.policy = policy
+        self.batch_size = batch_size
+        self.block_timeout = block_timeout
+
+        self._queue: Deque[Envelope] = deque()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._publisher: Optional[MessagePublisher] = None
+
+        self._spill_lock = threading.Lock()
+        self._spill_path = os.path.join(spill_dir, "outbox-spill.jsonl")
+        self._replay_path = os.path.join(spill_dir, "outbox-replay.jsonl")
+        self._spilled_pending = 0
+        self._replay_offset = 0
+        if policy == "spill":
+            os.makedirs(spill_dir, exist_ok=True)
+
+        registry.gauge("publisher_queue_depth", "Mensajes en el outbox en memoria", lambda: len(self._queue))
+        registry.gauge("publisher_spill_pending", "Mensajes en el archivo de spill", lambda: self._spilled_pending)
+
+    # ------------------------------------------------------------------
+    # Lado de los handlers
+    # ------------------------------------------------------------------
+    def publish_message(
+        self,
+        message: Any,
+        exchange: Optional[str] = None,
+        routing_key: str = '',
+        persistent: bool = True
+    ) -> bool:
+        """Encola el mensaje; False solo si la política lo rechazó (block con timeout)."""
+        exchange, routing_key = resolve_target(message, exchange, routing_key)
+        envelope = (exchange, routing_key, persistent, message, time.monotonic())
+        with self._cond:
+            full = len(self._queue) >= self.max_queue
+            if not full or self.policy != "spill":
+                if full and self.policy == "drop_oldest":
+                    self._queue.popleft()
+                    dropped_total.inc()
+                elif full and not self._cond.wait_for(lambda: len(self._queue) < self.max_queue, self.block_timeout):
+                    dropped_total.inc()
+                    logger.warning("⚠️ Outbox lleno: mensaje descartado tras esperar")
+                    return False
+                self._queue.append(envelope)
+                self._cond.notify_all()
+                enqueued_total.inc()
+                return True
+        # La escritura a disco se hace fuera del lock del outbox
+        self._spill([envelope])
+        return True
+
+    def publish_batch_messages(self, messages: list, **kwargs) -> Dict[str, Any]:
+        accepted = sum(1 for message in messages if self.publish_message(message, **kwargs))
+        return {'success': accepted, 'failed': len(messages) - accepted}
+
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    # ------------------------------------------------------------------
+    # Disco
+    # ------------------------------------------------------------------
+    def _spill(self, envelopes: List[Envelope]) -> None:
+        lines = "".join(
+            json.dumps(
+                {"exchange": e[0], "routing_key": e[1], "persistent": e[2], "message": e[3]},
+                ensure_ascii=False, default=str
+            ) + "\n"
+            for e in envelopes
+        )
+        with self._spill_lock:
+            with open(self._spill_path, "a", encoding="utf-8") as spill_file:
+                spill_file.write(lines)
+            self._spilled_pending += len(envelopes)
+        spilled_total.inc(len(envelopes))
+
+    def _take_spilled(self) -> Tuple[List[Envelope], int]:
+        """
+        Siguiente bloque de mensajes en disco y el offset tras leerlo. El
+        archivo de spill pasa a replay con un rename atómico; un replay que
+        quedó de un proceso anterior se reenvía primero (al menos una vez).
+        """
+        with self._spill_lock:
+            if not os.path.exists(self._replay_path):
+                if not os.path.exists(self._spill_path):
+                    return [], 0
+                os.replace(self._spill_path, self._replay_path)
+                self._spilled_pending = 0
+                self._replay_offset = 0
+
+        envelopes = []
+        now = time.monotonic()
+        with open(self._replay_path, "rb") as replay_file:
+            replay_file.seek(self._replay_offset)
+            while len(envelopes) < self.batch_size:
+                line = replay_file.readline()
+                if not line:
+                    break
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue  # Línea cortada por un cierre abrupto
+                envelopes.append((item["exchange"], item["routing_key"], item["persistent"], item["message"], now))
+            offset = replay_file.tell()
+
+        if not envelopes:
+            os.remove(self._replay_path)
+            self._replay_offset = 0
+        return envelopes, offset
+
+    # ------------------------------------------------------------------
+    # Hilo de I/O
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="publisher-io", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Intenta vaciar el outbox durante `timeout` y cierra la conexión."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+        with self._cond:
+            leftovers = list(self._queue)
+            self._queue.clear()
+        if leftovers:
+            if self.policy == "spill":
+                self._spill(leftovers)
+                logger.info(f"💾 {len(leftovers)} mensajes del outbox guardados en disco")
+            else:
+                dropped_total.inc(len(leftovers))
+                logger.warning(f"⚠️ {len(leftovers)} mensajes del outbox sin publicar al cerrar")
+        self.connection.disconnect()
+
+    def _connect(self) -> bool:
+        if self._publisher is not None and self.connection.is_connected():
+            return True
+        self._publisher = None
+        self.connection.disconnect()
+        if not self.connection.connect():
+            return False
+        try:
+            self._publisher = MessagePublisher(self.connection, serializer=self.serializer)
+            return True
+        except Exception:
+            return False
+
+    def _has_spilled(self) -> bool:
+        return self.policy == "spill" and (os.path.exists(self._replay_path) or os.path.exists(self._spill_path))
+
+    def _next_batch(self, wait: bool = True) -> List[Envelope]:
+        with self._cond:
+            if wait and not self._queue and not self._stop.is_set():
+                self._cond.wait(timeout=1.0)
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if batch:
+                self._cond.notify_all()  # Hay hueco para los handlers en modo block
+        return batch
+
+    def _publish(self, batch: List[Envelope]) -> List[Envelope]:
+        """Publica el lote agrupado por destino; devuelve lo que no quedó confirmado."""
+        groups: Dict[Tuple[str, str, bool], List[Envelope]] = {}
+        for envelope in batch:
+            groups.setdefault(envelope[:3], []).append(envelope)
+
+        failed: List[Envelope] = []
+        for (exchange, routing_key, persistent), envelopes in groups.items():
+            result = self._publisher.publish_batch_messages(
+                [envelope[3] for envelope in envelopes],
+                exchange=exchange, routing_key=routing_key, persistent=persistent
+            )
+            now = time.monotonic()
+            rejected = set(result['nacked']) | set(result['invalid'])
+            retry = set(result['unconfirmed'])
+            for index, envelope in enumerate(envelopes):
+                if index in retry:
+                    failed.append(envelope)
+                elif index not in rejected:
+                    publish_latency.observe(now - envelope[4])
+            published_total.inc(result['success'])
+            if rejected:
+                # Un nack o un mensaje no serializable no se arregla reintentando
+                dropped_total.inc(len(rejected))
+                logger.error(f"❌ {len(rejected)} mensajes rechazados en '{exchange}'")
+        return failed
+
+    def _run(self) -> None:
+        backoff = 0.5
+        pending: List[Envelope] = []
+        replaying = False
+        replay_offset = 0
+        while True:
+            if not pending:
+                spilled = self._has_spilled()
+                pending = self._next_batch(wait=not spilled)
+                replaying = False
+                if not pending and spilled and not self._stop.is_set():
+                    pending, replay_offset = self._take_spilled()
+                    replaying = bool(pending)
+                if not pending:
+                    if self._stop.is_set():
+                        return
+                    continue
+
+            failed = self._publish(pending) if self._connect() else pending
+            if not failed:
+                if replaying:
+                    self._replay_offset = replay_offset
+                backoff = 0.5
+                pending = []
+                continue
+
+            retried_total.inc(len(failed))
+            self._publisher = None  # Se comprueba la conexión antes de reintentar
+            if self._stop.is_set():
+                # close() guarda en disco o descarta lo que quede; un replay sigue en su archivo
+                if not replaying:
+                    with self._cond:
+                        self._queue.extendleft(reversed(failed))
+                return
+            logger.warning(f"⚠️ {len(failed)} mensajes sin confirmar, reintento del outbox en {backoff:.1f} s")
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, PUBLISHER_MAX_BACKOFF)
+            pending = failed
+
+
+def create_publisher(connection: RabbitMQConnection) -> MessagePublisher:
+    """
+    Publisher de la API según PUBLISHER_MODE: "async" (outbox + hilo de I/O,
+    por defecto) o "sync" (MessagePublisher bloqueante, conecta aquí). En
+    modo sync, con RABBITMQ_POOL_SIZE > 1 los hilos del threadpool publican
+    en paralelo sobre un RabbitMQConnectionPool en lugar de turnarse la
+    única conexión.
+    """
+    if PUBLISHER_MODE == "sync":
+        if RABBITMQ_POOL_SIZE > 1:
+            connection = RabbitMQConnectionPool(url=connection.url, size=RABBITMQ_POOL_SIZE)
+        if not connection.connect():
+            raise ConnectionError("No se pudo conectar a RabbitMQ")
+        return MessagePublisher(connection)
+    publisher = AsyncMessagePublisher(connection)
+    publisher.start()
+    return publisher
@@ -2,155 +2,536 @@
 Módulo para consumo de mensajes de RabbitMQ (CloudAMQP)
 """
 
-import json
+import functools
 import logging
+import os
 import threading
 import time
-from typing import Callable, Optional, Dict, Any
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, Dict, Any, Deque, Iterable, List, Tuple, Union
 from app.core.connection import RabbitMQConnection
+from app.core.topology import declare_topology
+from app.core.serialization import decode_message
 
 logger = logging.getLogger(__name__)
 
+# event_id recientes ya procesados (los eventos del outbox pueden llegar repetidos)
+RECENT_EVENT_IDS = 10000
+
+# Por defecto: un mensaje en vuelo por cola, procesado en el hilo de la conexión
+CONSUMER_PREFETCH = int(os.getenv("CONSUMER_PREFETCH", 1))
+CONSUMER_WORKERS = int(os.getenv("CONSUMER_WORKERS", 1))
+CONSUMER_ACK_BATCH = int(os.getenv("CONSUMER_ACK_BATCH", 1))
+CONSUMER_ACK_INTERVAL = float(os.getenv("CONSUMER_ACK_INTERVAL", 0.2))
+# Micro-lotes de persistencia: tamaño máximo y espera máxima para completar uno
+CONSUMER_BATCH_SIZE = int(os.getenv("CONSUMER_BATCH_SIZE", 200))
+CONSUMER_BATCH_WAIT = float(os.getenv("CONSUMER_BATCH_WAIT", 0.5))
+
+# (message_data, method, properties) de un mensaje dentro de un micro-lote
+BatchItem = Tuple[Any, Any, Any]
+
+
+class _AckBatcher:
+    """
+    Acks de un canal agrupados con multiple=True. Los mensajes pueden
+    terminar en desorden (pool de workers), así que solo se confirma hasta
+    el prefijo de entregas ya resueltas. Los fallos se rechazan al momento y
+    de uno en uno. Solo se usa desde el hilo de la conexión.
+    """
+
+    def __init__(self, channel, batch_size: int):
+        self.channel = channel
+        self.batch_size = max(1, batch_size)
+        self.outstanding: Deque[int] = deque()
+        self.settled: Dict[int, bool] = {}
+        self.last_ready: Optional[int] = None
+        self.ready_count = 0
+
+    def delivered(self, delivery_tag: int) -> None:
+        self.outstanding.append(delivery_tag)
+
+    def settle(self, delivery_tag: int, ok: bool) -> None:
+        if not self.channel.is_open:
+            return  # Canal cerrado: el broker reentrega lo no confirmado
+        if not ok:
+            self.channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
+        self.settled[delivery_tag] = ok
+        while self.outstanding and self.outstanding[0] in self.settled:
+            tag = self.outstanding.popleft()
+            if self.settled.pop(tag):
+                self.last_ready = tag
+                self.ready_count += 1
+        if self.ready_count >= self.batch_size or (self.ready_count and not self.outstanding):
+            self.flush()
+
+    def settle_many(self, results: List[Tuple[int, bool]]) -> None:
+        for delivery_tag, ok in results:
+            self.settle(delivery_tag, ok)
+        self.flush()
+
+    def flush(self) -> None:
+        if self.last_ready is not None and self.channel.is_open:
+            self.channel.basic_ack(delivery_tag=self.last_ready, multiple=True)
+        self.last_ready = None
+        self.ready_count = 0
+
 
 class MessageConsumer:
-    def __init__(self, connection: RabbitMQConnection):
+    """
+    Consume cada cola en su propio hilo y con su propia conexión.
+
+    Con workers > 1 los mensajes se procesan en un pool de hilos y el
+    resultado vuelve al hilo de la conexión con add_callback_threadsafe (pika
+    no es thread-safe); prefetch_count limita los mensajes en vuelo por cola
+    y ack_batch_size agrupa los acks con multiple=True.
+    """
+
+    def __init__(
+        self,
+        connection: RabbitMQConnection,
+        prefetch_count: int = CONSUMER_PREFETCH,
+        workers: int = CONSUMER_WORKERS,
+        ack_batch_size: int = CONSUMER_ACK_BATCH,
+        ack_interval: float = CONSUMER_ACK_INTERVAL
+    ):
         self.connection = connection
+        self.prefetch_count = prefetch_count
+        self.workers = workers
+        self.ack_batch_size = ack_batch_size
+        self.ack_interval = ack_interval
+        self._executor = (
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="consumer-worker") if workers > 1 else None
+        )
         self._consuming = False
         self._consumer_threads = {}
+        self._stopped_threads: List[threading.Thread] = []
+        self._active_channels: Dict[str, Tuple[Any, Any]] = {}
+        self._persistence_handlers: Dict[str, Callable] = {}
+        self._persistence_batch_handlers: Dict[str, Callable] = {}
+        self._recent_event_ids: "OrderedDict[str, None]" = OrderedDict()
+        self._recent_lock = threading.Lock()
         self._setup_exchanges_and_queues()
 
     def _setup_exchanges_and_queues(self):
         try:
-            channel = self.connection.get_channel()
+            declare_topology(self.connection.get_channel())
+            logger.info("✅ Exchanges y colas configurados correctamente")
 
-            # Declarar el exchange principal
-            channel.exchange_declare(
-                exchange='events_exchange',
-                exchange_type='fanout',
-                durable=True
-            )
+        except Exception as e:
+            logger.error(f"❌ Error al configurar exchanges y colas: {e}")
+            raise
 
-            # Declarar las colas con sus parámetros
-            channel.queue_declare(
-                queue='reacciones_cola',
-                durable=True,
-                arguments={
-                    'x-message-ttl': 10000,
-                    'x-max-length': 5000
-                }
-            )
+    def _process_message(self, callback: Callable, queue_name: str, method, properties, body) -> bool:
+        try:
+            message_data = decode_message(body, properties)
 
-            channel.queue_declare(
-                queue='persistencia_cola',
-                durable=True,
-                arguments={
-                    'x-dead-letter-exchange': 'x-dead-letter-exchange'
-                }
-            )
+            logger.debug(f"📨 Mensaje recibido en '{queue_name}': {message_data}")
 
-            # Hacer binding de las colas al exchange
-            channel.queue_bind(exchange='events_exchange', queue='reacciones_cola')
-            channel.queue_bind(exchange='events_exchange', queue='persistencia_cola')
+            callback(message_data, method, properties)
+            return True
 
-            logger.info("✅ Exchanges y colas configurados correctamente")
+        except Exception as e:
+            logger.error(f"❌ Error procesando mensaje en '{queue_name}': {e}")
+            return False
 
+    def _process_in_worker(self, callback: Callable, queue_name: str, blocking_connection,
+                           acks: Optional[_AckBatcher], method, properties, body):
+        ok = self._process_message(callback, queue_name, method, properties, body)
+        if acks is None:
+            return
+        try:
+            blocking_connection.add_callback_threadsafe(functools.partial(acks.settle, method.delivery_tag, ok))
         except Exception as e:
-            logger.error(f"❌ Error al configurar exchanges y colas: {e}")
-            raise
+            logger.warning(f"⚠️ No se pudo confirmar el mensaje en '{queue_name}' (se reentregará): {e}")
 
-    def _create_callback_wrapper(self, callback: Callable, queue_name: str) -> Callable:
+    def _create_callback_wrapper(self, callback: Callable, queue_name: str, blocking_connection,
+                                 acks: Optional[_AckBatcher]) -> Callable:
         def wrapped_callback(ch, method, properties, body):
+            if acks is not None:
+                acks.delivered(method.delivery_tag)
+            if self._executor is not None:
+                self._executor.submit(
+                    self._process_in_worker, callback, queue_name, blocking_connection, acks, method, properties, body
+                )
+                return
+            ok = self._process_message(callback, queue_name, method, properties, body)
+            if acks is not None:
+                acks.settle(method.delivery_tag, ok)
+
+        return wrapped_callback
+
+    def _process_batch(self, batch_callback: Callable, queue_name: str,
+                       batch: List[Tuple[Any, Any, bytes]]) -> Union[List[Tuple[int, bool]], Future]:
+        items: List[BatchItem] = []
+        undecodable: List[Tuple[int, bool]] = []
+        for method, properties, body in batch:
             try:
-                message_str = body.decode('utf-8')
-                try:
-                    message_data = json.loads(message_str)
-                except json.JSONDecodeError:
-                    message_data = message_str
+                items.append((decode_message(body, properties), method, properties))
+            except Exception as e:
+                logger.error(f"❌ Mensaje ilegible en '{queue_name}': {e}")
+                undecodable.append((method.delivery_tag, False))
+        tags = [method.delivery_tag for _, method, _ in items]
 
-                logger.debug(f"📨 Mensaje recibido en '{queue_name}': {message_data}")
+        def settled_with(outcome) -> List[Tuple[int, bool]]:
+            return undecodable + list(zip(tags, outcome if outcome is not None else [True] * len(tags)))
 
-                callback(message_data, method, properties)
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+        def failed(e: Exception) -> List[Tuple[int, bool]]:
+            logger.error(f"❌ Error procesando lote de {len(items)} mensajes en '{queue_name}': {e}")
+            return settled_with([False] * len(tags))
 
+        try:
+            results = batch_callback(items) if items else None
+        except Exception as e:
+            return failed(e)
+
+        if not isinstance(results, Future):
+            return settled_with(results)
+
+        # Resultado diferido (p. ej. hasta el próximo flush): se confirma al resolverse
+        settled: Future = Future()
+
+        def done(future: Future):
+            try:
+                settled.set_result(settled_with(future.result()))
             except Exception as e:
-                logger.error(f"❌ Error procesando mensaje en '{queue_name}': {e}")
-                ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+                settled.set_result(failed(e))
+
+        results.add_done_callback(done)
+        return settled
 
+    def _settle_batch(self, queue_name: str, blocking_connection, acks: _AckBatcher,
+                      results: Union[List[Tuple[int, bool]], Future], threadsafe: bool):
+        if isinstance(results, Future):
+            results.add_done_callback(
+                lambda future: self._settle_batch(queue_name, blocking_connection, acks, future.result(), True)
+            )
+            return
+        if not threadsafe:
+            acks.settle_many(results)
+            return
+        try:
+            blocking_connection.add_callback_threadsafe(functools.partial(acks.settle_many, results))
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo confirmar el lote en '{queue_name}' (se reentregará): {e}")
+
+    def _run_batch_in_worker(self, batch_callback: Callable, queue_name: str, blocking_connection,
+                             acks: _AckBatcher, batch: List[Tuple[Any, Any, bytes]]):
+        results = self._process_batch(batch_callback, queue_name, batch)
+        self._settle_batch(queue_name, blocking_connection, acks, results, threadsafe=True)
+
+    def _create_batch_wrapper(self, batch_callback: Callable, queue_name: str, blocking_connection,
+                              acks: _AckBatcher, batch_size: int, max_wait: float) -> Callable:
+        """
+        Acumula mensajes hasta batch_size o max_wait segundos y entrega el
+        lote completo a batch_callback. Los acks se envían cuando el callback
+        termina (después de su commit) o, si devuelve un Future, cuando este
+        se resuelve.
+        """
+        pending: List[Tuple[Any, Any, bytes]] = []
+
+        def dispatch():
+            if not pending:
+                return
+            batch = pending[:]
+            pending.clear()
+            if self._executor is not None:
+                self._executor.submit(self._run_batch_in_worker, batch_callback, queue_name, blocking_connection, acks, batch)
+            else:
+                results = self._process_batch(batch_callback, queue_name, batch)
+                self._settle_batch(queue_name, blocking_connection, acks, results, threadsafe=False)
+
+        def tick():
+            dispatch()
+            if acks.channel.is_open:
+                blocking_connection.call_later(max_wait, tick)
+
+        def wrapped_callback(ch, method, properties, body):
+            acks.delivered(method.delivery_tag)
+            pending.append((method, properties, body))
+            if len(pending) >= batch_size:
+                dispatch()
+
+        blocking_connection.call_later(max_wait, tick)
         return wrapped_callback
 
-    def start_consuming(self, queue_name: str, callback: Callable, auto_ack: bool = False) -> bool:
+    def _new_connection(self) -> RabbitMQConnection:
+        """Conexión propia para el hilo de una cola, con la misma configuración."""
+        base = self.connection
+        return RabbitMQConnection(
+            url=base.url,
+            max_retries=base.max_retries,
+            retry_delay=base.retry_delay,
+            heartbeat=base.heartbeat,
+            blocked_connection_timeout=base.blocked_connection_timeout
+        )
+
+    def _schedule_ack_flush(self, blocking_connection, acks: _AckBatcher):
+        """Vacía periódicamente los acks acumulados que no llenaron un lote."""
+        def tick():
+            acks.flush()
+            if acks.channel.is_open:
+                blocking_connection.call_later(self.ack_interval, tick)
+
+        blocking_connection.call_later(self.ack_interval, tick)
+
+    def start_consuming(self, queue_name: str, callback: Callable, auto_ack: bool = False,
+                        batch: Optional[Tuple[int, float]] = None) -> bool:
         try:
             if queue_name in self._consumer_threads:
                 logger.warning(f"⚠️ Ya se está consumiendo la cola '{queue_name}'")
                 return False
 
-            wrapped_callback = self._create_callback_wrapper(callback, queue_name)
+            self._consuming = True
             consumer_thread = threading.Thread(
                 target=self._consume_queue,
-                args=(queue_name, wrapped_callback, auto_ack),
+                args=(queue_name, callback, auto_ack, batch),
                 daemon=True
             )
-            consumer_thread.start()
             self._consumer_threads[queue_name] = consumer_thread
+            consumer_thread.start()
 
-            logger.info(f"🎧 Iniciando consumo de la cola '{queue_name}'")
+            logger.info(
+                f"🎧 Iniciando consumo de la cola '{queue_name}' "
+                f"(prefetch={self.prefetch_count}, workers={self.workers}, ack_batch={self.ack_batch_size})"
+            )
             return True
 
         except Exception as e:
             logger.error(f"❌ Error al iniciar consumo de '{queue_name}': {e}")
             return False
 
-    def _consume_queue(self, queue_name: str, callback: Callable, auto_ack: bool):
-        while self._consuming:
+    def start_batch_consuming(
+        self,
+        queue_name: str,
+        batch_callback: Callable[[List[BatchItem]], Optional[List[bool]]],
+        batch_size: int = CONSUMER_BATCH_SIZE,
+        max_wait: float = CONSUMER_BATCH_WAIT
+    ) -> bool:
+        """
+        Consume `queue_name` en micro-lotes. batch_callback recibe la lista de
+        (message_data, method, properties) y devuelve None (todo bien) o un
+        bool por mensaje, o un Future con ese mismo resultado para confirmar
+        más tarde; si lanza una excepción se rechaza el lote entero.
+        """
+        return self.start_consuming(queue_name, batch_callback, batch=(batch_size, max_wait))
+
+    def _consume_queue(self, queue_name: str, callback: Callable, auto_ack: bool,
+                       batch: Optional[Tuple[int, float]] = None):
+        conn = self._new_connection()
+        acks: Optional[_AckBatcher] = None
+        while self._consuming and queue_name in self._consumer_threads:
             try:
-                channel = self.connection.get_channel()
-                channel.basic_qos(prefetch_count=1)
-                channel.basic_consume(queue=queue_name, on_message_callback=callback, auto_ack=auto_ack)
+                if not conn.is_connected() and not conn.connect():
+                    raise ConnectionError("RabbitMQ no disponible")
+                channel = conn.get_channel()
+
+                if batch:
+                    # Con menos prefetch que el lote, el lote nunca se llena
+                    channel.basic_qos(prefetch_count=max(self.prefetch_count, batch[0] * 2))
+                    acks = _AckBatcher(channel, batch[0])
+                    wrapped_callback = self._create_batch_wrapper(callback, queue_name, conn.connection, acks, *batch)
+                    auto_ack = False
+                else:
+                    channel.basic_qos(prefetch_count=self.prefetch_count)
+                    acks = None if auto_ack else _AckBatcher(channel, self.ack_batch_size)
+                    wrapped_callback = self._create_callback_wrapper(callback, queue_name, conn.connection, acks)
+                channel.basic_consume(queue=queue_name, on_message_callback=wrapped_callback, auto_ack=auto_ack)
+                if acks is not None and not batch and self.ack_batch_size > 1:
+                    self._schedule_ack_flush(conn.connection, acks)
+                self._active_channels[queue_name] = (conn.connection, channel)
 
                 logger.info(f"🎧 Escuchando mensajes en la cola '{queue_name}'...")
                 channel.start_consuming()
 
             except Exception as e:
                 logger.error(f"❌ Error en consumo de '{queue_name}': {e}")
-                if not self.connection.ensure_connection():
-                    logger.warning(f"⚠️ No se pudo reconectar para '{queue_name}', reintentando en 5 segundos...")
+                conn.disconnect()
+                if self._consuming and queue_name in self._consumer_threads:
+                    logger.warning(f"⚠️ Reintentando '{queue_name}' en 5 segundos...")
                     time.sleep(5)
 
+        self._drain(conn, acks)
+        self._active_channels.pop(queue_name, None)
+        conn.disconnect()
+
+    def _drain(self, conn: RabbitMQConnection, acks: Optional[_AckBatcher], timeout: float = 5.0):
+        """Al parar, espera a los mensajes en proceso para confirmarlos."""
+        if acks is None or not conn.is_connected():
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            while acks.outstanding and time.monotonic() < deadline:
+                conn.connection.process_data_events(time_limit=0.1)
+            acks.flush()
+        except Exception as e:
+            logger.warning(f"⚠️ Error confirmando mensajes pendientes: {e}")
+
     def stop_consuming(self, queue_name: Optional[str] = None):
-        if queue_name:
-            if queue_name in self._consumer_threads:
-                del self._consumer_threads[queue_name]
-                logger.info(f"⏹️ Deteniendo consumo de la cola '{queue_name}'")
-        else:
+        queues = [queue_name] if queue_name else list(self._consumer_threads)
+        if not queue_name:
             self._consuming = False
-            self._consumer_threads.clear()
+
+        for name in queues:
+            thread = self._consumer_threads.pop(name, None)
+            if thread is None:
+                continue
+            self._stopped_threads.append(thread)
+            active = self._active_channels.get(name)
+            if active:
+                blocking_connection, channel = active
+                try:
+                    blocking_connection.add_callback_threadsafe(channel.stop_consuming)
+                except Exception:
+                    pass
+            logger.info(f"⏹️ Deteniendo consumo de la cola '{name}'")
+
+        if not queue_name:
             logger.info("⏹️ Deteniendo todos los consumos")
 
-    def start_all_consuming(self):
+    def join(self, timeout: float = 10.0):
+        """Espera a que los hilos detenidos confirmen lo pendiente y cierren su conexión."""
+        deadline = time.monotonic() + timeout
+        while self._stopped_threads:
+            self._stopped_threads.pop().join(max(0.0, deadline - time.monotonic()))
+
+    def register_persistence_handler(self, event_type: str, handler: Callable):
+        """
+        Registra un handler(datos, message_data) para un evento de la cola de
+        persistencia. Si el handler lanza una excepción el mensaje se rechaza
+        y va al dead-letter exchange.
+        """
+        self._persistence_handlers[event_type] = handler
+        logger.info(f"🧩 Handler registrado para evento de persistencia '{event_type}'")
+
+    def register_persistence_batch_handler(self, event_types: Iterable[str], handler: Callable):
+        """
+        Registra un handler(eventos) que recibe juntos todos los eventos de
+        `event_types` de un micro-lote como lista de (datos, message_data).
+        Con algún handler de lote registrado, persistencia_cola se consume en
+        micro-lotes y los acks esperan al handler.
+
+        El handler (o el Future que devuelva) puede dar None (todo escrito)
+        o una lista de bool por evento para rechazar solo los que fallaron.
+        """
+        for event_type in event_types:
+            self._persistence_batch_handlers[event_type] = handler
+            logger.info(f"🧩 Handler de lote registrado para evento de persistencia '{event_type}'")
+
+    def start_all_consuming(self, batch_size: int = CONSUMER_BATCH_SIZE, batch_wait: float = CONSUMER_BATCH_WAIT):
+        """
+        Colas del worker. reacciones_cola no se consume aquí: es del servidor
+        Socket.IO, que emite like_update por cada evento, y un consumidor más
+        en competencia se quedaría con parte de los eventos sin emitirlos
+        (sin réplicas de Socket.IO los mensajes caducan por su x-message-ttl).
+        """
         self._consuming = True
-        self.start_consuming('reacciones_cola', self._default_reaction_callback)
-        self.start_consuming('persistencia_cola', self._default_persistence_callback)
-        logger.info("🚀 Iniciando consumo de todas las colas")
+        if self._persistence_batch_handlers:
+            self.start_batch_consuming('persistencia_cola', self._default_persistence_batch_callback, batch_size, batch_wait)
+        else:
+            self.start_consuming('persistencia_cola', self._default_persistence_callback)
+        logger.info("🚀 Iniciando consumo de las colas del worker (persistencia_cola)")
 
     def stop_all_consuming(self):
         """Detiene el consumo de todas las colas"""
         self.stop_consuming()
         logger.info("🛑 Deteniendo consumo de todas las colas")
 
-    def _default_reaction_callback(self, message_data: Any, method, properties):
-        logger.info(f"🔥 [REACCIONES] Procesando: {message_data}")
-        if isinstance(message_data, dict) and message_data.get('tipo') == 'reaccion':
-            user_id = message_data.get('usuario_id')
-            outfit_id = message_data.get('outfit_id')
-            action = message_data.get('accion')
-            logger.info(f"👤 Usuario {user_id} {action} outfit {outfit_id}")
-
     def _default_persistence_callback(self, message_data: Any, method, properties):
         logger.info(f"💾 [PERSISTENCIA] Procesando: {message_data}")
         if isinstance(message_data, dict) and message_data.get('tipo') == 'persistencia':
             event_type = message_data.get('evento')
             data = message_data.get('datos')
+            event_id = message_data.get('event_id') or getattr(properties, 'message_id', None)
+            if event_id and self._already_processed(event_id):
+                logger.info(f"🔁 Evento {event_id} duplicado, se descarta")
+                return
             logger.info(f"📊 Evento de persistencia: {event_type} - {data}")
+            handler = self._persistence_handlers.get(event_type)
+            if handler:
+                handler(data, message_data)
+            if event_id:
+                self._mark_processed(event_id)
+
+    def _default_persistence_batch_callback(self, items: List[BatchItem]) -> Union[List[bool], Future]:
+        """
+        Agrupa los eventos del lote por handler de lote; el resto pasa uno a
+        uno por _default_persistence_callback. Un fallo de un handler de lote
+        rechaza solo sus eventos. Si un handler devuelve un Future, el
+        resultado del lote también es un Future.
+        """
+        results = [True] * len(items)
+        grouped: Dict[Callable, List[Tuple[int, Dict, Dict, Optional[str]]]] = {}
+        for index, (message_data, method, properties) in enumerate(items):
+            handler = None
+            if isinstance(message_data, dict) and message_data.get('tipo') == 'persistencia':
+                handler = self._persistence_batch_handlers.get(message_data.get('evento'))
+            if handler is None:
+                try:
+                    self._default_persistence_callback(message_data, method, properties)
+                except Exception as e:
+                    logger.error(f"❌ Error procesando evento de persistencia: {e}")
+                    results[index] = False
+                continue
+            event_id = message_data.get('event_id') or getattr(properties, 'message_id', None)
+            if event_id and self._already_processed(event_id):
+                logger.info(f"🔁 Evento {event_id} duplicado, se descarta")
+                continue
+            grouped.setdefault(handler, []).append((index, message_data.get('datos'), message_data, event_id))
+
+        def finish(events, error: Optional[Exception], outcome: Optional[List[bool]] = None):
+            if error is not None:
+                logger.error(f"❌ Error en handler de lote ({len(events)} eventos): {error}")
+            for position, (index, _, _, event_id) in enumerate(events):
+                if error is not None or (outcome is not None and not outcome[position]):
+                    results[index] = False
+                elif event_id:
+                    self._mark_processed(event_id)
+
+        deferred: List[Tuple[Future, list]] = []
+        for handler, events in grouped.items():
+            try:
+                outcome = handler([(data, message_data) for _, data, message_data, _ in events])
+            except Exception as e:
+                finish(events, e)
+                continue
+            if isinstance(outcome, Future):
+                deferred.append((outcome, events))
+            else:
+                finish(events, None, outcome)
+
+        if not deferred:
+            return results
+
+        # Algún handler confirma más tarde (EngagementSink tras su flush)
+        combined: Future = Future()
+        remaining = [len(deferred)]
+        lock = threading.Lock()
+
+        def make_done(events):
+            def done(future: Future):
+                error = future.exception()
+                finish(events, error, None if error is not None else future.result())
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    combined.set_result(results)
+            return done
+
+        for future, events in deferred:
+            future.add_done_callback(make_done(events))
+        return combined
+
+    def _already_processed(self, event_id: str) -> bool:
+        with self._recent_lock:
+            return event_id in self._recent_event_ids
+
+    def _mark_processed(self, event_id: str) -> None:
+        with self._recent_lock:
+            self._recent_event_ids[event_id] = None
+            if len(self._recent_event_ids) > RECENT_EVENT_IDS:
+                self._recent_event_ids.popitem(last=False)
 
     def get_queue_info(self, queue_name: str) -> Optional[Dict[str, Any]]:
         try:
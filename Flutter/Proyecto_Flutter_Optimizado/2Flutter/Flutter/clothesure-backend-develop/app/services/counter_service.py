@@ -0,0 +1,178 @@
+"""
+Contadores de fotos (views_count, reactions_count, comments_count) con
+escritura agrupada.
+
+Las fotos populares reciben muchas vistas y likes por segundo; un UPDATE por
+evento se queda esperando el lock de la fila. EngagementSink acumula los
+eventos y, en cada flush, aplica los deltas de todas las fotos con un único
+UPDATE ... FROM (VALUES ...) (apply_counter_deltas).
+
+Mientras tanto los deltas sin escribir se publican en pending_counters para
+que las lecturas los sumen a lo que hay en la tabla (with_pending_counts).
+El backend en memoria solo sirve dentro del proceso del worker; para que la
+API los vea hay que usar Redis (COUNTER_OVERLAY_BACKEND=redis).
+"""
+
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+from sqlalchemy import Integer, column, func, update, values
+from sqlalchemy.orm import Session
+
+from app.models.photo_model import Photo
+
+logger = logging.getLogger(__name__)
+
+COUNTER_COLUMNS = ('views_count', 'reactions_count', 'comments_count')
+COUNTER_OVERLAY_BACKEND = os.getenv("COUNTER_OVERLAY_BACKEND", "memory").lower()
+COUNTER_REDIS_URL = os.getenv("COUNTER_REDIS_URL", "redis://localhost:6379/0")
+# Si un worker cae antes de restar sus deltas, Redis los olvida tras este tiempo
+COUNTER_OVERLAY_TTL = int(os.getenv("COUNTER_OVERLAY_TTL", 120))
+
+# photo_id -> {columna: delta}
+Deltas = Dict[int, Dict[str, int]]
+
+
+def new_deltas() -> Deltas:
+    return defaultdict(lambda: defaultdict(int))
+
+
+def apply_counter_deltas(db: Session, deltas: Deltas) -> int:
+    """
+    Suma los deltas a photos en un solo UPDATE ... FROM (VALUES ...).
+    No hace commit. Devuelve el número de fotos actualizadas.
+    """
+    rows = [
+        (photo_id, *(changes.get(name, 0) for name in COUNTER_COLUMNS))
+        for photo_id, changes in sorted(deltas.items())  # Orden fijo de locks entre workers
+        if any(changes.values())
+    ]
+    if not rows:
+        return 0
+
+    if db.get_bind().dialect.name != "postgresql":
+        # Sin UPDATE ... FROM (VALUES) con nombres de columna (sqlite en pruebas)
+        for photo_id, *row_deltas in rows:
+            db.execute(update(Photo).where(Photo.id == photo_id).values({
+                name: func.coalesce(getattr(Photo, name), 0) + delta
+                for name, delta in zip(COUNTER_COLUMNS, row_deltas)
+            }))
+        return len(rows)
+
+    changes = values(
+        column("photo_id", Integer), *(column(name, Integer) for name in COUNTER_COLUMNS),
+        name="deltas"
+    ).data(rows)
+    db.execute(
+        update(Photo)
+        .where(Photo.id == changes.c.photo_id)
+        .values({
+            name: func.coalesce(getattr(Photo, name), 0) + changes.c[name]
+            for name in COUNTER_COLUMNS
+        })
+    )
+    return len(rows)
+
+
+# ----------------------------------------------------------------------
+# Deltas pendientes de escribir
+# ----------------------------------------------------------------------
+class InMemoryPendingCounters:
+    """Deltas sin escribir, locales al proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deltas: Deltas = new_deltas()
+
+    def add(self, deltas: Deltas, sign: int = 1) -> None:
+        with self._lock:
+            for photo_id, changes in deltas.items():
+                current = self._deltas[photo_id]
+                for name, delta in changes.items():
+                    current[name] += sign * delta
+                if not any(current.values()):
+                    del self._deltas[photo_id]
+
+    def subtract(self, deltas: Deltas) -> None:
+        self.add(deltas, sign=-1)
+
+    def get_many(self, photo_ids: Iterable[int]) -> Deltas:
+        with self._lock:
+            return {
+                photo_id: dict(self._deltas[photo_id])
+                for photo_id in photo_ids if photo_id in self._deltas
+            }
+
+
+class RedisPendingCounters:
+    """
+    Deltas sin escribir en un hash de Redis por foto, compartidos entre los
+    workers y la API. Cada worker suma al recibir y resta tras su commit.
+    """
+
+    def __init__(self, client, prefix: str = "counters:pending:", ttl: int = COUNTER_OVERLAY_TTL):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def add(self, deltas: Deltas, sign: int = 1) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for photo_id, changes in deltas.items():
+            key = f"{self.prefix}{photo_id}"
+            for name, delta in changes.items():
+                if delta:
+                    pipe.hincrby(key, name, sign * delta)
+            pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def subtract(self, deltas: Deltas) -> None:
+        self.add(deltas, sign=-1)
+
+    def get_many(self, photo_ids: Iterable[int]) -> Deltas:
+        photo_ids = list(photo_ids)
+        pipe = self.client.pipeline(transaction=False)
+        for photo_id in photo_ids:
+            pipe.hgetall(f"{self.prefix}{photo_id}")
+        result: Deltas = {}
+        for photo_id, raw in zip(photo_ids, pipe.execute()):
+            changes = {
+                (name.decode() if isinstance(name, bytes) else name): int(delta)
+                for name, delta in raw.items()
+            }
+            if any(changes.values()):
+                result[photo_id] = changes
+        return result
+
+
+def create_pending_counters(name: str = COUNTER_OVERLAY_BACKEND):
+    if name == "redis":
+        try:
+            import redis
+            return RedisPendingCounters(redis.Redis.from_url(COUNTER_REDIS_URL))
+        except ImportError:
+            logger.warning("⚠️ Paquete 'redis' no instalado, deltas pendientes solo en memoria")
+    return InMemoryPendingCounters()
+
+
+pending_counters = create_pending_counters()
+
+
+def with_pending_counts(photos: List, pending=None) -> List:
+    """
+    Suma a cada PhotoOut los deltas aún no escritos, para mostrar contadores
+    casi en tiempo real. Modifica los DTOs recibidos (no pasar modelos ORM:
+    quedarían como cambios pendientes de la sesión).
+    """
+    pending = pending if pending is not None else pending_counters
+    try:
+        deltas = pending.get_many(photo.id for photo in photos)
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudieron leer los contadores pendientes: {e}")
+        return photos
+    for photo in photos:
+        for name, delta in deltas.get(photo.id, {}).items():
+            setattr(photo, name, (getattr(photo, name) or 0) + delta)
+    return photos
@@ -0,0 +1,380 @@
+"""
+Persistencia en lote de vistas, reacciones y comentarios de fotos.
+
+La API publica 'photo_viewed', 'photo_reaction' y 'photo_commented' en
+persistencia_cola; el worker los recibe en micro-lotes
+(MessageConsumer.start_batch_consuming) y EngagementSink los acumula hasta
+el siguiente flush (cada ENGAGEMENT_FLUSH_INTERVAL segundos o al llegar a
+ENGAGEMENT_MAX_PENDING eventos), que escribe todo en una sola transacción:
+
+- INSERT en bloque en photo_views y photo_comments.
+- photo_reactions: por (foto, usuario, tipo) gana la última acción;
+  'like' inserta con ON CONFLICT DO NOTHING (índice único
+  uq_photo_reactions_photo_user_type) y 'unlike' borra la existente. Los
+  contadores suman solo las filas que el INSERT/DELETE devolvió, así que dos
+  workers con el mismo like no lo cuentan dos veces.
+- Un único UPDATE ... FROM (VALUES ...) con los deltas agregados de
+  views_count, reactions_count y comments_count (counter_service).
+
+Los mensajes se confirman después del commit del flush, así que un reinicio
+no pierde deltas: lo no escrito se reentrega. Los eventos de fotos o tipos
+de reacción que no existen se descartan. Si aun así una fila rompe la
+transacción (IntegrityError/DataError), el flush se reintenta por lote del
+consumidor y, dentro del lote que falla, evento por evento: solo los eventos
+malos van al dead-letter exchange. Los errores que no son de una fila (la
+base no responde, OperationalError) no rechazan nada: los lotes vuelven a la
+cola del sink sin confirmar y se reintentan con espera creciente, hasta
+ENGAGEMENT_MAX_RETRY_DELAY segundos entre flushes.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.db import SessionLocal
+from app.core.metrics import registry
+from app.models.comment_model import Comment
+from app.models.photo_model import Photo
+from app.models.photo_reactions_model import PhotoReaction
+from app.models.reaction_type_model import ReactionType
+from app.models.view_model import View
+from app.services.counter_service import Deltas, apply_counter_deltas, new_deltas, pending_counters
+
+logger = logging.getLogger(__name__)
+
+ENGAGEMENT_EVENTS = ('photo_viewed', 'photo_reaction', 'photo_commented')
+ENGAGEMENT_FLUSH_INTERVAL = float(os.getenv("ENGAGEMENT_FLUSH_INTERVAL", 1.0))
+ENGAGEMENT_MAX_PENDING = int(os.getenv("ENGAGEMENT_MAX_PENDING", 5000))
+ENGAGEMENT_MAX_RETRY_DELAY = float(os.getenv("ENGAGEMENT_MAX_RETRY_DELAY", 30.0))
+
+written_total = registry.counter("engagement_events_written_total", "Eventos de vistas/reacciones/comentarios persistidos")
+batch_seconds = registry.histogram("engagement_batch_seconds", "Duración de la escritura de un lote de eventos")
+flushed_photos_total = registry.counter("engagement_flushed_photos_total", "Filas de photos actualizadas por los flushes")
+flush_retries_total = registry.counter("engagement_flush_retries_total", "Flushes de engagement que fallaron sin culpa de una fila y se reintentan")
+
+# (datos, message_data) tal como los entrega el consumidor
+Event = Tuple[Dict[str, Any], Dict[str, Any]]
+
+# Errores de una fila concreta (FK, tipos): reintentar por separado sirve
+ROW_ERRORS = (IntegrityError, DataError)
+
+
+def _event_time(message_data: Dict[str, Any]) -> datetime:
+    """Momento en que la API publicó el evento (no cuando se escribe el lote)."""
+    timestamp = message_data.get('timestamp')
+    if timestamp:
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    return datetime.now(timezone.utc)
+
+
+def _insert_new_reactions(db: Session):
+    """INSERT en photo_reactions que ignora las reacciones que ya existen."""
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(PhotoReaction.__table__).on_conflict_do_nothing(
+        index_elements=['photo_id', 'user_id', 'reaction_type_id']
+    )
+
+
+def write_engagement_batch(db: Session, events: List[Event]) -> Dict[str, int]:
+    """
+    Escribe un lote de eventos de engagement y hace commit.
+    Devuelve cuántas filas se insertaron/borraron por tabla.
+    """
+    photo_ids = {data.get('photo_id') for data, _ in events}
+    existing = set(db.execute(select(Photo.id).where(Photo.id.in_(photo_ids))).scalars())
+    reaction_type_ids = {
+        data.get('reaction_type_id', 1) for data, message_data in events
+        if message_data.get('evento') == 'photo_reaction'
+    }
+    reaction_types = set(db.execute(
+        select(ReactionType.id).where(ReactionType.id.in_(reaction_type_ids))
+    ).scalars()) if reaction_type_ids else set()
+
+    views: List[Dict[str, Any]] = []
+    comments: List[Dict[str, Any]] = []
+    reactions: Dict[Tuple[int, int, int], str] = {}
+    deltas = new_deltas()
+    skipped = 0
+
+    for data, message_data in events:
+        photo_id, user_id = data.get('photo_id'), data.get('user_id')
+        if photo_id not in existing:
+            skipped += 1
+            continue
+        event_type = message_data.get('evento')
+        if event_type == 'photo_viewed':
+            views.append({'photo_id': photo_id, 'user_id': user_id, 'viewed_at': _event_time(message_data)})
+            deltas[photo_id]['views_count'] += 1
+        elif event_type == 'photo_commented':
+            created_at = _event_time(message_data)
+            comments.append({
+                'photo_id': photo_id,
+                'user_id': user_id,
+                'comment': data.get('comment'),
+                'created_at': created_at,
+                'updated_at': created_at,
+                'created_by': user_id,
+                'updated_by': user_id
+            })
+            deltas[photo_id]['comments_count'] += 1
+        elif event_type == 'photo_reaction':
+            reaction_type_id = data.get('reaction_type_id', 1)
+            if reaction_type_id not in reaction_types:
+                skipped += 1
+                continue
+            reactions[(photo_id, user_id, reaction_type_id)] = data.get('action', 'like')
+
+    if views:
+        db.execute(insert(View.__table__), views)
+    if comments:
+        db.execute(insert(Comment.__table__), comments)
+
+    added = removed = 0
+    if reactions:
+        new_rows = [
+            {'photo_id': p, 'user_id': u, 'reaction_type_id': t, 'created_by': u, 'updated_by': u}
+            for (p, u, t), action in reactions.items()
+            if action == 'like'
+        ]
+        to_remove = [key for key, action in reactions.items() if action == 'unlike']
+
+        # Solo cuentan las filas que de verdad se insertaron/borraron
+        inserted: List[int] = []
+        deleted: List[int] = []
+        if new_rows:
+            inserted = db.execute(
+                _insert_new_reactions(db).values(new_rows).returning(PhotoReaction.photo_id)
+            ).scalars().all()
+        if to_remove:
+            key_columns = tuple_(PhotoReaction.photo_id, PhotoReaction.user_id, PhotoReaction.reaction_type_id)
+            deleted = db.execute(
+                delete(PhotoReaction).where(key_columns.in_(to_remove)).returning(PhotoReaction.photo_id)
+            ).scalars().all()
+        for photo_id in inserted:
+            deltas[photo_id]['reactions_count'] += 1
+        for photo_id in deleted:
+            deltas[photo_id]['reactions_count'] -= 1
+        added, removed = len(inserted), len(deleted)
+
+    updated = apply_counter_deltas(db, deltas)
+    db.commit()
+
+    if skipped:
+        logger.warning(f"⚠️ {skipped} eventos de fotos o tipos de reacción inexistentes descartados")
+    written_total.inc(len(views) + len(comments) + added + removed)
+    flushed_photos_total.inc(updated)
+    return {'views': len(views), 'comments': len(comments), 'reactions_added': added,
+            'reactions_removed': removed, 'skipped': skipped}
+
+
+def estimate_deltas(events: List[Event]) -> Deltas:
+    """
+    Deltas que aportará un grupo de eventos, para mostrarlos antes del flush.
+    En reacciones es una estimación (un like repetido suma aquí y no en la
+    tabla); el valor real se calcula al escribir.
+    """
+    deltas = new_deltas()
+    for data, message_data in events:
+        photo_id = data.get('photo_id')
+        event_type = message_data.get('evento')
+        if event_type == 'photo_viewed':
+            deltas[photo_id]['views_count'] += 1
+        elif event_type == 'photo_commented':
+            deltas[photo_id]['comments_count'] += 1
+        elif event_type == 'photo_reaction':
+            deltas[photo_id]['reactions_count'] += -1 if data.get('action') == 'unlike' else 1
+    return deltas
+
+
+class EngagementSink:
+    """
+    Handler de lote para MessageConsumer.register_persistence_batch_handler.
+    Devuelve un Future por lote que se resuelve cuando el flush que lo
+    incluye hace commit; hasta entonces el consumidor no confirma los
+    mensajes. Si hubo que aislar eventos malos, el Future da una lista de
+    bool por evento. Si la base falla, el lote se queda pendiente y entra en
+    el siguiente flush.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        flush_interval: float = ENGAGEMENT_FLUSH_INTERVAL,
+        max_pending: int = ENGAGEMENT_MAX_PENDING,
+        pending=None
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending = pending if pending is not None else pending_counters
+        self._lock = threading.Lock()
+        # Un (eventos, Future) por lote del consumidor
+        self._batches: List[Tuple[List[Event], Future]] = []
+        self._pending_events = 0
+        self._estimated = new_deltas()
+        self._failures = 0  # flushes seguidos que fallaron sin culpa de una fila
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __call__(self, events: List[Event]) -> Future:
+        future: Future = Future()
+        estimated = estimate_deltas(events)
+        with self._lock:
+            self._start()
+            self._batches.append((events, future))
+            self._pending_events += len(events)
+            for photo_id, changes in estimated.items():
+                for name, delta in changes.items():
+                    self._estimated[photo_id][name] += delta
+            full = self._pending_events >= self.max_pending
+        self._publish_pending(estimated, sign=1)
+        if full:
+            self._wake.set()
+        return future
+
+    def pending_deltas(self, photo_ids: Optional[List[int]] = None) -> Deltas:
+        """Deltas recibidos por este sink y aún no escritos."""
+        with self._lock:
+            return {
+                photo_id: dict(changes) for photo_id, changes in self._estimated.items()
+                if photo_ids is None or photo_id in photo_ids
+            }
+
+    def _publish_pending(self, deltas: Deltas, sign: int) -> None:
+        try:
+            self.pending.add(deltas, sign=sign)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudieron publicar los contadores pendientes: {e}")
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="engagement-sink", daemon=True)
+            self._thread.start()
+
+    def flush(self) -> int:
+        """Escribe todo lo acumulado en una transacción. Devuelve los eventos escritos."""
+        with self._lock:
+            batches, self._batches = self._batches, []
+            self._pending_events = 0
+            estimated, self._estimated = self._estimated, new_deltas()
+        events = [event for batch, _ in batches for event in batch]
+        if not events:
+            for _, future in batches:
+                future.set_result(None)
+            return 0
+
+        started = time.perf_counter()
+        outcomes: List[Any]
+        try:
+            result = self._write(events)
+            outcomes = [None] * len(batches)
+        except ROW_ERRORS as e:
+            logger.warning(f"⚠️ Flush de {len(events)} eventos rechazado ({e}); se reintenta por lote")
+            result = None
+            outcomes = [self._write_isolated(batch, whole_first=len(batches) > 1) for batch, _ in batches]
+        except Exception as e:
+            result = None
+            outcomes = [e] * len(batches)
+
+        retry = [(batch, future) for (batch, future), outcome in zip(batches, outcomes) if isinstance(outcome, Exception)]
+        if retry:
+            self._requeue(retry)
+            error = next(outcome for outcome in outcomes if isinstance(outcome, Exception))
+            logger.error(f"❌ Flush de engagement fallido ({error}); {sum(len(b) for b, _ in retry)} eventos se reintentan")
+            # Escritos o rechazados (dead-letter) ya no están pendientes
+            estimated = estimate_deltas([
+                event for (batch, _), outcome in zip(batches, outcomes)
+                if not isinstance(outcome, Exception) for event in batch
+            ])
+        self._failures = self._failures + 1 if retry else 0
+        self._publish_pending(estimated, sign=-1)
+
+        written = rejected = 0
+        for (batch, future), outcome in zip(batches, outcomes):
+            if isinstance(outcome, Exception):
+                continue
+            future.set_result(outcome)
+            ok = len(batch) if outcome is None else sum(outcome)
+            written += ok
+            rejected += len(batch) - ok
+        if rejected:
+            logger.error(f"❌ {rejected} de {len(events)} eventos de engagement rechazados")
+        if result is not None:
+            batch_seconds.observe(time.perf_counter() - started)
+            logger.info(f"💾 Flush de engagement: {result}")
+        return written
+
+    def _requeue(self, batches: List[Tuple[List[Event], Future]]) -> None:
+        """Devuelve lotes no escritos al principio de la cola, sin resolver sus Futures."""
+        flush_retries_total.inc()
+        with self._lock:
+            self._batches[:0] = batches
+            for batch, _ in batches:
+                self._pending_events += len(batch)
+                for photo_id, changes in estimate_deltas(batch).items():
+                    for name, delta in changes.items():
+                        self._estimated[photo_id][name] += delta
+
+    def _write(self, events: List[Event]) -> Dict[str, int]:
+        with self.session_factory() as db:
+            try:
+                return write_engagement_batch(db, events)
+            except Exception:
+                db.rollback()
+                raise
+
+    def _write_isolated(self, events: List[Event], whole_first: bool) -> Union[None, List[bool], Exception]:
+        """
+        Reintenta un lote del consumidor en su propia transacción y, si aún
+        falla por una fila, evento por evento. Devuelve None si se escribió
+        entero, un bool por evento si hubo que separarlos, o la excepción si
+        el error no es de una fila (p. ej. la base no responde).
+        """
+        try:
+            if whole_first:
+                try:
+                    self._write(events)
+                    return None
+                except ROW_ERRORS:
+                    pass
+            written = []
+            for event in events:
+                try:
+                    self._write([event])
+                    written.append(True)
+                except ROW_ERRORS as e:
+                    logger.error(f"❌ Evento de engagement rechazado ({event[1].get('evento')}): {e}")
+                    written.append(False)
+            return written
+        except Exception as e:
+            return e
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self._failures:
+                # La base falló: espera creciente, sin que max_pending la adelante
+                self._stop.wait(min(self.flush_interval * 2 ** self._failures, ENGAGEMENT_MAX_RETRY_DELAY))
+            else:
+                self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Detiene el hilo y escribe lo que quede."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
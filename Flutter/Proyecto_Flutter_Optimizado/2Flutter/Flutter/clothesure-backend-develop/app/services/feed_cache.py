@@ -0,0 +1,198 @@
+"""
+Caché materializada del feed "para ti" por usuario.
+
+Para cada usuario se guarda su ranking top-N (score, created_ts, post_id) ya
+calculado junto con la versión de sus preferencias. Una entrada deja de
+valer cuando:
+  - cambian las preferencias (versión distinta o invalidate() desde los
+    endpoints de encuesta/preferencias),
+  - vence su TTL o el LRU la desaloja,
+  - el registro de cambios del índice ya descartó los cambios que le
+    faltan (POST_INDEX_MAX_CHANGES).
+
+Los posts creados, editados o borrados después de materializar el ranking
+no obligan a recalcularlo: se leen del registro de cambios de PostTagIndex
+y se mezclan en el ranking guardado. Las reconstrucciones periódicas del
+índice también se registran ahí como cambios, así que no vacían la caché.
+
+La caché es local al proceso (LRU + TTL en memoria), igual que el índice y
+su registro de cambios: un ranking solo se puede poner al día con el
+registro del índice que lo calculó, así que compartirlo entre procesos
+(p. ej. en Redis) no daría aciertos.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.metrics import registry
+from app.services.post_tag_index import PostTagIndex, SCORED_PREFERENCE_FIELDS, post_tag_index
+
+logger = logging.getLogger(__name__)
+
+FEED_CACHE_TTL = int(os.getenv("FEED_CACHE_TTL", 600))
+FEED_CACHE_MAX_USERS = int(os.getenv("FEED_CACHE_MAX_USERS", 10000))
+FEED_CACHE_TOP_N = int(os.getenv("FEED_CACHE_TOP_N", 500))
+
+
+def _descending_position(items: List[List[float]], key: Tuple[float, float, int]) -> int:
+    """Posición tras `key` en una lista de claves ordenada de forma descendente."""
+    negated = [(-score, -timestamp, -post_id) for score, timestamp, post_id in items]
+    return bisect_right(negated, (-key[0], -key[1], -key[2]))
+
+
+def preference_version(user_preferences: Dict) -> str:
+    """Hash estable de los campos de preferencias que afectan al score."""
+    payload = {field: user_preferences.get(field) for field in SCORED_PREFERENCE_FIELDS}
+    raw = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+# ----------------------------------------------------------------------
+# Backend
+# ----------------------------------------------------------------------
+class InMemoryFeedCacheBackend:
+    """LRU acotado con TTL por entrada, local al proceso."""
+
+    def __init__(self, max_entries: int = FEED_CACHE_MAX_USERS):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# ----------------------------------------------------------------------
+# Caché de rankings
+# ----------------------------------------------------------------------
+class FeedCache:
+    def __init__(self, backend=None, index: PostTagIndex = post_tag_index,
+                 top_n: int = FEED_CACHE_TOP_N, ttl: int = FEED_CACHE_TTL):
+        self.backend = backend if backend is not None else InMemoryFeedCacheBackend()
+        self.index = index
+        self.top_n = top_n
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, user_id: Any) -> None:
+        """Descarta el ranking materializado de un usuario."""
+        self.backend.delete(str(user_id))
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def get_ranking(self, user_id: Any, user_preferences: Dict) -> Dict:
+        """
+        Ranking materializado del usuario, actualizado con los cambios de
+        posts pendientes o recalculado si no hay una entrada válida.
+        """
+        key = str(user_id)
+        version = preference_version(user_preferences)
+        entry = self.backend.get(key)
+
+        if entry is not None and entry.get("version") == version:
+            pending = self.index.changes_since(entry["index_version"], entry["position"])
+            if pending is not None:
+                self.hits += 1
+                changes, position = pending
+                if changes:
+                    entry = self._merge_changes(entry, user_preferences, changes, position)
+                    self.backend.set(key, entry, self.ttl)
+                return entry
+
+        self.misses += 1
+        # Posición y versión se leen antes del cálculo: los cambios concurrentes
+        # se vuelven a aplicar en la siguiente lectura (la mezcla es idempotente)
+        index_version = self.index.version
+        position = self.index.change_position()
+        ranked = self.index.top_matching(user_preferences, limit=self.top_n + 1)
+        entry = {
+            "version": version,
+            "index_version": index_version,
+            "position": position,
+            "complete": len(ranked) <= self.top_n,
+            "items": [[score, timestamp, post_id] for post_id, score, timestamp in ranked[:self.top_n]],
+        }
+        self.backend.set(key, entry, self.ttl)
+        return entry
+
+    def _merge_changes(self, entry: Dict, user_preferences: Dict, changes: List[int], position: int) -> Dict:
+        """Nueva entrada con los posts cambiados re-puntuados en su lugar."""
+        changed = set(changes)
+        items = [item for item in entry["items"] if item[2] not in changed]
+        complete = entry["complete"]
+        for key in self.index.score_posts(user_preferences, changed):
+            insert_at = _descending_position(items, key)
+            # Por debajo del último elemento solo se sabe dónde va si el ranking es completo
+            if insert_at < len(items) or complete:
+                items.insert(insert_at, list(key))
+        if len(items) > self.top_n:
+            del items[self.top_n:]
+            complete = False
+        return dict(entry, items=items, complete=complete, position=position)
+
+    def get_page(
+        self,
+        user_id: Any,
+        user_preferences: Dict,
+        limit: int,
+        after: Optional[Tuple[float, float, int]] = None
+    ) -> List[Tuple[int, float, float]]:
+        """
+        Igual que PostTagIndex.top_matching pero servido desde el ranking
+        materializado. Si la página pasa del top-N guardado, el resto se pide
+        al índice a partir de la última clave cacheada.
+        """
+        entry = self.get_ranking(user_id, user_preferences)
+        items = entry["items"]
+
+        start = _descending_position(items, after) if after is not None else 0
+        page = [(post_id, score, timestamp) for score, timestamp, post_id in items[start:start + limit]]
+
+        if len(page) < limit and not entry["complete"]:
+            # Se continúa desde la clave menor entre el cursor y el final del top-N
+            last = tuple(items[-1]) if items else None
+            if last is None or (after is not None and after < last):
+                last = after
+            page.extend(self.index.top_matching(user_preferences, limit=limit - len(page), after=last))
+        return page
+
+
+# Instancia compartida por el proceso de la API
+feed_cache = FeedCache()
+
+registry.gauge("feed_cache_hits_total", "Rankings servidos desde la caché de feed", lambda: feed_cache.hits, "counter")
+registry.gauge("feed_cache_misses_total", "Rankings recalculados", lambda: feed_cache.misses, "counter")
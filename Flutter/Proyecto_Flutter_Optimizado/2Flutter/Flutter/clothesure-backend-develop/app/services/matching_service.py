@@ -2,8 +2,11 @@
 Servicio de matching para calcular compatibilidad entre preferencias de usuario y posts.
 """
 
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from sqlalchemy.orm import Session
 from app.core.config import MATCHING_WEIGHTS
+from app.models.preference_options_model import PreferenceOption
 
 def calculate_matching_score(
     user_preferences: Dict,
@@ -231,3 +234,164 @@ def get_top_matching_posts(
     
     # Limitar resultados
     return sorted_posts[:limit]
+
+
+# ----------------------------------------------------------------------
+# Modo batch (vectorizado)
+# ----------------------------------------------------------------------
+
+def build_tag_vocabulary(values: Iterable[str]) -> Dict[str, int]:
+    """Construye un vocabulario fijo tag -> columna, sin duplicados y en orden estable."""
+    vocabulary: Dict[str, int] = {}
+    for value in values:
+        if value and value not in vocabulary:
+            vocabulary[value] = len(vocabulary)
+    return vocabulary
+
+def load_tag_vocabulary(db: Session) -> Dict[str, int]:
+    """Vocabulario de tags a partir de los valores de preference_options."""
+    rows = db.query(PreferenceOption.value).order_by(PreferenceOption.id).all()
+    return build_tag_vocabulary(row[0] for row in rows)
+
+class BatchMatchingScorer:
+    """
+    Calcula matching scores con operaciones matriciales.
+
+    Los posts se codifican como una matriz binaria (posts x vocabulario) y las
+    preferencias como vectores de pesos construidos desde MATCHING_WEIGHTS:
+
+      score = M @ lineal + w_occasions * (M @ ocasiones > 0) + w_shoes * (M @ calzado > 0)
+
+    donde `lineal` acumula estilo, prendas favoritas (cada coincidencia suma) y
+    body_shape, y los términos con umbral conservan la semántica de "solo la
+    primera ocasión" y "solo el primer calzado" de calculate_matching_score.
+
+    Los valores de preferencia que no estén en el vocabulario no suman score.
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], weights: Dict = None):
+        self.vocabulary = vocabulary
+        self.weights = weights or MATCHING_WEIGHTS
+
+    @classmethod
+    def from_posts(cls, posts: List[Dict], user_preferences: Sequence[Dict] = (), weights: Dict = None) -> "BatchMatchingScorer":
+        """Scorer con vocabulario derivado de los tags presentes (resultado exacto)."""
+        values = [tag for post in posts for tag in (post.get('style_tags') or [])]
+        for prefs in user_preferences:
+            values.extend(_preference_values(prefs))
+        return cls(build_tag_vocabulary(values), weights)
+
+    def encode_posts(self, posts_tags: Iterable[Iterable[str]]) -> np.ndarray:
+        """Matriz binaria float32 (n_posts x vocabulario)."""
+        posts_tags = list(posts_tags)
+        matrix = np.zeros((len(posts_tags), len(self.vocabulary)), dtype=np.float32)
+        for row, tags in enumerate(posts_tags):
+            columns = [self.vocabulary[tag] for tag in (tags or []) if tag in self.vocabulary]
+            if columns:
+                matrix[row, columns] = 1.0
+        return matrix
+
+    def encode_users(self, users_preferences: Sequence[Dict]) -> tuple:
+        """
+        Devuelve (lineal, ocasiones, calzado), cada uno (n_usuarios x vocabulario).
+        """
+        size = (len(users_preferences), len(self.vocabulary))
+        linear = np.zeros(size, dtype=np.float32)
+        occasions = np.zeros(size, dtype=np.float32)
+        shoes = np.zeros(size, dtype=np.float32)
+
+        for row, prefs in enumerate(users_preferences):
+            style = self.vocabulary.get(prefs.get("style_personal"))
+            if style is not None:
+                linear[row, style] += self.weights["style_personal"]
+
+            body_shape = self.vocabulary.get(prefs.get("body_shape"))
+            if body_shape is not None:
+                linear[row, body_shape] += self.weights["body_shape"]
+
+            # Cada prenda favorita suma (igual que el bucle original)
+            for item in prefs.get("favorite_items") or []:
+                column = self.vocabulary.get(item)
+                if column is not None:
+                    linear[row, column] += self.weights["favorite_items"]
+
+            for occasion in prefs.get("occasions") or []:
+                column = self.vocabulary.get(occasion)
+                if column is not None:
+                    occasions[row, column] = 1.0
+
+            for shoe in prefs.get("shoes") or []:
+                column = self.vocabulary.get(shoe)
+                if column is not None:
+                    shoes[row, column] = 1.0
+
+        return linear, occasions, shoes
+
+    def score_matrix(self, posts_matrix: np.ndarray, users_preferences: Sequence[Dict]) -> np.ndarray:
+        """Scores (n_posts x n_usuarios) para muchos usuarios contra muchos posts."""
+        linear, occasions, shoes = self.encode_users(users_preferences)
+        scores = posts_matrix @ linear.T
+        scores += self.weights["occasions"] * ((posts_matrix @ occasions.T) > 0)
+        scores += self.weights["shoes"] * ((posts_matrix @ shoes.T) > 0)
+        return scores.astype(np.float64)
+
+    def score_posts(self, posts_matrix: np.ndarray, user_preferences: Dict) -> np.ndarray:
+        """Scores de un usuario contra todos los posts (vector de n_posts)."""
+        return self.score_matrix(posts_matrix, [user_preferences])[:, 0]
+
+def _preference_values(user_preferences: Dict) -> List[str]:
+    values = [user_preferences.get("style_personal"), user_preferences.get("body_shape")]
+    for field in ("occasions", "favorite_items", "shoes"):
+        values.extend(user_preferences.get(field) or [])
+    return [value for value in values if value]
+
+def calculate_matching_scores_batch(
+    user_preferences: Dict,
+    posts: List[Dict],
+    weights: Dict = None,
+    scorer: Optional[BatchMatchingScorer] = None
+) -> List[Dict]:
+    """
+    Equivalente vectorizado de calculate_matching_scores_for_posts.
+
+    Args:
+        user_preferences: Dict con preferencias del usuario
+        posts: Lista de posts con campo 'style_tags'
+        weights: Dict opcional con pesos personalizados
+        scorer: Scorer con vocabulario fijo; si no se indica se deriva de los datos
+
+    Returns:
+        List[Dict]: Lista de posts con score de matching agregado
+    """
+    if not posts:
+        return []
+    if scorer is None:
+        scorer = BatchMatchingScorer.from_posts(posts, [user_preferences], weights)
+
+    matrix = scorer.encode_posts(post.get('style_tags') for post in posts)
+    scores = scorer.score_posts(matrix, user_preferences)
+    for post, score in zip(posts, scores.tolist()):
+        post['matching_score'] = score
+    return posts
+
+def get_top_matching_posts_batch(
+    user_preferences: Dict,
+    posts: List[Dict],
+    limit: int = 10,
+    min_score: float = 0.0,
+    weights: Dict = None,
+    scorer: Optional[BatchMatchingScorer] = None
+) -> List[Dict]:
+    """
+    Igual que get_top_matching_posts pero puntuando con BatchMatchingScorer.
+    Conserva el orden original de los posts entre scores empatados.
+    """
+    if not posts or limit <= 0:
+        return []
+    scored_posts = calculate_matching_scores_batch(user_preferences, posts, weights, scorer)
+    scores = np.fromiter((post['matching_score'] for post in scored_posts), dtype=np.float64, count=len(scored_posts))
+
+    eligible = np.flatnonzero(scores >= min_score)
+    # Orden estable por score desc (mismo desempate que sorted(..., reverse=True))
+    order = eligible[np.argsort(-scores[eligible], kind='stable')][:limit]
+    return [scored_posts[i] for i in order.tolist()]
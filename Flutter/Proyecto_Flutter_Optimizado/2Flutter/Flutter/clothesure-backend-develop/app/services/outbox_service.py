@@ -0,0 +1,271 @@
+"""
+Outbox transaccional para los eventos de persistencia.
+
+Los handlers escriben el evento con add_outbox_event en la misma sesión (y el
+mismo commit) que el cambio de dominio, sin tocar RabbitMQ. OutboxRelay, que
+corre en el worker, reclama las filas pendientes en lotes con
+FOR UPDATE SKIP LOCKED y una transacción corta que les pone next_attempt_at
+(un plazo de OUTBOX_CLAIM_TIMEOUT segundos durante el que otros relays no las
+toman), así que no hay locks abiertos mientras se esperan los confirms.
+Después las publica en el exchange de eventos con publisher confirms y marca
+published_at solo en las confirmadas.
+
+Las que fallan se reintentan con espera exponencial por fila (next_attempt_at)
+y, tras OUTBOX_MAX_ATTEMPTS intentos (o enseguida si no se pueden
+serializar), se marcan con dead_at y dejan de publicarse: una fila que el
+broker rechaza siempre no bloquea a las demás. Quedan en la tabla para
+revisarlas.
+
+La entrega es al menos una vez: si el relay cae entre el confirm y el commit
+(o su plazo vence) el lote se vuelve a publicar. Cada mensaje lleva su
+event_id (también como message_id AMQP) para que el consumidor descarte
+duplicados.
+"""
+
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.connection import RabbitMQConnection
+from app.core.db import SessionLocal
+from app.core.topology import resolve_target
+from app.core.metrics import registry
+from app.models.outbox_model import OutboxEvent
+from app.services.publisher import MessagePublisher, persistence_message
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 500))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 0.5))
+OUTBOX_RETENTION_HOURS = int(os.getenv("OUTBOX_RETENTION_HOURS", 72))
+OUTBOX_MAX_BACKOFF = float(os.getenv("OUTBOX_MAX_BACKOFF", 30.0))
+# Plazo de una fila reclamada por un relay (mayor que la espera de confirms)
+OUTBOX_CLAIM_TIMEOUT = float(os.getenv("OUTBOX_CLAIM_TIMEOUT", 300))
+# Reintentos por fila: espera OUTBOX_RETRY_DELAY * 2^intentos, hasta OUTBOX_MAX_RETRY_DELAY
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 10))
+OUTBOX_RETRY_DELAY = float(os.getenv("OUTBOX_RETRY_DELAY", 1.0))
+OUTBOX_MAX_RETRY_DELAY = float(os.getenv("OUTBOX_MAX_RETRY_DELAY", 600))
+
+relayed_total = registry.counter("outbox_relayed_total", "Eventos del outbox confirmados por el broker")
+relay_failed_total = registry.counter("outbox_relay_failed_total", "Eventos del outbox sin confirmar (se reintentan)")
+dead_total = registry.counter("outbox_dead_total", "Eventos del outbox descartados tras OUTBOX_MAX_ATTEMPTS intentos")
+
+
+def add_outbox_event(
+    db: Session,
+    event_type: str,
+    data: Dict[str, Any],
+    metadata: Optional[Dict] = None,
+    exchange: Optional[str] = None,
+    routing_key: str = ""
+) -> OutboxEvent:
+    """
+    Agrega un evento de persistencia al outbox. No hace commit: se guarda
+    junto con el resto de cambios de la sesión. El destino se fija al
+    escribir (ver app.core.topology).
+    """
+    event_id = str(uuid.uuid4())
+    message = persistence_message(event_type, data, metadata)
+    message["event_id"] = event_id
+    exchange, routing_key = resolve_target(message, exchange, routing_key)
+    event = OutboxEvent(event_id=event_id, exchange=exchange, routing_key=routing_key, payload=message)
+    db.add(event)
+    return event
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Espera antes del siguiente intento de una fila que ya falló `attempts` veces."""
+    return timedelta(seconds=min(OUTBOX_RETRY_DELAY * 2 ** max(attempts - 1, 0), OUTBOX_MAX_RETRY_DELAY))
+
+
+def claim_outbox_batch(db: Session, batch_size: int = OUTBOX_BATCH_SIZE) -> List[OutboxEvent]:
+    """
+    Reclama hasta `batch_size` eventos listos para publicar y hace commit:
+    los locks solo duran esta transacción y el plazo en next_attempt_at
+    aparta las filas de otros relays mientras se publican.
+    """
+    now = datetime.utcnow()
+    events = (
+        db.query(OutboxEvent)
+        .filter(
+            OutboxEvent.published_at.is_(None),
+            OutboxEvent.dead_at.is_(None),
+            or_(OutboxEvent.next_attempt_at.is_(None), OutboxEvent.next_attempt_at <= now)
+        )
+        .order_by(OutboxEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not events:
+        db.rollback()
+        return []
+    db.query(OutboxEvent).filter(OutboxEvent.id.in_([event.id for event in events])).update(
+        {OutboxEvent.next_attempt_at: now + timedelta(seconds=OUTBOX_CLAIM_TIMEOUT)}, synchronize_session=False
+    )
+    db.commit()
+    return events
+
+
+def relay_outbox_batch(db: Session, publisher: MessagePublisher, batch_size: int = OUTBOX_BATCH_SIZE) -> Tuple[int, int]:
+    """
+    Publica un lote de eventos pendientes y hace commit.
+    Devuelve (publicados, fallidos); los fallidos se reintentan más tarde o,
+    agotados sus intentos, se marcan con dead_at.
+    """
+    events = claim_outbox_batch(db, batch_size)
+    if not events:
+        return 0, 0
+
+    groups: Dict[Tuple[str, str], List[OutboxEvent]] = {}
+    for event in events:
+        groups.setdefault((event.exchange, event.routing_key), []).append(event)
+
+    published_ids: List[int] = []
+    failed: List[Tuple[OutboxEvent, bool]] = []  # (evento, sin reintento posible)
+    for (exchange, routing_key), group in groups.items():
+        result = publisher.publish_batch_messages(
+            [event.payload for event in group],
+            exchange=exchange,
+            routing_key=routing_key,
+            message_ids=[event.event_id for event in group]
+        )
+        invalid = set(result["invalid"])
+        retry = set(result["nacked"]) | set(result["unconfirmed"])
+        for index, event in enumerate(group):
+            if index in invalid or index in retry:
+                failed.append((event, index in invalid))
+            else:
+                published_ids.append(event.id)
+
+    now = datetime.utcnow()
+    if published_ids:
+        db.query(OutboxEvent).filter(OutboxEvent.id.in_(published_ids)).update(
+            {OutboxEvent.published_at: now}, synchronize_session=False
+        )
+    dead = 0
+    if failed:
+        rows = []
+        for event, hopeless in failed:
+            attempts = event.attempts + 1
+            is_dead = hopeless or attempts >= OUTBOX_MAX_ATTEMPTS
+            dead += is_dead
+            if is_dead:
+                logger.error(
+                    f"💀 Evento {event.event_id} del outbox descartado tras {attempts} intentos "
+                    f"({event.exchange}/{event.routing_key})"
+                )
+            rows.append({
+                "b_id": event.id,
+                "b_attempts": attempts,
+                "b_next_attempt_at": now + retry_delay(attempts),
+                "b_dead_at": now if is_dead else None,
+            })
+        db.execute(
+            update(OutboxEvent.__table__)
+            .where(OutboxEvent.__table__.c.id == bindparam("b_id"))
+            .values(
+                attempts=bindparam("b_attempts"),
+                next_attempt_at=bindparam("b_next_attempt_at"),
+                dead_at=bindparam("b_dead_at")
+            ),
+            rows
+        )
+    db.commit()
+
+    relayed_total.inc(len(published_ids))
+    relay_failed_total.inc(len(failed) - dead)
+    dead_total.inc(dead)
+    return len(published_ids), len(failed)
+
+
+def purge_published(db: Session, retention_hours: int = OUTBOX_RETENTION_HOURS) -> int:
+    """Borra los eventos ya publicados con más de `retention_hours` horas."""
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    deleted = db.query(OutboxEvent).filter(OutboxEvent.published_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+class OutboxRelay:
+    """
+    Hilo que vacía el outbox hacia RabbitMQ. Usa su propia conexión (los
+    canales de pika no se comparten entre hilos).
+    """
+
+    def __init__(
+        self,
+        connection: RabbitMQConnection,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        session_factory: Callable[[], Session] = SessionLocal
+    ):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.session_factory = session_factory
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._publisher: Optional[MessagePublisher] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-relay", daemon=True)
+        self._thread.start()
+        logger.info("📤 Relay del outbox iniciado")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.connection.disconnect()
+
+    def _connect(self) -> bool:
+        if self._publisher is not None and self.connection.is_connected():
+            return True
+        self._publisher = None
+        self.connection.disconnect()
+        if not self.connection.connect():
+            return False
+        self._publisher = MessagePublisher(self.connection)
+        return True
+
+    def _run(self) -> None:
+        backoff = self.poll_interval
+        next_purge = datetime.utcnow()
+        while not self._stop.is_set():
+            try:
+                if not self._connect():
+                    raise ConnectionError("RabbitMQ no disponible")
+
+                with self.session_factory() as db:
+                    published, failed = relay_outbox_batch(db, self._publisher, self.batch_size)
+                    if datetime.utcnow() >= next_purge:
+                        purged = purge_published(db)
+                        if purged:
+                            logger.info(f"🧹 {purged} eventos publicados eliminados del outbox")
+                        next_purge = datetime.utcnow() + timedelta(hours=1)
+
+                # Las filas fallidas esperan su propio reintento; si no se
+                # confirmó nada del lote el problema es el broker: se espera
+                if failed and not published:
+                    raise ConnectionError(f"{failed} eventos sin confirmar")
+                backoff = self.poll_interval
+                # Con un lote completo puede haber más pendientes: se sigue sin esperar
+                if published < self.batch_size:
+                    self._stop.wait(self.poll_interval)
+
+            except Exception as e:
+                logger.warning(f"⚠️ Relay del outbox: {e}; reintento en {backoff:.1f} s")
+                self._publisher = None
+                self._stop.wait(backoff)
+                backoff = min(max(backoff, 0.5) * 2, OUTBOX_MAX_BACKOFF)
@@ -0,0 +1,107 @@
+"""
+Carga por lotes (estilo DataLoader) de lo que acompaña a los posts de una
+página del feed: sus fotos y su autor.
+
+Una instancia por petición. Cada load_* pide en una sola consulta todas las
+claves que aún no tiene y recuerda el resultado, así que una página cuesta
+siempre lo mismo sin importar cuántos posts tenga:
+
+    fotos:   SELECT ... FROM photos WHERE post_id IN (...) ORDER BY post_id, order_index
+    autores: SELECT user_id, username, profile_picture_url FROM users WHERE user_id IN (...)
+
+Devuelve modelos de lectura (PhotoRead, AuthorRead) con los mismos campos
+que PhotoOut y UserInPost.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.services.counter_service import with_pending_counts
+from app.services.read_models import AuthorRead, PhotoRead, from_rows, select_authors, select_photos
+
+
+class PostLoader:
+    def __init__(self, db: Session):
+        self.db = db
+        self._photos: Dict[int, List[PhotoRead]] = {}
+        self._authors: Dict[int, Optional[AuthorRead]] = {}
+
+    def load_photos(self, post_ids: Iterable[int]) -> Dict[int, List[PhotoRead]]:
+        post_ids = list(post_ids)
+        missing = self._missing(post_ids, self._photos)
+        if missing:
+            self._store_photos(missing, self.db.execute(select_photos(missing)))
+        return {post_id: self._photos[post_id] for post_id in post_ids}
+
+    def load_authors(self, user_ids: Iterable[int]) -> Dict[int, Optional[AuthorRead]]:
+        user_ids = list(user_ids)
+        missing = self._missing(user_ids, self._authors)
+        if missing:
+            self._store_authors(missing, self.db.execute(select_authors(missing)).all())
+        return {user_id: self._authors[user_id] for user_id in user_ids}
+
+    def attach(self, posts: List[dict]) -> List[dict]:
+        """Agrega 'images' y 'user' a los dicts de una página del feed."""
+        if posts:
+            self._attach(
+                posts,
+                self.load_photos(post["id"] for post in posts),
+                self.load_authors(post["user_id"] for post in posts),
+            )
+        return posts
+
+    @staticmethod
+    def _missing(keys: List[int], loaded: Dict) -> List[int]:
+        return [key for key in dict.fromkeys(keys) if key is not None and key not in loaded]
+
+    def _store_photos(self, post_ids: List[int], rows) -> None:
+        by_post: Dict[int, List[PhotoRead]] = defaultdict(list)
+        # Una sola lectura de contadores pendientes para toda la página
+        for photo in with_pending_counts(from_rows(PhotoRead, rows)):
+            by_post[photo.post_id].append(photo)
+        for post_id in post_ids:
+            self._photos[post_id] = by_post.get(post_id, [])
+
+    def _store_authors(self, user_ids: List[int], rows) -> None:
+        found = {row.user_id: AuthorRead(*row) for row in rows}
+        for user_id in user_ids:
+            self._authors[user_id] = found.get(user_id)
+
+    @staticmethod
+    def _attach(posts: List[dict], photos: Dict[int, List[PhotoRead]], authors: Dict[int, Optional[AuthorRead]]) -> None:
+        for post in posts:
+            post["images"] = photos.get(post["id"], [])
+            post["user"] = authors.get(post["user_id"])
+
+
+class AsyncPostLoader(PostLoader):
+    """Versión para AsyncSession (rutas async con DB_ASYNC=true)."""
+
+    def __init__(self, db: AsyncSession):
+        super().__init__(db)
+
+    async def load_photos(self, post_ids: Iterable[int]) -> Dict[int, List[PhotoRead]]:
+        post_ids = list(post_ids)
+        missing = self._missing(post_ids, self._photos)
+        if missing:
+            self._store_photos(missing, (await self.db.execute(select_photos(missing))).all())
+        return {post_id: self._photos[post_id] for post_id in post_ids}
+
+    async def load_authors(self, user_ids: Iterable[int]) -> Dict[int, Optional[AuthorRead]]:
+        user_ids = list(user_ids)
+        missing = self._missing(user_ids, self._authors)
+        if missing:
+            self._store_authors(missing, (await self.db.execute(select_authors(missing))).all())
+        return {user_id: self._authors[user_id] for user_id in user_ids}
+
+    async def attach(self, posts: List[dict]) -> List[dict]:
+        if posts:
+            self._attach(
+                posts,
+                await self.load_photos(post["id"] for post in posts),
+                await self.load_authors(post["user_id"] for post in posts),
+            )
+        return posts
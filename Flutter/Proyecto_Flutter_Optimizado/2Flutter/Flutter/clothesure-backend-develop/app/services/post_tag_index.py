@@ -0,0 +1,358 @@
+"""
+Índice invertido en memoria tag -> post ids para el feed "para ti".
+
+Evita cargar y puntuar todos los posts en cada request: solo se puntúan los
+posts candidatos que comparten al menos un tag con las preferencias del
+usuario, y el top-k se obtiene con un heap acotado.
+
+El índice es local al proceso. Se mantiene incrementalmente desde los
+handlers de creación/edición/borrado de posts y se reconstruye desde la base
+de datos cuando aún no existe o cuando supera POST_INDEX_MAX_AGE segundos
+(para recoger cambios hechos por otros workers). Solo una petición a la vez
+reconstruye; las demás siguen usando el índice anterior mientras tanto.
+"""
+
+import bisect
+import heapq
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.post_model import Post
+from app.services.matching_service import calculate_matching_score
+
+logger = logging.getLogger(__name__)
+
+POST_INDEX_MAX_AGE = int(os.getenv("POST_INDEX_MAX_AGE", 300))
+# Entradas del registro de cambios que se conservan; una caché que se quedó
+# más atrás recalcula su ranking
+POST_INDEX_MAX_CHANGES = int(os.getenv("POST_INDEX_MAX_CHANGES", 10000))
+
+# Campos de UserPreference que participan en el score
+SCORED_PREFERENCE_FIELDS = ("style_personal", "occasions", "favorite_items", "body_shape", "shoes")
+
+
+def get_post_tags(post) -> List[str]:
+    """Devuelve los tags de un post (ORM o dict); lista vacía si no tiene."""
+    if isinstance(post, dict):
+        return list(post.get("style_tags") or [])
+    return list(getattr(post, "style_tags", None) or [])
+
+
+def get_user_tags(user_preferences: Dict) -> Set[str]:
+    """Conjunto de tags que pueden sumar score para las preferencias dadas."""
+    tags: Set[str] = set()
+    for field in SCORED_PREFERENCE_FIELDS:
+        value = user_preferences.get(field)
+        if not value:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            tags.update(v for v in value if v)
+        else:
+            tags.add(value)
+    return tags
+
+
+class PostTagIndex:
+    def __init__(self, max_age: int = POST_INDEX_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Set[int]] = {}
+        self._post_tags: Dict[int, Tuple[str, ...]] = {}
+        self._sort_keys: Dict[int, Tuple[float, int]] = {}
+        self._recency: List[Tuple[float, int]] = []  # Ordenada asc por (created_at, id)
+        self._built_at: Optional[float] = None
+        # Una sola reconstrucción a la vez; los posts que cambian mientras se
+        # lee la tabla se anotan aquí para no perderlos al cambiar de snapshot
+        self._rebuild_lock = threading.Lock()
+        self._rebuild_touched: Optional[Set[int]] = None
+        # Registro de cambios (altas, ediciones, bajas y diferencias halladas
+        # al reconstruir) para que las cachés derivadas del proceso
+        # (feed_cache) se actualicen de forma incremental. Las posiciones son
+        # absolutas: _changes[0] es la posición _changes_base.
+        self._instance = uuid.uuid4().hex[:12]
+        self._generation = 0
+        self._changes: List[int] = []
+        self._changes_base = 0
+
+    # ------------------------------------------------------------------
+    # Construcción
+    # ------------------------------------------------------------------
+    def rebuild(self, db: Session) -> int:
+        """Reconstruye el índice completo leyendo los posts en bloques."""
+        with self._rebuild_lock:
+            return self._rebuild(db)
+
+    def _rebuild(self, db: Session) -> int:
+        postings: Dict[str, Set[int]] = {}
+        post_tags: Dict[int, Tuple[str, ...]] = {}
+        sort_keys: Dict[int, Tuple[float, int]] = {}
+
+        with self._lock:
+            self._rebuild_touched = set()
+        try:
+            # Solo las columnas necesarias: los tags ya vienen persistidos en posts.style_tags
+            rows = db.query(Post.id, Post.created_at, Post.style_tags).yield_per(1000)
+            for post in rows:
+                tags = tuple(dict.fromkeys(get_post_tags(post)))
+                post_tags[post.id] = tags
+                sort_keys[post.id] = self._sort_key(post.id, post.created_at)
+                for tag in tags:
+                    postings.setdefault(tag, set()).add(post.id)
+        except Exception:
+            with self._lock:
+                self._rebuild_touched = None
+            raise
+
+        with self._lock:
+            # Lo que add/update/remove_post cambiaron durante la lectura es más
+            # reciente que el snapshot (o la lectura no lo vio): manda el índice vivo
+            for post_id in self._rebuild_touched:
+                for tag in post_tags.pop(post_id, ()):
+                    postings[tag].discard(post_id)
+                sort_keys.pop(post_id, None)
+                if post_id in self._post_tags:
+                    post_tags[post_id] = self._post_tags[post_id]
+                    sort_keys[post_id] = self._sort_keys[post_id]
+                    for tag in post_tags[post_id]:
+                        postings.setdefault(tag, set()).add(post_id)
+            self._rebuild_touched = None
+            postings = {tag: ids for tag, ids in postings.items() if ids}
+
+            if self._generation == 0:
+                # Primera construcción: no hay nada derivado que actualizar
+                self._generation = 1
+            else:
+                # Las reconstrucciones periódicas solo registran los posts que
+                # cambiaron (p. ej. en otro worker); las cachés no se pierden
+                self._changes.extend(self._diff_locked(post_tags, sort_keys))
+                self._compact_changes_locked()
+            self._postings = postings
+            self._post_tags = post_tags
+            self._sort_keys = sort_keys
+            self._recency = sorted(sort_keys.values())
+            self._built_at = time.monotonic()
+
+        logger.info(f"🗂️ Índice de tags reconstruido: {len(post_tags)} posts, {len(postings)} tags")
+        return len(post_tags)
+
+    def _is_fresh(self) -> bool:
+        with self._lock:
+            built_at = self._built_at
+        return built_at is not None and not (self.max_age and time.monotonic() - built_at > self.max_age)
+
+    def ensure_built(self, db: Session) -> None:
+        """
+        Construye el índice si no existe o si está vencido. La primera
+        construcción la esperan todas las peticiones; una reconstrucción la
+        hace una sola mientras las demás usan el índice anterior.
+        """
+        if self._is_fresh():
+            return
+        with self._lock:
+            has_snapshot = self._generation > 0
+        if not has_snapshot:
+            with self._rebuild_lock:
+                if self._generation == 0:
+                    self._rebuild(db)
+            return
+        if not self._rebuild_lock.acquire(blocking=False):
+            return  # Otra petición ya reconstruye
+        try:
+            if not self._is_fresh():
+                self._rebuild(db)
+        finally:
+            self._rebuild_lock.release()
+
+    def _diff_locked(self, post_tags: Dict[int, Tuple[str, ...]], sort_keys: Dict[int, Tuple[float, int]]) -> List[int]:
+        """Posts añadidos, borrados o con otros tags/fecha respecto al índice actual."""
+        changed = [
+            post_id for post_id, tags in post_tags.items()
+            if self._post_tags.get(post_id) != tags or self._sort_keys.get(post_id) != sort_keys[post_id]
+        ]
+        changed.extend(post_id for post_id in self._post_tags if post_id not in post_tags)
+        return changed
+
+    def _compact_changes_locked(self) -> None:
+        excess = len(self._changes) - POST_INDEX_MAX_CHANGES
+        if excess > 0:
+            del self._changes[:excess]
+            self._changes_base += excess
+
+    def invalidate(self) -> None:
+        """Fuerza una reconstrucción en el siguiente uso."""
+        with self._lock:
+            self._built_at = None
+
+    # ------------------------------------------------------------------
+    # Mantenimiento incremental
+    # ------------------------------------------------------------------
+    def add_post(self, post_id: int, tags: Iterable[str], created_at: Optional[datetime] = None) -> None:
+        with self._lock:
+            self._add_locked(post_id, tags, self._sort_key(post_id, created_at))
+
+    def update_post(self, post_id: int, tags: Iterable[str], created_at: Optional[datetime] = None) -> None:
+        with self._lock:
+            key = self._sort_keys.get(post_id)
+            if created_at is not None or key is None:
+                key = self._sort_key(post_id, created_at)
+            # Si no se indica fecha se conserva la posición cronológica original
+            self._add_locked(post_id, tags, key)
+
+    def remove_post(self, post_id: int) -> None:
+        with self._lock:
+            self._touch_locked(post_id)
+            self._remove_locked(post_id)
+
+    def _touch_locked(self, post_id: int) -> bool:
+        """Anota el cambio; False si todavía no hay índice que mantener."""
+        if self._rebuild_touched is not None:
+            self._rebuild_touched.add(post_id)
+        elif self._generation == 0:
+            return False  # Se indexará en la primera construcción
+        self._changes.append(post_id)
+        self._compact_changes_locked()
+        return True
+
+    def _add_locked(self, post_id: int, tags: Iterable[str], key: Tuple[float, int]) -> None:
+        if not self._touch_locked(post_id):
+            return
+        self._remove_locked(post_id)
+        unique_tags = tuple(dict.fromkeys(t for t in tags if t))
+        self._post_tags[post_id] = unique_tags
+        self._sort_keys[post_id] = key
+        bisect.insort(self._recency, key)
+        for tag in unique_tags:
+            self._postings.setdefault(tag, set()).add(post_id)
+
+    def _remove_locked(self, post_id: int) -> None:
+        for tag in self._post_tags.pop(post_id, ()):
+            ids = self._postings.get(tag)
+            if ids is not None:
+                ids.discard(post_id)
+                if not ids:
+                    del self._postings[tag]
+        key = self._sort_keys.pop(post_id, None)
+        if key is not None:
+            pos = bisect.bisect_left(self._recency, key)
+            if pos < len(self._recency) and self._recency[pos] == key:
+                del self._recency[pos]
+
+    @staticmethod
+    def _sort_key(post_id: int, created_at: Optional[datetime]) -> Tuple[float, int]:
+        return (created_at.timestamp() if created_at else 0.0, post_id)
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._post_tags)
+
+    def candidates(self, user_tags: Iterable[str]) -> Set[int]:
+        """Posts que comparten al menos un tag con el usuario."""
+        result: Set[int] = set()
+        with self._lock:
+            for tag in user_tags:
+                ids = self._postings.get(tag)
+                if ids:
+                    result |= ids
+        return result
+
+    @property
+    def version(self) -> str:
+        """Identifica este índice (proceso y primera construcción); las reconstrucciones no lo cambian."""
+        with self._lock:
+            return f"{self._instance}:{self._generation}"
+
+    def change_position(self) -> int:
+        with self._lock:
+            return self._changes_base + len(self._changes)
+
+    def changes_since(self, version: str, position: int) -> Optional[Tuple[List[int], int]]:
+        """
+        Posts añadidos, editados o borrados desde `position` del registro de
+        `version`, junto con la nueva posición. Devuelve None si es otro
+        índice o si esos cambios ya se descartaron del registro.
+        """
+        with self._lock:
+            end = self._changes_base + len(self._changes)
+            if version != f"{self._instance}:{self._generation}" or not self._changes_base <= position <= end:
+                return None
+            return list(dict.fromkeys(self._changes[position - self._changes_base:])), end
+
+    def score_posts(self, user_preferences: Dict, post_ids: Iterable[int], weights: Dict = None) -> List[Tuple[float, float, int]]:
+        """Claves (score, created_ts, post_id) de los posts indicados que siguen en el índice."""
+        keys = []
+        with self._lock:
+            for post_id in post_ids:
+                tags = self._post_tags.get(post_id)
+                if tags is None:
+                    continue
+                score = calculate_matching_score(user_preferences, tags, weights) if tags else 0.0
+                keys.append((score, self._sort_keys[post_id][0], post_id))
+        return keys
+
+    def top_matching(
+        self,
+        user_preferences: Dict,
+        limit: int,
+        min_score: float = 0.0,
+        weights: Dict = None,
+        after: Optional[Tuple[float, float, int]] = None
+    ) -> List[Tuple[int, float, float]]:
+        """
+        Devuelve hasta `limit` tuplas (post_id, score, created_ts) ordenadas de
+        forma descendente por la clave (score, created_ts, post_id).
+
+        Solo se puntúan los candidatos del índice. Si min_score <= 0, los posts
+        sin coincidencias completan la lista por orden cronológico, igual que
+        hacía get_top_matching_posts con score 0.
+
+        `after` es la clave del último elemento de la página anterior
+        (paginación por cursor): solo se devuelven elementos estrictamente
+        menores a esa clave.
+        """
+        if limit <= 0:
+            return []
+
+        user_tags = get_user_tags(user_preferences)
+        with self._lock:
+            candidate_ids = self.candidates(user_tags)
+            matched: Set[int] = set()
+            scored = []
+            for post_id in candidate_ids:
+                score = calculate_matching_score(user_preferences, self._post_tags[post_id], weights)
+                if score > 0 and score >= min_score:
+                    matched.add(post_id)
+                    timestamp, _ = self._sort_keys[post_id]
+                    key = (score, timestamp, post_id)
+                    if after is None or key < after:
+                        scored.append(key)
+
+            result = [(post_id, score, timestamp) for score, timestamp, post_id in heapq.nlargest(limit, scored)]
+
+            if len(result) < limit and min_score <= 0:
+                # Cola de posts con score 0 en orden cronológico descendente
+                end = len(self._recency)
+                if after is not None and after[0] <= 0:
+                    end = bisect.bisect_left(self._recency, (after[1], after[2]))
+                for position in range(end - 1, -1, -1):
+                    timestamp, post_id = self._recency[position]
+                    if post_id in matched:
+                        continue
+                    result.append((post_id, 0.0, timestamp))
+                    if len(result) >= limit:
+                        break
+
+        return result
+
+
+# Instancia compartida por el proceso de la API
+post_tag_index = PostTagIndex()
@@ -1,90 +1,172 @@
 import json
 import logging
-from typing import Any, Dict, Optional
-from app.core.connection import RabbitMQConnection
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
+from app.core.connection import RabbitMQConnection, RabbitMQConnectionPool
+from app.core.topology import resolve_target, declare_topology
+from app.core.serialization import SERIALIZERS, JSON_CONTENT_TYPE, encode_message, get_serializer
 import time
 import pika
+from pika import spec
 
 logger = logging.getLogger(__name__)
-class MessagePublisher:
 
-    def __init__(self, connection: RabbitMQConnection):
-        self.connection = connection
-        self._setup_exchanges_and_queues()
+# Publicaciones sin confirmar en vuelo por lote, y espera máxima de confirms
+PUBLISH_CONFIRM_WINDOW = int(os.getenv("RABBITMQ_CONFIRM_WINDOW", 512))
+PUBLISH_CONFIRM_TIMEOUT = float(os.getenv("RABBITMQ_CONFIRM_TIMEOUT", 30))
 
-    def _setup_exchanges_and_queues(self):
-        try:
-            channel = self.connection.get_channel()
+def serialize_message(message: Any) -> bytes:
+    """Cuerpo JSON del mensaje (el formato por defecto)."""
+    return SERIALIZERS[JSON_CONTENT_TYPE].dumps(message)
 
-            # Declarar el exchange principal
-            channel.exchange_declare(
-                exchange='events_exchange',
-                exchange_type='fanout',
-                durable=True
-            )
+def persistence_message(event_type: str, data: Dict[str, Any], metadata: Optional[Dict] = None) -> Dict[str, Any]:
+    """Cuerpo de un evento de la cola de persistencia."""
+    return {
+        'tipo': 'persistencia',
+        'evento': event_type,
+        'datos': data,
+        'timestamp': time.time(),
+        'metadata': metadata or {}
+    }
 
-            # Declarar las colas con sus parámetros
-            channel.queue_declare(
-                queue='reacciones_cola',
-                durable=True,
-                arguments={
-                    'x-message-ttl': 10000,
-                    'x-max-length': 5000
-                }
-            )
+class _ConfirmTracker:
+    """
+    Canal en modo confirm de una conexión y los tags pendientes del lote en
+    curso. Solo lo usa quien tiene la conexión prestada (acquire()).
 
-            channel.queue_declare(
-                queue='persistencia_cola',
-                durable=True,
-                arguments={
-                    'x-dead-letter-exchange': 'x-dead-letter-exchange'
-                }
-            )
+    Se usa el canal asíncrono subyacente de pika (_impl) porque
+    BlockingChannel espera el ack de cada mensaje; así las publicaciones van
+    en pipeline y los acks llegan a on_confirm.
+    """
+
+    def __init__(self, blocking_connection):
+        self.connection = blocking_connection
+        self.channel = blocking_connection.channel()
+        self.delivery_tag = 0
+        self.pending: "OrderedDict[int, int]" = OrderedDict()
+        self.acked: List[int] = []
+        self.nacked: List[int] = []
+        self.wake_at = 0
+
+        selected = []
+        self.channel._impl.confirm_delivery(self.on_confirm, callback=lambda frame: selected.append(frame))
+        while not selected:
+            blocking_connection.process_data_events(time_limit=1)
+
+    def usable_with(self, blocking_connection) -> bool:
+        return self.connection is blocking_connection and self.channel.is_open
+
+    def reset(self) -> None:
+        self.pending.clear()
+        self.acked = []
+        self.nacked = []
+
+    def publish(self, index: int, exchange: str, routing_key: str, body: bytes, properties) -> None:
+        self.channel._impl.basic_publish(exchange, routing_key, body, properties)
+        self.delivery_tag += 1
+        self.pending[self.delivery_tag] = index
+
+    def on_confirm(self, frame) -> None:
+        """Basic.Ack / Basic.Nack del broker; con multiple=True cubre todos los tags <= delivery_tag."""
+        method = frame.method
+        confirmed = self.nacked if isinstance(method, spec.Basic.Nack) else self.acked
+        if method.multiple:
+            while self.pending:
+                tag = next(iter(self.pending))
+                if tag > method.delivery_tag:
+                    break
+                confirmed.append(self.pending.pop(tag))
+        elif method.delivery_tag in self.pending:
+            confirmed.append(self.pending.pop(method.delivery_tag))
+
+        if len(self.pending) <= self.wake_at:
+            # Despierta (una vez) a process_data_events en wait()
+            self.wake_at = -1
+            self.connection.add_callback_threadsafe(lambda: None)
+
+    def wait(self, target: int, deadline: float) -> bool:
+        """Procesa I/O hasta que queden como mucho `target` mensajes sin confirmar."""
+        self.wake_at = target
+        while len(self.pending) > target:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.connection.process_data_events(time_limit=remaining)
+        return True
+
+class MessagePublisher:
+    """
+    Publica en RabbitMQ sobre una RabbitMQConnection o un
+    RabbitMQConnectionPool; cada operación toma la conexión con acquire(),
+    así que puede usarse desde varios hilos.
+    """
 
-            # Hacer binding de las colas al exchange
-            channel.queue_bind(exchange='events_exchange', queue='reacciones_cola')
-            channel.queue_bind(exchange='events_exchange', queue='persistencia_cola')
+    def __init__(self, connection: Union[RabbitMQConnection, RabbitMQConnectionPool], serializer=None):
+        self.connection = connection
+        # JSON o msgpack según MESSAGE_FORMAT (ver app.core.serialization)
+        self.serializer = serializer or get_serializer()
+        self._properties: Dict[Tuple[bool, str, Optional[str]], pika.BasicProperties] = {}
+        # Canal en modo confirm por conexión (ver publish_batch_messages)
+        self._trackers: Dict[int, _ConfirmTracker] = {}
+        self._trackers_lock = threading.Lock()
+        self._setup_exchanges_and_queues()
 
+    def _setup_exchanges_and_queues(self):
+        try:
+            with self.connection.acquire() as conn:
+                declare_topology(conn.get_channel())
             logger.info("✅ Exchanges y colas configurados correctamente")
 
         except Exception as e:
             logger.error(f"❌ Error al configurar exchanges y colas: {e}")
             raise
 
+    def _encode(self, message: Any, persistent: bool, message_id: Optional[str] = None):
+        """Cuerpo y propiedades AMQP del mensaje (content_type/encoding según el formato)."""
+        body, content_type, content_encoding = encode_message(message, self.serializer)
+        if message_id is not None:
+            return body, pika.BasicProperties(
+                delivery_mode=2 if persistent else 1,
+                content_type=content_type,
+                content_encoding=content_encoding,
+                message_id=message_id
+            )
+        key = (persistent, content_type, content_encoding)
+        properties = self._properties.get(key)
+        if properties is None:
+            properties = self._properties[key] = pika.BasicProperties(
+                delivery_mode=2 if persistent else 1,
+                content_type=content_type,
+                content_encoding=content_encoding
+            )
+        return body, properties
+
     def publish_message(
         self,
         message: Any,
-        exchange: str = 'events_exchange',
+        exchange: Optional[str] = None,
         routing_key: str = '',
         persistent: bool = True
     ) -> bool:
         """
-        Publica un mensaje en el exchange especificado
+        Publica un mensaje en el exchange especificado; sin exchange, en el
+        de eventos con la routing key de su 'tipo' (ver app.core.topology).
         """
         try:
-            if isinstance(message, dict):
-                message_body = json.dumps(message, ensure_ascii=False)
-            elif isinstance(message, str):
-                message_body = message
-            else:
-                message_body = json.dumps(message, ensure_ascii=False, default=str)
+            exchange, routing_key = resolve_target(message, exchange, routing_key)
+            message_body, properties = self._encode(message, persistent)
+            with self.connection.acquire() as conn:
+                conn.get_channel().basic_publish(
+                    exchange=exchange,
+                    routing_key=routing_key,
+                    body=message_body,
+                    properties=properties
+                )
 
-            channel = self.connection.get_channel()
-
-            properties = pika.BasicProperties(
-                delivery_mode=2 if persistent else 1,
-                content_type='application/json',
-                content_encoding='utf-8'
-            )
-
-            channel.basic_publish(
-                exchange=exchange,
-                routing_key=routing_key,
-                body=message_body,
-                properties=properties
-            )
-
-            logger.info(f"✅ Mensaje publicado en exchange '{exchange}': {message_body[:100]}...")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"✅ Mensaje publicado en exchange '{exchange}': {message_body[:100]!r}...")
             return True
 
         except Exception as e:
@@ -114,14 +196,36 @@ class MessagePublisher:
         data: Dict[str, Any],
         metadata: Optional[Dict] = None
     ) -> bool:
-        message = {
-            'tipo': 'persistencia',
-            'evento': event_type,
-            'datos': data,
-            'timestamp': time.time(),
-            'metadata': metadata or {}
-        }
-        return self.publish_message(message)
+        return self.publish_message(persistence_message(event_type, data, metadata))
+
+    def publish_photo_view(
+        self,
+        photo_id: int,
+        user_id: int,
+        metadata: Optional[Dict] = None
+    ) -> bool:
+        return self.publish_persistence_event('photo_viewed', {'photo_id': photo_id, 'user_id': user_id}, metadata)
+
+    def publish_photo_reaction(
+        self,
+        photo_id: int,
+        user_id: int,
+        reaction_type_id: int = 1,
+        action: str = 'like',
+        metadata: Optional[Dict] = None
+    ) -> bool:
+        data = {'photo_id': photo_id, 'user_id': user_id, 'reaction_type_id': reaction_type_id, 'action': action}
+        return self.publish_persistence_event('photo_reaction', data, metadata)
+
+    def publish_photo_comment(
+        self,
+        photo_id: int,
+        user_id: int,
+        comment: str,
+        metadata: Optional[Dict] = None
+    ) -> bool:
+        data = {'photo_id': photo_id, 'user_id': user_id, 'comment': comment}
+        return self.publish_persistence_event('photo_commented', data, metadata)
 
     def publish_user_event(
         self,
@@ -153,18 +257,102 @@ class MessagePublisher:
         }
         return self.publish_message(message)
 
-    def publish_batch_messages(self, messages: list) -> Dict[str, int]:
-        success_count = 0
-        failed_count = 0
-
-        for message in messages:
-            if self.publish_message(message):
-                success_count += 1
-            else:
-                failed_count += 1
-
-        logger.info(f"📊 Lote procesado: {success_count} exitosos, {failed_count} fallidos")
-        return {
-            'success': success_count,
-            'failed': failed_count
-        }
\ No newline at end of file
+    # ------------------------------------------------------------------
+    # Lotes con publisher confirms
+    # ------------------------------------------------------------------
+    def _confirm_tracker(self, conn: RabbitMQConnection) -> _ConfirmTracker:
+        """Tracker del canal confirm de `conn`; se recrea si la conexión cambió o el canal se cerró."""
+        conn.get_channel()  # Reconecta si hace falta
+        with self._trackers_lock:
+            tracker = self._trackers.get(id(conn))
+        if tracker is None or not tracker.usable_with(conn.connection):
+            tracker = _ConfirmTracker(conn.connection)
+            with self._trackers_lock:
+                self._trackers[id(conn)] = tracker
+        return tracker
+
+    def publish_batch_messages(
+        self,
+        messages: list,
+        exchange: Optional[str] = None,
+        routing_key: str = '',
+        persistent: bool = True,
+        window: int = PUBLISH_CONFIRM_WINDOW,
+        timeout: float = PUBLISH_CONFIRM_TIMEOUT,
+        message_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Publica un lote con publisher confirms: hasta `window` mensajes en
+        vuelo sin esperar, y se espera a los confirms cuando la ventana se
+        llena (hasta la mitad) y al final del lote.
+
+        Devuelve los conteos y los índices (posición en `messages`) de los
+        mensajes rechazados por el broker (`nacked`), sin confirmar por
+        timeout o caída de la conexión (`unconfirmed`) y no serializables
+        (`invalid`).
+
+        Con `message_ids` cada mensaje lleva su message_id en las
+        propiedades AMQP, para que los consumidores descarten duplicados.
+        Sin `exchange`, cada mensaje va con su propia routing key.
+        """
+        invalid: List[int] = []
+        acked: List[int] = []
+        nacked: List[int] = []
+        deadline = time.monotonic() + timeout
+
+        try:
+            with self.connection.acquire() as conn:
+                tracker = self._confirm_tracker(conn)
+                tracker.reset()
+                try:
+                    for index, message in enumerate(messages):
+                        try:
+                            body, properties = self._encode(
+                                message, persistent, message_ids[index] if message_ids is not None else None
+                            )
+                        except (TypeError, ValueError):
+                            invalid.append(index)
+                            continue
+
+                        tracker.publish(index, *resolve_target(message, exchange, routing_key), body, properties)
+
+                        if len(tracker.pending) >= window and not tracker.wait(window // 2, deadline):
+                            break
+
+                    tracker.wait(0, deadline)
+                except Exception:
+                    # El canal queda en estado desconocido: se recrea en el próximo lote
+                    with self._trackers_lock:
+                        self._trackers.pop(id(conn), None)
+                    raise
+                finally:
+                    acked, nacked = tracker.acked, sorted(tracker.nacked)
+                    tracker.reset()
+        except Exception as e:
+            logger.error(f"❌ Error publicando lote: {e}")
+
+        # Sin confirmar: en vuelo al vencer el timeout, no publicados o perdidos con la conexión
+        done = set(acked)
+        done.update(nacked, invalid)
+        unconfirmed = [index for index in range(len(messages)) if index not in done]
+        failed = len(nacked) + len(unconfirmed) + len(invalid)
+        result = {
+            'success': len(acked),
+            'failed': failed,
+            'nacked': nacked,
+            'unconfirmed': unconfirmed,
+            'invalid': invalid,
+        }
+        if failed:
+            logger.warning(
+                f"⚠️ Lote con fallos: {result['success']} confirmados, {len(nacked)} nack, "
+                f"{len(unconfirmed)} sin confirmar, {len(invalid)} inválidos"
+            )
+        else:
+            logger.info(f"📊 Lote confirmado: {result['success']} mensajes")
+        return result
+
+
+def get_publisher(request) -> Optional[MessagePublisher]:
+    """Publisher de la API (app.state), o None si RabbitMQ no está disponible."""
+    return getattr(request.app.state, "publisher", None)
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""
+Modelos de lectura para las rutas calientes (feeds, get_post, /me).
+
+Son dataclasses con __slots__ que se llenan desde un select() de columnas:
+la base de datos devuelve Rows y cada Row pasa tal cual al constructor, sin
+identity map ni atributos instrumentados del ORM. Solo sirven para leer;
+para escribir se siguen usando los modelos de app.models.
+
+El orden de los campos de cada dataclass es el orden de las columnas de
+su proyección (POST_COLUMNS, PHOTO_COLUMNS, ...).
+"""
+
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Any, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.photo_model import Photo
+from app.models.post_model import Post
+from app.models.user_model import User
+
+
+@dataclass(slots=True)
+class PostRead:
+    id: int
+    user_id: int
+    ocation: Optional[str]
+    location: Optional[str]
+    style: Optional[str]
+    style_tags: Optional[List[str]]
+    hide_location: bool
+    hide_votes: bool
+    hide_comments: bool
+    created_at: datetime
+    updated_at: datetime
+
+
+@dataclass(slots=True)
+class PhotoRead:
+    # Mismos campos que PhotoOut; no es frozen porque with_pending_counts
+    # suma los contadores pendientes sobre el objeto
+    id: int
+    post_id: int
+    url: str
+    order_index: Optional[int]
+    reactions_count: int
+    comments_count: int
+    views_count: int
+    created_at: datetime
+    updated_at: datetime
+    created_by: Optional[int]
+    updated_by: Optional[int]
+
+
+@dataclass(slots=True)
+class AuthorRead:
+    # Mismos campos que UserInPost
+    user_id: int
+    username: str
+    profile_picture_url: Optional[str]
+
+
+@dataclass(slots=True)
+class UserRead:
+    # Todas las columnas de users salvo el hash de la contraseña (UserOut)
+    user_id: int
+    username: str
+    email: str
+    registration_date: Optional[datetime]
+    profile_picture_url: Optional[str]
+    bio: Optional[str]
+    is_private: Optional[bool]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    created_by: Optional[int]
+    updated_by: Optional[int]
+
+
+def _projection(model, read_model) -> tuple:
+    return tuple(getattr(model, field.name) for field in fields(read_model))
+
+
+POST_COLUMNS = _projection(Post, PostRead)
+PHOTO_COLUMNS = _projection(Photo, PhotoRead)
+AUTHOR_COLUMNS = _projection(User, AuthorRead)
+USER_COLUMNS = _projection(User, UserRead)
+
+
+def from_rows(read_model, rows: Iterable[Any]) -> list:
+    return [read_model(*row) for row in rows]
+
+
+def select_posts():
+    return select(*POST_COLUMNS)
+
+
+def select_photos(post_ids: List[int]):
+    return (
+        select(*PHOTO_COLUMNS)
+        .where(Photo.post_id.in_(post_ids))
+        .order_by(Photo.post_id, Photo.order_index)
+    )
+
+
+def select_authors(user_ids: List[int]):
+    return select(*AUTHOR_COLUMNS).where(User.user_id.in_(user_ids))
+
+
+def select_user(user_id: int):
+    return select(*USER_COLUMNS).where(User.user_id == user_id)
+
+
+def get_posts_by_ids(db: Session, post_ids: List[int]) -> List[PostRead]:
+    return from_rows(PostRead, db.execute(select_posts().where(Post.id.in_(post_ids))))
+
+
+def get_user_read(db: Session, user_id: int) -> Optional[UserRead]:
+    row = db.execute(select_user(user_id)).first()
+    return UserRead(*row) if row is not None else None
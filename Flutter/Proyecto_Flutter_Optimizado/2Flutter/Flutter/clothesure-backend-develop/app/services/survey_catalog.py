@@ -0,0 +1,128 @@
+"""
+Catálogo de la encuesta (preguntas + opciones) precalculado en memoria.
+
+El catálogo casi nunca cambia: se carga con una sola consulta, se serializa
+a JSON una vez y se sirve tal cual con un ETag (hash del contenido), así
+que un cliente que ya lo tiene recibe un 304 sin cuerpo.
+
+Se recarga solo cuando cambian las tablas:
+  - los endpoints de administración de preguntas/opciones llaman a
+    invalidate() después de escribir,
+  - los cambios de otros procesos (scripts/seed_survey_questions.py, otra
+    réplica) se detectan comparando una huella barata de las tablas (conteo
+    y último updated_at), como mucho una vez cada
+    SURVEY_CATALOG_CHECK_INTERVAL segundos.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.metrics import registry
+from app.models.preference_options_model import PreferenceOption
+from app.models.preference_questions_model import PreferenceQuestion
+from app.repositories.preference_questions_repository import PreferenceQuestionsRepository
+
+logger = logging.getLogger(__name__)
+
+SURVEY_CATALOG_CHECK_INTERVAL = float(os.getenv("SURVEY_CATALOG_CHECK_INTERVAL", 60))
+
+rebuilds_total = registry.counter("survey_catalog_rebuilds_total", "Recargas del catálogo de la encuesta")
+
+
+class CatalogEntry(NamedTuple):
+    body: bytes
+    etag: str
+    fingerprint: Tuple
+
+
+def catalog_fingerprint(db: Session) -> Tuple:
+    """Conteo y último updated_at de preguntas y opciones, en una consulta."""
+    return tuple(db.execute(select(
+        select(func.count(PreferenceQuestion.id)).scalar_subquery(),
+        select(func.max(PreferenceQuestion.updated_at)).scalar_subquery(),
+        select(func.count(PreferenceOption.id)).scalar_subquery(),
+        select(func.max(PreferenceOption.updated_at)).scalar_subquery(),
+    )).one())
+
+
+def serialize_catalog(questions: List[Tuple[PreferenceQuestion, List[PreferenceOption]]]) -> Dict[str, Any]:
+    return {
+        "success": True,
+        "questions": [
+            {
+                "id": question.id,
+                "question_text": question.question_text,
+                "question_type": question.question_type,
+                "order": question.order,
+                "max_selections": question.max_selections,
+                "has_illustrations": question.has_illustrations,
+                "has_color_circles": question.has_color_circles,
+                "options": [
+                    {
+                        "id": option.id,
+                        "text": option.text,
+                        "value": option.value,
+                        "requires_text": option.requires_text
+                    }
+                    for option in options
+                ]
+            }
+            for question, options in questions
+        ]
+    }
+
+
+class SurveyCatalogCache:
+    def __init__(self, check_interval: float = SURVEY_CATALOG_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entry: Optional[CatalogEntry] = None
+        self._checked_at = 0.0
+
+    def get(self, db: Session) -> CatalogEntry:
+        entry = self._entry
+        if entry is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return entry
+
+        with self._lock:
+            entry = self._entry
+            if entry is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return entry  # Otro hilo ya lo comprobó
+            fingerprint = catalog_fingerprint(db)
+            if entry is None or entry.fingerprint != fingerprint:
+                entry = self._build(db, fingerprint)
+                self._entry = entry
+            self._checked_at = time.monotonic()
+            return entry
+
+    def invalidate(self) -> None:
+        """Fuerza la recarga en la próxima petición."""
+        with self._lock:
+            self._entry = None
+
+    def _build(self, db: Session, fingerprint: Tuple) -> CatalogEntry:
+        questions = PreferenceQuestionsRepository(db).get_catalog()
+        body = json.dumps(serialize_catalog(questions), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        rebuilds_total.inc()
+        logger.info(f"📋 Catálogo de encuesta cargado: {len(questions)} preguntas, ETag {etag}")
+        return CatalogEntry(body, etag, fingerprint)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match puede traer varios ETags, débiles (W/) o '*'."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+survey_catalog = SurveyCatalogCache()
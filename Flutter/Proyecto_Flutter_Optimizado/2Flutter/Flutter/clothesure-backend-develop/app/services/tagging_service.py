@@ -0,0 +1,198 @@
+"""
+Generación y persistencia de tags de estilo (posts.style_tags).
+
+Los tags se calculan fuera del request: create_post/update_post publican un
+evento de persistencia ('post_created'/'post_updated') y el worker de
+RabbitMQ lo procesa con handle_post_tags_event, que escribe la columna.
+"""
+
+import logging
+import re
+import unicodedata
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.db import SessionLocal
+from app.models.post_model import Post
+
+logger = logging.getLogger(__name__)
+
+# Eventos de persistencia que disparan el cálculo de tags
+POST_TAG_EVENTS = ("post_created", "post_updated")
+
+# Tabla declarativa de reglas. El orden define el orden de los tags generados.
+# Estilo: coincidencia exacta del campo `style` (sin acentos, en minúsculas).
+STYLE_RULES: Tuple[Tuple[Tuple[str, ...], Tuple[str, ...]], ...] = (
+    (("casual", "casuales"), ("casual", "dia_casual", "relajado")),
+    (("formal", "formales"), ("formal", "trabajo_oficina", "eventos_especiales")),
+    (("elegante", "elegantes"), ("elegante", "eventos_especiales", "trabajo_oficina")),
+    (("deportivo", "deportivos"), ("deportivo", "deportes_ejercicio", "activo")),
+    (("gotico", "gótico", "goticos"), ("gotico", "alternativo", "eventos_especiales")),
+    (("vintage", "vintages"), ("vintage", "retro", "eventos_especiales")),
+    (("bohemio", "bohemios"), ("bohemio", "artistico", "eventos_especiales")),
+)
+
+# Descripción (`ocation`): el tag se agrega si el texto contiene alguna palabra.
+KEYWORD_RULES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    # Prendas
+    ("jeans", ("jeans", "vaqueros", "pantalones")),
+    ("camisetas", ("camiseta", "camisetas", "t-shirt")),
+    ("tops_blusas", ("blusa", "blusas", "top")),
+    ("vestidos", ("vestido", "vestidos")),
+    ("faldas", ("falda", "faldas")),
+    ("pantalones", ("pantalon", "pantalones")),
+    ("chaquetas", ("chaqueta", "chaquetas", "blazer")),
+    ("sudaderas", ("sudadera", "sudaderas", "hoodie")),
+    ("chandal", ("chandal", "chándal")),
+    # Calzado
+    ("zapatillas_deportivas", ("zapatillas", "sneakers", "tenis")),
+    ("sneakers", ("sneakers", "sneaker")),
+    ("zapatos", ("zapatos", "zapato")),
+    ("botas", ("botas", "bota")),
+    ("sandalias", ("sandalias",)),
+    # Ocasiones
+    ("trabajo_oficina", ("trabajo", "oficina", "profesional")),
+    ("deportes_ejercicio", ("deporte", "gym", "ejercicio", "correr")),
+    ("eventos_especiales", ("fiesta", "evento", "especial", "noche")),
+    ("dia_casual", ("dia", "diario", "normal", "comun")),
+    ("playa_verano", ("playa", "verano", "vacaciones")),
+    ("invierno", ("invierno", "frio", "abrigo")),
+)
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas y sin acentos ('Chándal' -> 'chandal')."""
+    texto = texto.lower()
+    if texto.isascii():
+        return texto
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+def _trie_regex(palabras: Iterable[str]) -> str:
+    """
+    Alternación factorizada por prefijos ('bota|botas' -> 'bota(?:s)?'), de
+    modo que el motor de regex compara cada carácter una sola vez en lugar de
+    probar todas las palabras en cada posición.
+    """
+    trie: Dict[str, dict] = {}
+    for palabra in palabras:
+        nodo = trie
+        for caracter in palabra:
+            nodo = nodo.setdefault(caracter, {})
+        nodo[""] = {}
+
+    def construir(nodo: Dict[str, dict]) -> str:
+        final = "" in nodo
+        ramas = [re.escape(c) + construir(hijo) for c, hijo in sorted(nodo.items()) if c]
+        if not ramas:
+            return ""
+        cuerpo = ramas[0] if len(ramas) == 1 else "(?:" + "|".join(ramas) + ")"
+        if final:
+            # Codicioso: primero la palabra más larga, luego el prefijo
+            return (cuerpo if len(ramas) == 1 and len(cuerpo) == 1 else "(?:" + cuerpo + ")") + "?"
+        return cuerpo
+
+    return construir(trie)
+
+class KeywordTagger:
+    """
+    Matcher precompilado a partir de STYLE_RULES y KEYWORD_RULES.
+
+    Todas las palabras clave se compilan en una sola expresión regular
+    (trie de prefijos) y la descripción normalizada se recorre una vez: tras
+    cada coincidencia la búsqueda continúa en la posición siguiente, así que
+    también se detectan palabras solapadas. Como en cada posición solo se
+    reporta la palabra más larga, cada palabra clave activa además las reglas
+    de las palabras clave contenidas en ella ('sneakers' -> 'sneaker').
+    """
+
+    def __init__(self, style_rules=STYLE_RULES, keyword_rules=KEYWORD_RULES):
+        self._style_tags: Dict[str, Tuple[str, ...]] = {}
+        for aliases, tags in style_rules:
+            for alias in aliases:
+                self._style_tags.setdefault(normalizar_texto(alias), tuple(tags))
+
+        self._rule_tags: Tuple[str, ...] = tuple(tag for tag, _ in keyword_rules)
+        rules_by_keyword: Dict[str, Set[int]] = {}
+        for index, (_, keywords) in enumerate(keyword_rules):
+            for keyword in keywords:
+                rules_by_keyword.setdefault(normalizar_texto(keyword), set()).add(index)
+
+        # Cierre por subcadenas: una coincidencia activa también las reglas de
+        # cualquier palabra clave contenida en ella
+        self._rules_by_keyword: Dict[str, FrozenSet[int]] = {
+            keyword: frozenset(
+                index
+                for other, indexes in rules_by_keyword.items() if other in keyword
+                for index in indexes
+            )
+            for keyword in rules_by_keyword
+        }
+        self._pattern = re.compile(_trie_regex(self._rules_by_keyword)) if self._rules_by_keyword else None
+
+    def tags(self, style: Optional[str], ocation: Optional[str]) -> List[str]:
+        tags: List[str] = []
+        if style:
+            tags.extend(self._style_tags.get(normalizar_texto(style), ()))
+
+        if ocation and self._pattern is not None:
+            text = normalizar_texto(ocation)
+            search = self._pattern.search
+            matched: Set[int] = set()
+            match = search(text)
+            while match is not None:
+                matched |= self._rules_by_keyword[match.group()]
+                match = search(text, match.start() + 1)
+            tags.extend(self._rule_tags[index] for index in sorted(matched))
+
+        # Eliminar duplicados y mantener orden
+        return list(dict.fromkeys(tags))
+
+    def tags_batch(self, posts: Iterable[Tuple[Optional[str], Optional[str]]]) -> List[List[str]]:
+        """Tags para una lista de pares (style, ocation)."""
+        return [self.tags(style, ocation) for style, ocation in posts]
+
+# Matcher compartido, compilado una sola vez por proceso
+keyword_tagger = KeywordTagger()
+
+def generar_tags_por_estilo(style, ocation):
+    """
+    Genera tags automáticamente basados en el estilo y descripción del post.
+    """
+    return keyword_tagger.tags(style, ocation)
+
+def generar_tags_batch(posts: Iterable[Tuple[Optional[str], Optional[str]]]) -> List[List[str]]:
+    """Versión por lotes de generar_tags_por_estilo para pares (style, ocation)."""
+    return keyword_tagger.tags_batch(posts)
+
+def compute_and_store_post_tags(db: Session, post_id: int) -> Optional[List[str]]:
+    """Calcula los tags de un post con su estado actual y los guarda."""
+    row = db.query(Post.style, Post.ocation).filter(Post.id == post_id).first()
+    if row is None:
+        return None
+    tags = generar_tags_por_estilo(row.style, row.ocation)
+    db.query(Post).filter(Post.id == post_id).update(
+        {Post.style_tags: tags}, synchronize_session=False
+    )
+    return tags
+
+def handle_post_tags_event(data: Dict[str, Any], message_data: Dict[str, Any] = None) -> None:
+    """Handler de eventos 'post_created'/'post_updated' para el worker."""
+    post_id = (data or {}).get("post_id")
+    if post_id is None:
+        logger.warning(f"⚠️ Evento de tags sin post_id: {message_data}")
+        return
+
+    db = SessionLocal()
+    try:
+        tags = compute_and_store_post_tags(db, int(post_id))
+        db.commit()
+        if tags is None:
+            logger.warning(f"⚠️ Post {post_id} no existe, tags no generados")
+        else:
+            logger.info(f"🏷️ Tags guardados para post {post_id}: {tags}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
@@ -1,6 +1,7 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from app.core.base_service import BaseService
+from app.core.db import commit_or_flush
 from app.models.user_device_model import UserDevice
 from app.repositories.user_device_repository import UserDeviceModel
 from datetime import datetime, timedelta
@@ -24,7 +25,7 @@ class UserDeviceService(BaseService):
                 updated_by=user_id
             )
             db.add(new_device)
-            db.commit()
+            commit_or_flush(db)
 
     def register_or_update_device(self, db: Session,user_id: int,fcm_token: str = None,device_type: str = None,device_name: str = None,device_os: str = None,browser: str = None,ip_address: str = None) -> UserDevice:
 
@@ -42,8 +43,7 @@ class UserDeviceService(BaseService):
             device.device_os = device_os
             device.browser = browser
             device.last_activity = datetime.utcnow()
-            db.commit()
-            db.refresh(device)
+            commit_or_flush(db, device)
         else:
             device = UserDevice(
                 user_id=user_id,
@@ -60,8 +60,7 @@ class UserDeviceService(BaseService):
                 updated_by=user_id
             )
             db.add(device)
-            db.commit()
-            db.refresh(device)
+            commit_or_flush(db, device)
 
         return device
 
@@ -70,14 +69,14 @@ class UserDeviceService(BaseService):
         if device:
             device.is_active = False
             device.last_logout = datetime.utcnow()
-            db.commit()
+            commit_or_flush(db)
         return device
 
     def logout_all_devices(self,db: Session, user_id: int):
         db.query(UserDevice).filter_by(user_id=user_id, is_active=True).update(
             {"is_active": False, "last_logout": datetime.utcnow()}
         )
-        db.commit()
+        commit_or_flush(db)
 
     def mark_inactive_expired(self, db: Session, timeout_minutes: int = 5):
         threshold = datetime.utcnow() - timedelta(minutes=timeout_minutes)
@@ -85,5 +84,5 @@ class UserDeviceService(BaseService):
             UserDevice.is_active == True,
             UserDevice.last_activity < threshold
         ).update({"is_active": False})
-        db.commit()
+        commit_or_flush(db)
 
@@ -7,7 +7,7 @@ from app.security.jwt import create_access_token
 from typing import Dict, Any
 from fastapi import HTTPException
 from jose import jwt, JWTError
-from app.core.db import SECRET_KEY, ALGORITHM
+from app.core.db import SECRET_KEY, ALGORITHM, commit_or_flush
 from fastapi import HTTPException
 from datetime import datetime, timedelta
 from app.services.audit_service import set_audit_fields  
@@ -31,8 +31,7 @@ class UserService(BaseService):
         db.flush()  
         set_audit_fields(new_user, user_id=new_user.user_id, is_create=True)
 
-        db.commit()
-        db.refresh(new_user)
+        commit_or_flush(db, new_user)
 
         return new_user
 
@@ -81,8 +80,7 @@ class UserService(BaseService):
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
         user.password = pwd_context.hash(new_password)
-        db.commit()
-        db.refresh(user)
+        commit_or_flush(db, user)
         return user
     
     def get_current_user_from_token(self, token: str) -> Dict[str, Any]:
@@ -94,7 +92,7 @@ class UserService(BaseService):
             user = self.repo.get(user_id, self.model_class.user_id)
             if not user:
                 raise HTTPException(status_code=404, detail="User not found")
-            return {"user_id": user.user_id, "email": user.email, "full_name": user.full_name}
+            return {"user_id": user.user_id, "email": user.email, "full_name": user.username}
         except JWTError:
             raise HTTPException(status_code=401, detail="Invalid token")
         
@@ -111,6 +109,5 @@ class UserService(BaseService):
         user.password = pwd_context.hash(new_password)
         set_audit_fields(user, user_id=user.user_id, is_create=False)
 
-        db.commit()
-        db.refresh(user)
+        commit_or_flush(db, user)
         return user
\ No newline at end of file
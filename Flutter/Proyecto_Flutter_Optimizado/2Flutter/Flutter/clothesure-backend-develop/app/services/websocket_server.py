@@ -1,9 +1,18 @@
 """
 Servidor Socket.IO para The Clothesure 2.0
 Integra el frontend React con RabbitMQ a través de eventos Socket.IO
+
+Varias réplicas (SOCKETIO_MANAGER=rabbitmq|redis): los emits pasan por un
+client manager respaldado por una cola, así que llegan a los sockets de
+todas las réplicas aunque cada una solo conozca sus propias rooms. Todas
+las réplicas consumen la misma reacciones_cola como consumidores en
+competencia: cada evento lo recibe una sola réplica y lo emite una vez
+para todo el cluster. Solo las réplicas de Socket.IO consumen esa cola (el
+worker no), así que ningún evento se queda sin emitir.
 """
 
 import asyncio
+import functools
 import json
 import logging
 import os
@@ -23,8 +32,8 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from app.core.connection import RabbitMQConnection
-from publisher import MessagePublisher
-from consumer import MessageConsumer
+from app.services.publisher import MessagePublisher
+from app.services.consumer import MessageConsumer
 from app.core.config import LoggingConfig
 
 # Cargar .env desde el directorio padre
@@ -33,6 +42,31 @@ load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 LoggingConfig.setup_logging(level='INFO')
 logger = logging.getLogger(__name__)
 
+# local (un solo proceso), rabbitmq (aio_pika) o redis
+SOCKETIO_MANAGER = os.getenv("SOCKETIO_MANAGER", "local").lower()
+SOCKETIO_MANAGER_URL = os.getenv("SOCKETIO_MANAGER_URL")
+SOCKETIO_CHANNEL = os.getenv("SOCKETIO_CHANNEL", "clothesure-socketio")
+SOCKETIO_PREFETCH = int(os.getenv("SOCKETIO_PREFETCH", 50))
+
+
+def create_client_manager(name: str = SOCKETIO_MANAGER):
+    """
+    Client manager de Socket.IO para varias réplicas. None = manager en
+    memoria (una sola réplica). rabbitmq usa el mismo broker que los eventos
+    (CLOUDAMQP_URL) con un exchange propio.
+    """
+    try:
+        if name == "rabbitmq":
+            url = SOCKETIO_MANAGER_URL or os.getenv('CLOUDAMQP_URL')
+            return socketio.AsyncAioPikaManager(url, channel=SOCKETIO_CHANNEL)
+        if name == "redis":
+            url = SOCKETIO_MANAGER_URL or "redis://localhost:6379/0"
+            return socketio.AsyncRedisManager(url, channel=SOCKETIO_CHANNEL)
+    except (ImportError, RuntimeError) as e:
+        # aio_pika / redis no instalados
+        logger.warning(f"⚠️ Client manager '{name}' no disponible ({e}), usando modo de una sola réplica")
+    return None
+
 
 class ClothesureSocketIOServer:
     def __init__(self, host: str = "0.0.0.0", port: int = 3000):
@@ -40,8 +74,10 @@ class ClothesureSocketIOServer:
         self.port = port
 
         # Inicializar Socket.IO server
+        self.client_manager = create_client_manager()
         self.sio = socketio.AsyncServer(
             async_mode='aiohttp',
+            client_manager=self.client_manager,
             cors_allowed_origins='*',
             ping_interval=20,
             ping_timeout=10
@@ -53,6 +89,7 @@ class ClothesureSocketIOServer:
         self.rabbitmq_connection: Optional[RabbitMQConnection] = None
         self.publisher: Optional[MessagePublisher] = None
         self.consumer: Optional[MessageConsumer] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
 
         # Eventos Socket.IO
         @self.sio.event
@@ -98,8 +135,11 @@ class ClothesureSocketIOServer:
             if not user_id or not outfit_id:
                 await self.sio.emit('error', {'message': 'userId y outfitId son requeridos'}, to=sid)
                 return
+            published = False
             if self.publisher:
-                self.publisher.publish_reaction(
+                # pika es bloqueante: se publica fuera del event loop
+                published = await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+                    self.publisher.publish_reaction,
                     user_id=user_id,
                     outfit_id=outfit_id,
                     action=action,
@@ -108,7 +148,7 @@ class ClothesureSocketIOServer:
                         'timestamp': data.get('timestamp'),
                         'likes_count': data.get('likes_count')
                     }
-                )
+                ))
             # Respuesta exitosa para Flutter
             success_payload = {
                 'outfitId': outfit_id,
@@ -118,8 +158,11 @@ class ClothesureSocketIOServer:
                 'user_id': user_id
             }
             await self.sio.emit('reaction_success', success_payload, to=sid)
-            
-            # Broadcast a otros usuarios
+
+            if published:
+                # El like_update lo emite (una vez) la réplica que consuma el evento
+                return
+            # Sin colas: broadcast directo a otros usuarios
             broadcast_payload = {
                 'outfit_id': outfit_id,
                 'likes_count': data.get('likes_count'),
@@ -145,10 +188,12 @@ class ClothesureSocketIOServer:
 
             if self.rabbitmq_connection.connect():
                 logger.info("✅ Conexión a RabbitMQ establecida")
+                self.loop = asyncio.get_running_loop()
                 self.publisher = MessagePublisher(self.rabbitmq_connection)
-                self.consumer = MessageConsumer(self.rabbitmq_connection)
+                self.consumer = MessageConsumer(self.rabbitmq_connection, prefetch_count=SOCKETIO_PREFETCH)
+                # Solo la cola de tiempo real: persistencia_cola es del worker. Todas
+                # las réplicas comparten reacciones_cola, así que cada evento llega a una
                 self.consumer.start_consuming('reacciones_cola', self.handle_rabbitmq_message)
-                self.consumer.start_consuming('persistencia_cola', self.handle_rabbitmq_message)
                 return True
             logger.error("❌ No se pudo conectar a RabbitMQ")
             return False
@@ -175,10 +220,12 @@ class ClothesureSocketIOServer:
                     event_name = 'notification'
                     payload = message_data.get('data') or message_data
 
+            # Llega desde el hilo del consumidor: el emit se agenda en el event loop
             if event_name:
-                asyncio.create_task(self.emit_event(event_name, payload, room))
+                coroutine = self.emit_event(event_name, payload, room)
             else:
-                asyncio.create_task(self.emit_event('message', message_data))
+                coroutine = self.emit_event('message', message_data)
+            asyncio.run_coroutine_threadsafe(coroutine, self.loop)
         except Exception as e:
             logger.error(f"❌ Error procesando mensaje RabbitMQ: {e}")
 
@@ -211,6 +258,9 @@ class ClothesureSocketIOServer:
             await asyncio.sleep(3600)
 
     def cleanup(self):
+        if self.consumer:
+            self.consumer.stop_all_consuming()
+            self.consumer.join()
         if self.rabbitmq_connection:
             self.rabbitmq_connection.disconnect()
             logger.info("🔌 Conexión RabbitMQ cerrada")
@@ -48,7 +48,7 @@ def main():
     )
 
     if ok:
-        print("✅ Mensaje publicado en exchange 'events_exchange' → cola 'reacciones_cola'")
+        print("✅ Mensaje publicado con routing key 'reaction.%s' → cola 'reacciones_cola'" % args.action)
     else:
         print("❌ Error publicando mensaje")
 
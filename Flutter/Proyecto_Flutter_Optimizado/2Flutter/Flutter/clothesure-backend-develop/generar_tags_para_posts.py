@@ -10,87 +10,7 @@ import json
 # Agregar el directorio padre al path para importar app
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-def generar_tags_por_estilo(style, ocation):
-    """
-    Genera tags automáticamente basados en el estilo y descripción del post.
-    """
-    tags = []
-    
-    # Tags basados en el estilo
-    if style:
-        style_lower = style.lower()
-        if style_lower in ['casual', 'casuales']:
-            tags.extend(['casual', 'dia_casual', 'relajado'])
-        elif style_lower in ['formal', 'formales']:
-            tags.extend(['formal', 'trabajo_oficina', 'eventos_especiales'])
-        elif style_lower in ['elegante', 'elegantes']:
-            tags.extend(['elegante', 'eventos_especiales', 'trabajo_oficina'])
-        elif style_lower in ['deportivo', 'deportivos']:
-            tags.extend(['deportivo', 'deportes_ejercicio', 'activo'])
-        elif style_lower in ['gotico', 'gótico', 'goticos']:
-            tags.extend(['gotico', 'alternativo', 'eventos_especiales'])
-        elif style_lower in ['vintage', 'vintages']:
-            tags.extend(['vintage', 'retro', 'eventos_especiales'])
-        elif style_lower in ['bohemio', 'bohemios']:
-            tags.extend(['bohemio', 'artistico', 'eventos_especiales'])
-    
-    # Tags basados en la descripción (ocation)
-    if ocation:
-        ocation_lower = ocation.lower()
-        
-        # Detectar prendas específicas
-        if any(word in ocation_lower for word in ['jeans', 'vaqueros', 'pantalones']):
-            tags.append('jeans')
-        if any(word in ocation_lower for word in ['camiseta', 'camisetas', 't-shirt']):
-            tags.append('camisetas')
-        if any(word in ocation_lower for word in ['blusa', 'blusas', 'top']):
-            tags.append('tops_blusas')
-        if any(word in ocation_lower for word in ['vestido', 'vestidos']):
-            tags.append('vestidos')
-        if any(word in ocation_lower for word in ['falda', 'faldas']):
-            tags.append('faldas')
-        if any(word in ocation_lower for word in ['pantalon', 'pantalones']):
-            tags.append('pantalones')
-        if any(word in ocation_lower for word in ['chaqueta', 'chaquetas', 'blazer']):
-            tags.append('chaquetas')
-        if any(word in ocation_lower for word in ['sudadera', 'sudaderas', 'hoodie']):
-            tags.append('sudaderas')
-        if any(word in ocation_lower for word in ['chandal', 'chándal']):
-            tags.append('chandal')
-        
-        # Detectar calzado
-        if any(word in ocation_lower for word in ['zapatillas', 'sneakers', 'tenis']):
-            tags.append('zapatillas_deportivas')
-        if any(word in ocation_lower for word in ['sneakers', 'sneaker']):
-            tags.append('sneakers')
-        if any(word in ocation_lower for word in ['zapatos', 'zapato']):
-            tags.append('zapatos')
-        if any(word in ocation_lower for word in ['botas', 'bota']):
-            tags.append('botas')
-        if any(word in ocation_lower for word in ['sandalias', 'sandalias']):
-            tags.append('sandalias')
-        
-        # Detectar ocasiones
-        if any(word in ocation_lower for word in ['trabajo', 'oficina', 'profesional']):
-            tags.append('trabajo_oficina')
-        if any(word in ocation_lower for word in ['deporte', 'gym', 'ejercicio', 'correr']):
-            tags.append('deportes_ejercicio')
-        if any(word in ocation_lower for word in ['fiesta', 'evento', 'especial', 'noche']):
-            tags.append('eventos_especiales')
-        if any(word in ocation_lower for word in ['dia', 'diario', 'normal', 'comun']):
-            tags.append('dia_casual')
-        if any(word in ocation_lower for word in ['playa', 'verano', 'vacaciones']):
-            tags.append('playa_verano')
-        if any(word in ocation_lower for word in ['invierno', 'frio', 'abrigo']):
-            tags.append('invierno')
-    
-    # Eliminar duplicados y mantener orden
-    unique_tags = []
-    for tag in tags:
-        if tag not in unique_tags:
-            unique_tags.append(tag)
-    
-    return unique_tags
+from app.services.tagging_service import generar_tags_por_estilo
 
 def actualizar_posts_con_tags():
     """Actualiza todos los posts con tags generados automáticamente."""
@@ -1,7 +1,9 @@
 from fastapi import FastAPI
-from app.core.db import Base, engine
-from app.routes import carros_handler, user_handler, photo_handler, post_handler,preference_question_handler,preference_options_handler,user_preference_handler, preferences_handler
-from app.services.publisher import MessagePublisher
+from fastapi.concurrency import run_in_threadpool
+from app.core.db import Base, engine, async_engine, DB_ASYNC
+from app.routes import carros_handler, user_handler, photo_handler, post_handler,preference_question_handler,preference_options_handler,user_preference_handler, preferences_handler, metrics_handler
+from app.services.async_publisher import create_publisher, PUBLISHER_MODE
+from app.services.counter_service import pending_counters, InMemoryPendingCounters
 from app.core.connection import RabbitMQConnection
 from app.core.config import RabbitMQConfig
 import logging
@@ -28,25 +30,43 @@ app.add_middleware(
 )
 
 
+if DB_ASYNC:
+    # Las variantes async se registran primero para que tengan prioridad
+    app.include_router(post_handler.async_router)
+    app.include_router(photo_handler.async_router)
+
 app.include_router(carros_handler.router)
 app.include_router(user_handler.router)
 app.include_router(photo_handler.router)
 app.include_router(post_handler.router)
 app.include_router(preference_question_handler.router)
 app.include_router(preferences_handler.router, prefix="/api/preferences", tags=["preferences"])
+app.include_router(metrics_handler.router)
 
 
 @app.on_event("startup")
 async def startup_event():
+    if isinstance(pending_counters, InMemoryPendingCounters):
+        # La API no recibe los deltas del worker: sin Redis los contadores se ven al flush
+        logger.warning(
+            "⚠️ COUNTER_OVERLAY_BACKEND=memory: los contadores de fotos no incluyen los "
+            "deltas pendientes del worker (usa COUNTER_OVERLAY_BACKEND=redis)"
+        )
     app.state.rabbit_conn = RabbitMQConnection(url=RabbitMQConfig.get_config()['url'])
-    if app.state.rabbit_conn.connect():
-        logger.info("Conexión a RabbitMQ establecida para la API")
-        app.state.publisher = MessagePublisher(app.state.rabbit_conn)
-    else:
-        logger.error("No se pudo conectar a RabbitMQ en la API")
+    try:
+        # En modo async la conexión la abre el hilo de I/O del publisher
+        app.state.publisher = create_publisher(app.state.rabbit_conn)
+        logger.info(f"Publisher de RabbitMQ listo para la API (modo {PUBLISHER_MODE})")
+    except Exception as e:
+        logger.error(f"No se pudo conectar a RabbitMQ en la API: {e}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    if hasattr(app.state, "rabbit_conn"):
-        app.state.rabbit_conn.disconnect()
-        logger.info("🔌 Conexión a RabbitMQ cerrada en la API")
\ No newline at end of file
+    if hasattr(app.state, "publisher") and hasattr(app.state.publisher, "close"):
+        # Vacía el outbox (o lo guarda en disco) antes de cerrar la conexión
+        await run_in_threadpool(app.state.publisher.close)
+    elif hasattr(app.state, "publisher"):
+        app.state.publisher.connection.disconnect()
+        logger.info("🔌 Conexión a RabbitMQ cerrada en la API")
+    if async_engine is not None:
+        await async_engine.dispose()
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""
+Agrega la columna posts.style_tags (JSON, como en Post.style_tags) si no
+existe. El modelo la mapea en todas las consultas de posts, así que hay que
+ejecutarlo antes de desplegar la API y el worker; después se rellenan los
+posts existentes con scripts/backfill_style_tags.py.
+
+Uso: python scripts/add_posts_style_tags_column.py
+"""
+
+import sys
+import os
+
+# Agregar el directorio padre al path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app.core.db import engine
+
+def main():
+    print("=" * 60)
+    print("COLUMNA posts.style_tags")
+    print("=" * 60)
+
+    # Sin valor por defecto: en PostgreSQL es un cambio solo de catálogo
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE posts ADD COLUMN IF NOT EXISTS style_tags JSON"))
+
+    columnas = {columna["name"] for columna in inspect(engine).get_columns("posts")}
+    if "style_tags" in columnas:
+        print("[OK] Columna 'posts.style_tags' lista")
+    else:
+        print("[ERROR] La columna 'posts.style_tags' no se creó")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Backfill de posts.style_tags para los posts existentes.
+
+Lee los posts en streaming (cursor del lado del servidor, por bloques) y
+escribe los tags con UPDATEs en lote (executemany), un commit por bloque.
+La columna la crea scripts/add_posts_style_tags_column.py antes del
+despliegue; si aun así falta, se agrega aquí.
+
+Uso: python scripts/backfill_style_tags.py [--chunk-size 1000] [--only-missing] [--dry-run]
+"""
+
+import sys
+import os
+import argparse
+import time
+
+# Agregar el directorio padre al path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import bindparam, select, text, update
+
+from app.core.db import engine
+from app.models.post_model import Post
+from app.services.tagging_service import generar_tags_batch
+
+posts_table = Post.__table__
+
+def asegurar_columna():
+    """Agrega posts.style_tags si no existe (solo PostgreSQL), como JSON igual que el modelo."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE posts ADD COLUMN IF NOT EXISTS style_tags JSON"))
+
+def backfill(chunk_size: int, only_missing: bool, dry_run: bool) -> int:
+    consulta = select(posts_table.c.id, posts_table.c.style, posts_table.c.ocation).order_by(posts_table.c.id)
+    if only_missing:
+        consulta = consulta.where(posts_table.c.style_tags.is_(None))
+
+    sentencia = (
+        update(posts_table)
+        .where(posts_table.c.id == bindparam("b_id"))
+        .values(style_tags=bindparam("b_tags"))
+    )
+
+    total = 0
+    inicio = time.perf_counter()
+    # Conexión de lectura en streaming; las escrituras van por otra conexión
+    with engine.connect() as lectura:
+        resultado = lectura.execution_options(stream_results=True, yield_per=chunk_size).execute(consulta)
+        for bloque in resultado.partitions(chunk_size):
+            tags = generar_tags_batch((fila.style, fila.ocation) for fila in bloque)
+            filas = [{"b_id": fila.id, "b_tags": t} for fila, t in zip(bloque, tags)]
+            if not dry_run:
+                with engine.begin() as escritura:
+                    escritura.execute(sentencia, filas)
+            total += len(filas)
+            print(f"  {total} posts procesados ({time.perf_counter() - inicio:.1f} s)")
+
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill de style_tags en posts")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--only-missing", action="store_true", help="Solo posts con style_tags NULL")
+    parser.add_argument("--dry-run", action="store_true", help="Calcula los tags sin escribirlos")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BACKFILL DE STYLE_TAGS")
+    print("=" * 60)
+
+    if not args.dry_run:
+        asegurar_columna()
+
+    total = backfill(args.chunk_size, args.only_missing, args.dry_run)
+    print(f"[OK] Tags {'calculados' if args.dry_run else 'guardados'} para {total} posts")
+
+if __name__ == "__main__":
+    main()
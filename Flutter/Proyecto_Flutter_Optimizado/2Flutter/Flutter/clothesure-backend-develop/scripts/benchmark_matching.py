@@ -0,0 +1,97 @@
+"""
+Benchmark del matching: bucle original vs BatchMatchingScorer (NumPy).
+Genera posts y usuarios sintéticos con los valores de la encuesta, verifica
+que ambos modos den los mismos scores y compara tiempos.
+
+Uso: python scripts/benchmark_matching.py [--posts 50000] [--users 200]
+"""
+
+import sys
+import os
+import argparse
+import random
+import time
+
+# Agregar el directorio padre al path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.matching_service import (
+    BatchMatchingScorer,
+    build_tag_vocabulary,
+    calculate_matching_score,
+)
+from scripts.seed_survey_questions import SURVEY_QUESTIONS
+
+def valores_por_pregunta():
+    return {q["order"]: [opt["value"] for opt in q["options"]] for q in SURVEY_QUESTIONS}
+
+def generar_posts(n, valores, rng):
+    todos = [v for opciones in valores.values() for v in opciones]
+    return [{"id": i, "style_tags": rng.sample(todos, rng.randint(0, 6))} for i in range(n)]
+
+def generar_usuarios(n, valores, rng):
+    return [
+        {
+            "style_personal": rng.choice(valores[1]),
+            "occasions": rng.sample(valores[2], rng.randint(1, 3)),
+            "favorite_items": rng.sample(valores[3], rng.randint(1, 3)),
+            "body_shape": rng.choice(valores[4]),
+            "shoes": rng.sample(valores[7], rng.randint(1, 3)),
+            "accessories": rng.choice(valores[8]),
+        }
+        for _ in range(n)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de matching loop vs batch")
+    parser.add_argument("--posts", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    valores = valores_por_pregunta()
+    posts = generar_posts(args.posts, valores, rng)
+    usuarios = generar_usuarios(args.users, valores, rng)
+
+    vocabulario = build_tag_vocabulary(v for opciones in valores.values() for v in opciones)
+    scorer = BatchMatchingScorer(vocabulario)
+
+    print("=" * 60)
+    print(f"BENCHMARK MATCHING: {args.posts} posts, {args.users} usuarios, vocabulario={len(vocabulario)}")
+    print("=" * 60)
+
+    # 1 usuario contra todos los posts
+    usuario = usuarios[0]
+    inicio = time.perf_counter()
+    loop_scores = [calculate_matching_score(usuario, p["style_tags"]) for p in posts]
+    t_loop = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    matriz = scorer.encode_posts(p["style_tags"] for p in posts)
+    t_encode = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    batch_scores = scorer.score_posts(matriz, usuario)
+    t_batch = time.perf_counter() - inicio
+
+    assert loop_scores == batch_scores.tolist(), "Los scores batch no coinciden con el bucle"
+    print(f"1 usuario  | loop: {t_loop * 1000:9.1f} ms | batch: {t_batch * 1000:7.1f} ms "
+          f"(+ encode {t_encode * 1000:.1f} ms una vez) | x{t_loop / max(t_batch, 1e-9):.0f}")
+
+    # Muchos usuarios contra muchos posts
+    inicio = time.perf_counter()
+    loop_matrix = [[calculate_matching_score(u, p["style_tags"]) for u in usuarios] for p in posts]
+    t_loop = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    batch_matrix = scorer.score_matrix(matriz, usuarios)
+    t_batch = time.perf_counter() - inicio
+
+    assert loop_matrix == batch_matrix.tolist(), "La matriz batch no coincide con el bucle"
+    print(f"{args.users} usuarios | loop: {t_loop * 1000:9.1f} ms | batch: {t_batch * 1000:7.1f} ms "
+          f"| x{t_loop / max(t_batch, 1e-9):.0f}")
+    print("[OK] Scores idénticos en ambos modos")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark de lectura de posts: entidades del ORM (select(Post)) vs modelos
+de lectura (PostRead desde un select() de columnas), hasta el dict que
+devuelve el feed (post_to_feed_dict).
+
+Mide latencia (mejor de --repeat) y memoria retenida por los objetos
+cargados (tracemalloc), y comprueba que ambos caminos den los mismos dicts.
+
+Por defecto genera --posts posts sintéticos en un sqlite en memoria; con
+--url lee los posts que ya existen en esa base (sin escribir nada).
+
+Uso: python scripts/benchmark_read_models.py [--posts 100000] [--url postgresql://...] [--repeat 3]
+"""
+
+import sys
+import os
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Agregar el directorio padre al path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.models.post_model import Post
+from app.models.user_model import User
+from app.routes.post_handler import post_to_feed_dict
+from app.services.read_models import PostRead, from_rows, select_posts
+
+ESTILOS = ["casual", "urbano", "formal", "deportivo", "bohemio", "minimalista", "vintage", "denim"]
+
+def crear_base_sintetica(n):
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    User.__table__.create(engine)
+    Post.__table__.create(engine)
+    rng = random.Random(42)
+    inicio = datetime(2025, 1, 1)
+    filas = [
+        {
+            "id": i + 1,
+            "user_id": 1 + i % 5000,
+            "ocation": "Outfit de fin de semana",
+            "location": "Ciudad de México",
+            "style": rng.choice(ESTILOS),
+            "style_tags": rng.sample(ESTILOS, rng.randint(0, 4)),
+            "hide_location": False,
+            "hide_votes": False,
+            "hide_comments": False,
+            "created_at": inicio + timedelta(seconds=i),
+            "updated_at": inicio + timedelta(seconds=i),
+        }
+        for i in range(n)
+    ]
+    with engine.begin() as conn:
+        for desde in range(0, n, 10000):
+            conn.execute(insert(Post.__table__), filas[desde:desde + 10000])
+    return engine
+
+def cargar_orm(engine, n):
+    with Session(engine) as db:
+        posts = db.scalars(select(Post).order_by(Post.id).limit(n)).all()
+        return posts, [post_to_feed_dict(post) for post in posts]
+
+def cargar_read_model(engine, n):
+    with Session(engine) as db:
+        posts = from_rows(PostRead, db.execute(select_posts().order_by(Post.id).limit(n)))
+        return posts, [post_to_feed_dict(post) for post in posts]
+
+def medir_tiempo(funcion, engine, n, repeticiones):
+    mejor = float("inf")
+    resultado = None
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        resultado = funcion(engine, n)
+        mejor = min(mejor, time.perf_counter() - inicio)
+        del resultado
+    return mejor
+
+def medir_memoria(funcion, engine, n):
+    """Bytes que siguen vivos al terminar (los objetos cargados) y pico."""
+    gc.collect()
+    tracemalloc.start()
+    objetos, dicts = funcion(engine, n)
+    retenida, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retenida, pico, dicts
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ORM vs modelos de lectura")
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--url", default=None, help="Base existente (por defecto sqlite en memoria)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.url:
+        engine = create_engine(args.url)
+    else:
+        print(f"Generando {args.posts} posts en sqlite en memoria...")
+        engine = crear_base_sintetica(args.posts)
+
+    print("=" * 60)
+    print(f"LECTURA DE {args.posts} POSTS HASTA EL DICT DEL FEED")
+    print("=" * 60)
+    resultados = {}
+    for nombre, funcion in (("ORM", cargar_orm), ("PostRead", cargar_read_model)):
+        segundos = medir_tiempo(funcion, engine, args.posts, args.repeat)
+        retenida, pico, dicts = medir_memoria(funcion, engine, args.posts)
+        resultados[nombre] = (segundos, retenida, dicts)
+        print(f"{nombre:<9} {segundos * 1000:9.1f} ms | {segundos / max(len(dicts), 1) * 1e6:6.2f} µs/post | "
+              f"retenida {retenida / 2**20:7.1f} MiB | pico {pico / 2**20:7.1f} MiB")
+
+    orm, lectura = resultados["ORM"], resultados["PostRead"]
+    print("=" * 60)
+    if orm[2] == lectura[2]:
+        print(f"[OK] Mismos dicts del feed ({len(orm[2])} posts)")
+    else:
+        print("[ERROR] Los dicts del feed no coinciden")
+    print(f"PostRead: {orm[0] / lectura[0]:.1f}x más rápido, "
+          f"{lectura[1] / orm[1] * 100:.0f}% de la memoria retenida por el ORM")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark de subida de fotos de un post: una a una (como antes) vs en
+paralelo con S3Service.upload_photos, sobre el cliente compartido.
+
+Pensado para un S3 local (MinIO, localstack): definir S3_ENDPOINT_URL,
+AWS_S3_BUCKET y credenciales. Al final borra los objetos de prueba y
+comprueba que una subida fallida no deja objetos huérfanos.
+
+Uso: S3_ENDPOINT_URL=http://localhost:9000 AWS_S3_BUCKET=clothesure-dev \\
+     python scripts/benchmark_s3_uploads.py [--photos 6] [--size-kb 2048] [--rounds 5]
+"""
+
+import sys
+import os
+import argparse
+import io
+import time
+import uuid
+
+# Agregar el directorio padre al path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.cloud.s3 import S3Service, S3_BUCKET, S3_ENDPOINT_URL, S3_UPLOAD_WORKERS
+
+class ArchivoPrueba:
+    """Lo mínimo de UploadFile que usa S3Service."""
+
+    def __init__(self, nombre, contenido):
+        self.filename = nombre
+        self.content_type = "image/jpeg"
+        self.file = io.BytesIO(contenido)
+
+def generar_archivos(n, tamano):
+    contenido = os.urandom(tamano)
+    return [ArchivoPrueba(f"foto_{i}.jpg", contenido) for i in range(n)]
+
+def listar(servicio, prefijo):
+    respuesta = servicio.s3.list_objects_v2(Bucket=servicio.bucket_name, Prefix=prefijo)
+    return [obj["Key"] for obj in respuesta.get("Contents", [])]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de subidas a S3")
+    parser.add_argument("--photos", type=int, default=6)
+    parser.add_argument("--size-kb", type=int, default=2048)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    if not S3_BUCKET:
+        print("[ERROR] Falta AWS_S3_BUCKET")
+        return
+
+    servicio = S3Service()
+    prefijo = f"benchmark/{uuid.uuid4().hex}"
+
+    print("=" * 60)
+    print(f"BENCHMARK S3: {args.photos} fotos de {args.size_kb} KB, {args.rounds} rondas")
+    print(f"Endpoint: {S3_ENDPOINT_URL or 'AWS'} | bucket: {S3_BUCKET} | workers: {S3_UPLOAD_WORKERS}")
+    print("=" * 60)
+
+    t_secuencial = t_paralelo = 0.0
+    for ronda in range(args.rounds):
+        archivos = generar_archivos(args.photos, args.size_kb * 1024)
+        inicio = time.perf_counter()
+        for archivo in archivos:
+            servicio.upload_photo(archivo, f"{prefijo}/seq/{ronda}/{archivo.filename}")
+        t_secuencial += time.perf_counter() - inicio
+
+        archivos = generar_archivos(args.photos, args.size_kb * 1024)
+        inicio = time.perf_counter()
+        servicio.upload_photos([(a, f"{prefijo}/par/{ronda}/{a.filename}") for a in archivos])
+        t_paralelo += time.perf_counter() - inicio
+
+    print(f"Secuencial : {t_secuencial / args.rounds * 1000:8.1f} ms por post")
+    print(f"Paralelo   : {t_paralelo / args.rounds * 1000:8.1f} ms por post")
+    print(f"x{t_secuencial / max(t_paralelo, 1e-9):.1f}")
+
+    # Una subida con un archivo ilegible debe limpiar las que sí subieron
+    archivos = generar_archivos(args.photos, 1024)
+    archivos[-1].file.close()
+    try:
+        servicio.upload_photos([(a, f"{prefijo}/fallo/{a.filename}") for a in archivos])
+        print("[ERROR] La subida con un archivo cerrado no falló")
+    except Exception:
+        huerfanos = listar(servicio, f"{prefijo}/fallo/")
+        if huerfanos:
+            print(f"[ERROR] Quedaron {len(huerfanos)} objetos huérfanos")
+        else:
+            print("[OK] Subida fallida sin objetos huérfanos")
+
+    servicio.delete_files(listar(servicio, prefijo))
+    print("[OK] Objetos de prueba eliminados")
+
+if __name__ == "__main__":
+    main()
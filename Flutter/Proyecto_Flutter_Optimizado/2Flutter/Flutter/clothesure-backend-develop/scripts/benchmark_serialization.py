@@ -0,0 +1,105 @@
+"""
+Benchmark de serialización del bus de eventos: JSON vs msgpack con claves
+abreviadas, para el mensaje de reacción (el más frecuente) y para un evento
+grande que supera el umbral de compresión.
+
+Mide bytes por mensaje y el costo de encode/decode tal como lo hacen
+MessagePublisher (encode_message) y MessageConsumer (decode_message), y
+comprueba que cada formato decodifica al mensaje original. No necesita
+RabbitMQ. Para msgpack: pip install msgpack
+
+Uso: python scripts/benchmark_serialization.py [--messages 100000]
+"""
+
+import sys
+import os
+import argparse
+import time
+
+# Agregar el directorio padre al path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.serialization import (
+    SERIALIZERS, JSON_CONTENT_TYPE, MSGPACK_CONTENT_TYPE, MESSAGE_COMPRESS_THRESHOLD,
+    encode_message, decode_message
+)
+
+class Propiedades:
+    """Lo mínimo de pika.BasicProperties que usa decode_message."""
+
+    def __init__(self, content_type, content_encoding):
+        self.content_type = content_type
+        self.content_encoding = content_encoding
+
+def reaccion(i):
+    return {
+        'tipo': 'reaccion',
+        'usuario_id': f"user_{i % 5000}",
+        'outfit_id': f"outfit_{i % 20000}",
+        'accion': 'like' if i % 3 else 'unlike',
+        'timestamp': 1760000000.0 + i,
+        'metadata': {'source': 'socketio', 'timestamp': 1760000000.0 + i, 'likes_count': i % 500}
+    }
+
+def evento_grande(i):
+    return {
+        'tipo': 'persistencia',
+        'evento': 'post_created',
+        'datos': {
+            'post_id': i,
+            'user_id': i % 5000,
+            'description': "Outfit de fin de semana con chaqueta de mezclilla y zapatillas blancas " * 20,
+            'style_tags': ['casual', 'urbano', 'fin_de_semana', 'denim'],
+        },
+        'timestamp': 1760000000.0 + i,
+        'metadata': {'source': 'api'}
+    }
+
+def medir(nombre, serializer, mensajes):
+    inicio = time.perf_counter()
+    codificados = [encode_message(m, serializer) for m in mensajes]
+    t_encode = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    decodificados = [decode_message(body, Propiedades(ct, ce)) for body, ct, ce in codificados]
+    t_decode = time.perf_counter() - inicio
+
+    n = len(mensajes)
+    bytes_medios = sum(len(body) for body, _, _ in codificados) / n
+    comprimidos = sum(1 for _, _, ce in codificados if ce == "zlib")
+    print(f"{nombre:<10} {bytes_medios:8.1f} B/msg | encode {t_encode / n * 1e6:6.2f} µs | "
+          f"decode {t_decode / n * 1e6:6.2f} µs | comprimidos {comprimidos}")
+    return decodificados == mensajes, bytes_medios
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización de mensajes")
+    parser.add_argument("--messages", type=int, default=100000)
+    args = parser.parse_args()
+
+    formatos = [("json", SERIALIZERS[JSON_CONTENT_TYPE])]
+    if MSGPACK_CONTENT_TYPE in SERIALIZERS:
+        formatos.append(("msgpack", SERIALIZERS[MSGPACK_CONTENT_TYPE]))
+
+    casos = [
+        ("REACCIÓN", [reaccion(i) for i in range(args.messages)]),
+        (f"EVENTO GRANDE (> {MESSAGE_COMPRESS_THRESHOLD} B, zlib)", [evento_grande(i) for i in range(args.messages // 10)]),
+    ]
+    for titulo, mensajes in casos:
+        print("=" * 60)
+        print(f"{titulo}: {len(mensajes)} mensajes")
+        print("=" * 60)
+        tamanos = {}
+        for nombre, serializer in formatos:
+            correcto, tamanos[nombre] = medir(nombre, serializer, mensajes)
+            if correcto:
+                print(f"[OK] {nombre}: decodifica al mensaje original")
+            else:
+                print(f"[ERROR] {nombre}: el mensaje decodificado no coincide")
+        if "msgpack" in tamanos:
+            print(f"msgpack ocupa {tamanos['msgpack'] / tamanos['json'] * 100:.0f}% de JSON")
+
+    if len(formatos) == 1:
+        print("[ERROR] Paquete 'msgpack' no instalado: solo se midió JSON")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark de generación de tags: reglas con any(...) (implementación
+anterior) vs KeywordTagger precompilado.
+Genera descripciones sintéticas, verifica que ambos den los mismos tags
+(en textos sin acentos) y compara tiempos.
+
+Uso: python scripts/benchmark_tagging.py [--captions 100000]
+"""
+
+import sys
+import os
+import argparse
+import random
+import time
+
+# Agregar el directorio padre al path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.tagging_service import KEYWORD_RULES, STYLE_RULES, generar_tags_batch
+
+RELLENO = [
+    "look", "con", "para", "el", "la", "mi", "nuevo", "hoy", "outfit", "color", "negro",
+    "blanco", "azul", "ciudad", "paseo", "amigos", "tarde", "fin", "semana", "perfecto",
+]
+
+def generar_tags_anterior(style, ocation):
+    """Implementación anterior: un any(word in ...) por regla."""
+    tags = []
+    if style:
+        style_lower = style.lower()
+        for aliases, style_tags in STYLE_RULES:
+            if style_lower in aliases:
+                tags.extend(style_tags)
+                break
+    if ocation:
+        ocation_lower = ocation.lower()
+        for tag, keywords in KEYWORD_RULES:
+            if any(word in ocation_lower for word in keywords):
+                tags.append(tag)
+    unique_tags = []
+    for tag in tags:
+        if tag not in unique_tags:
+            unique_tags.append(tag)
+    return unique_tags
+
+def generar_posts(n, rng):
+    palabras = [k for _, keywords in KEYWORD_RULES for k in keywords if k.isascii()]
+    estilos = [alias for aliases, _ in STYLE_RULES for alias in aliases if alias.isascii()] + [None, "urbano"]
+    posts = []
+    for _ in range(n):
+        texto = rng.sample(RELLENO, rng.randint(4, 12)) + rng.sample(palabras, rng.randint(0, 3))
+        rng.shuffle(texto)
+        posts.append((rng.choice(estilos), " ".join(texto).capitalize()))
+    return posts
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de generación de tags")
+    parser.add_argument("--captions", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    posts = generar_posts(args.captions, random.Random(args.seed))
+
+    print("=" * 60)
+    print(f"BENCHMARK TAGS: {args.captions} descripciones")
+    print("=" * 60)
+
+    inicio = time.perf_counter()
+    anteriores = [generar_tags_anterior(style, ocation) for style, ocation in posts]
+    t_anterior = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    nuevos = generar_tags_batch(posts)
+    t_nuevo = time.perf_counter() - inicio
+
+    assert anteriores == nuevos, "El matcher precompilado no coincide con las reglas anteriores"
+    print(f"any() por regla : {t_anterior * 1000:9.1f} ms ({t_anterior / len(posts) * 1e6:.1f} us/post)")
+    print(f"KeywordTagger   : {t_nuevo * 1000:9.1f} ms ({t_nuevo / len(posts) * 1e6:.1f} us/post)")
+    print(f"x{t_anterior / max(t_nuevo, 1e-9):.1f}")
+    print("[OK] Tags idénticos en ambos modos")
+
+if __name__ == "__main__":
+    main()
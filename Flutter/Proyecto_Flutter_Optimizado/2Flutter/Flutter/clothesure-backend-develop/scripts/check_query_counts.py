@@ -0,0 +1,243 @@
+"""
+Guarda de regresiones: cuenta las consultas SQL y los commits de los
+endpoints de escritura más comunes y falla si alguno supera su presupuesto.
+
+Cada endpoint se ejecuta como lo haría get_db (una unidad de trabajo por
+petición) llamando directamente a la función del handler, dentro de una
+transacción externa que al final se deshace: no deja datos en la base.
+Los SAVEPOINT de esa transacción externa no se cuentan.
+
+Además comprueba que el commit de la unidad de trabajo ocurra antes de
+enviar la respuesta: que todas las rutas pidan get_db/get_async_db con
+scope="function" y, con una petición ASGI real, que el commit preceda a
+http.response.start.
+
+Uso: python scripts/check_query_counts.py [--verbose]
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import importlib
+import pkgutil
+import uuid
+from contextlib import contextmanager
+
+# Agregar el directorio padre al path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.routing import APIRoute
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+import app.routes
+from app.core.db import engine, get_async_db, get_db, unit_of_work
+from app.dto.user_device_dto import UserDeviceCreate
+from app.dto.user_dto import UserCreate
+from app.routes import user_device_handler, user_handler
+
+# endpoint -> (máximo de consultas, máximo de commits)
+BUDGETS = {
+    "POST /register/": (3, 1),
+    "POST /login/": (3, 1),
+    "POST /password/change": (2, 1),
+    "POST /user-devices/": (1, 1),
+    "POST /logout": (2, 1),
+    "POST /logout_all": (2, 1),
+}
+
+PASSWORD = "clave-de-prueba"
+
+class Cliente:
+    host = "127.0.0.1"
+
+class RequestFalsa:
+    """Lo mínimo de fastapi.Request que usa login_user."""
+    client = Cliente()
+
+class Contador:
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+@contextmanager
+def contar_consultas(conn, session):
+    contador = Contador()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(("SAVEPOINT", "RELEASE", "ROLLBACK")):
+            contador.statements.append(statement)
+
+    def after_commit(session):
+        contador.commits += 1
+
+    event.listen(conn, "before_cursor_execute", before_cursor_execute)
+    event.listen(session, "after_commit", after_commit)
+    try:
+        yield contador
+    finally:
+        event.remove(conn, "before_cursor_execute", before_cursor_execute)
+        event.remove(session, "after_commit", after_commit)
+
+def ejecutar(conn, nombre, handler, verbose):
+    """Ejecuta handler(db) en su propia sesión y unidad de trabajo, como una petición."""
+    session = Session(bind=conn, join_transaction_mode="create_savepoint")
+    try:
+        with contar_consultas(conn, session) as contador:
+            with unit_of_work(session) as db:
+                resultado = handler(db)
+    finally:
+        session.close()
+
+    max_consultas, max_commits = BUDGETS[nombre]
+    consultas = len(contador.statements)
+    ok = consultas <= max_consultas and contador.commits <= max_commits
+    estado = "[OK]" if ok else "[ERROR]"
+    print(f"{estado} {nombre:<24} {consultas} consultas (máx {max_consultas}), "
+          f"{contador.commits} commits (máx {max_commits})")
+    if verbose or not ok:
+        for statement in contador.statements:
+            print("       " + " ".join(statement.split())[:110])
+    return ok, resultado
+
+def dependencias(dependant):
+    for dependencia in dependant.dependencies:
+        yield dependencia
+        yield from dependencias(dependencia)
+
+def revisar_scope_de_sesiones():
+    """Toda ruta que pida una sesión debe hacerlo con scope="function"."""
+    malas = []
+    total = 0
+    for modulo in pkgutil.iter_modules(app.routes.__path__):
+        handler = importlib.import_module(f"app.routes.{modulo.name}")
+        for router in vars(handler).values():
+            if not isinstance(router, APIRouter):
+                continue
+            for ruta in router.routes:
+                if not isinstance(ruta, APIRoute):
+                    continue
+                for dependencia in dependencias(ruta.dependant):
+                    if dependencia.call in (get_db, get_async_db):
+                        total += 1
+                        if dependencia.scope != "function":
+                            malas.append(f"{modulo.name}: {','.join(sorted(ruta.methods))} {ruta.path}")
+
+    ok = not malas
+    estado = "[OK]" if ok else "[ERROR]"
+    print(f"{estado} {total} dependencias de sesión, {len(malas)} sin scope=\"function\"")
+    for ruta in dict.fromkeys(malas):
+        print(f"       {ruta}")
+    return ok
+
+def revisar_commit_antes_de_responder():
+    """Petición ASGI a una ruta con get_db: el commit debe preceder a la respuesta."""
+    orden = []
+    api = FastAPI()
+
+    @api.post("/")
+    def handler(db: Session = Depends(get_db, scope="function")):
+        db.execute(text("SELECT 1"))
+        orden.append("handler")
+        return {"ok": True}
+
+    def registrar_commit(session):
+        orden.append("commit")
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(mensaje):
+        orden.append(mensaje["type"])
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/", "raw_path": b"/", "root_path": "", "query_string": b"",
+        "headers": [], "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 80),
+    }
+    event.listen(Session, "after_commit", registrar_commit)
+    try:
+        asyncio.run(api(scope, receive, send))
+    finally:
+        event.remove(Session, "after_commit", registrar_commit)
+
+    ok = (
+        "commit" in orden and "http.response.start" in orden
+        and orden.index("commit") < orden.index("http.response.start")
+    )
+    estado = "[OK]" if ok else "[ERROR]"
+    print(f"{estado} Orden de la petición: {' -> '.join(orden)}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Presupuesto de consultas por endpoint")
+    parser.add_argument("--verbose", action="store_true", help="Muestra todas las consultas")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("COMMIT ANTES DE LA RESPUESTA")
+    print("=" * 60)
+    commit_ok = revisar_scope_de_sesiones() & revisar_commit_antes_de_responder()
+
+    print("=" * 60)
+    print("CONSULTAS POR ENDPOINT (unidad de trabajo por petición)")
+    print("=" * 60)
+
+    conn = engine.connect()
+    transaccion = conn.begin()
+    resultados = []
+    try:
+        email = f"query-guard-{uuid.uuid4().hex[:12]}@example.com"
+        datos = UserCreate(username="query-guard", email=email, password=PASSWORD)
+
+        ok, user_id = ejecutar(conn, "POST /register/", lambda db: user_handler.register_user(datos, db).user_id, args.verbose)
+        resultados.append(ok)
+
+        ok, login = ejecutar(conn, "POST /login/", lambda db: user_handler.login_user(
+            RequestFalsa(), email=email, password=PASSWORD, fcm_token="query-guard-token",
+            device_type="test", device_name=None, device_os=None, browser=None, db=db
+        ), args.verbose)
+        resultados.append(ok)
+
+        actual = Session(bind=conn, join_transaction_mode="create_savepoint")
+        current_user = actual.get(user_handler.User, user_id)  # Lo que deja get_current_user
+        actual.close()
+
+        ok, _ = ejecutar(conn, "POST /password/change", lambda db: user_handler.change_password(
+            old_password=PASSWORD, new_password=PASSWORD + "-2", db=db, current_user=current_user
+        ), args.verbose)
+        resultados.append(ok)
+
+        dispositivo = UserDeviceCreate(user_id=user_id, fcm_token="query-guard-token-2", device_type="test")
+        ok, _ = ejecutar(conn, "POST /user-devices/", lambda db: user_device_handler.create_user_device(
+            dispositivo, db=db, current_user=current_user
+        ), args.verbose)
+        resultados.append(ok)
+
+        ok, _ = ejecutar(conn, "POST /logout", lambda db: user_handler.logout(
+            session_token=login["session_token"], db=db
+        ), args.verbose)
+        resultados.append(ok)
+
+        ok, _ = ejecutar(conn, "POST /logout_all", lambda db: user_handler.logout_all(
+            token=login["access_token"], db=db
+        ), args.verbose)
+        resultados.append(ok)
+    finally:
+        transaccion.rollback()
+        conn.close()
+
+    print("=" * 60)
+    if all(resultados):
+        print(f"[OK] {len(resultados)} endpoints dentro del presupuesto")
+    else:
+        print(f"[ERROR] {resultados.count(False)} endpoints superan su presupuesto")
+    if not commit_ok:
+        print("[ERROR] El commit de la unidad de trabajo ocurre después de enviar la respuesta")
+    if not all(resultados) or not commit_ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Crea la tabla outbox (y su índice parcial de pendientes) si no existe. En
+una tabla ya creada añade las columnas de reintentos (next_attempt_at,
+dead_at) que usa el relay; hay que ejecutarlo antes de desplegar el worker.
+
+Uso: python scripts/create_outbox_table.py
+"""
+
+import sys
+import os
+
+# Agregar el directorio padre al path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.core.db import engine
+from app.models.outbox_model import OutboxEvent
+
+def main():
+    print("=" * 60)
+    print("TABLA OUTBOX")
+    print("=" * 60)
+    OutboxEvent.__table__.create(engine, checkfirst=True)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            for columna in ("next_attempt_at", "dead_at"):
+                conn.execute(text(f"ALTER TABLE outbox ADD COLUMN IF NOT EXISTS {columna} TIMESTAMP"))
+    print("[OK] Tabla 'outbox' lista")
+
+if __name__ == "__main__":
+    main()
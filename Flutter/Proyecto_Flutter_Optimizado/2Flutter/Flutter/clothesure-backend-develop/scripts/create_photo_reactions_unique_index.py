@@ -0,0 +1,70 @@
+"""
+Crea el índice único uq_photo_reactions_photo_user_type sobre
+photo_reactions (photo_id, user_id, reaction_type_id), en el que se apoya el
+INSERT ... ON CONFLICT DO NOTHING del EngagementSink.
+
+Antes borra las reacciones duplicadas (se queda con la más antigua) y
+recalcula reactions_count de las fotos afectadas. El índice se crea con
+CONCURRENTLY para no bloquear las escrituras; si la creación se interrumpe
+queda INVALID y hay que borrarlo (DROP INDEX) y volver a ejecutar el script.
+
+Uso: python scripts/create_photo_reactions_unique_index.py
+"""
+
+import sys
+import os
+
+# Agregar el directorio padre al path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.core.db import engine
+
+INDEX_NAME = "uq_photo_reactions_photo_user_type"
+
+def borrar_duplicados(conn):
+    photo_ids = conn.execute(text("""
+        DELETE FROM photo_reactions r
+        USING photo_reactions keep
+        WHERE r.photo_id = keep.photo_id
+          AND r.user_id = keep.user_id
+          AND r.reaction_type_id = keep.reaction_type_id
+          AND r.id > keep.id
+        RETURNING r.photo_id
+    """)).scalars().all()
+    if photo_ids:
+        conn.execute(text("""
+            UPDATE photos p
+            SET reactions_count = (SELECT count(*) FROM photo_reactions r WHERE r.photo_id = p.id)
+            WHERE p.id = ANY(:photo_ids)
+        """), {"photo_ids": sorted(set(photo_ids))})
+    return len(photo_ids), len(set(photo_ids))
+
+def main():
+    print("=" * 60)
+    print("ÍNDICE ÚNICO DE photo_reactions")
+    print("=" * 60)
+
+    with engine.begin() as conn:
+        borradas, fotos = borrar_duplicados(conn)
+    print(f"[OK] {borradas} reacciones duplicadas borradas, reactions_count recalculado en {fotos} fotos")
+
+    # CREATE INDEX CONCURRENTLY no puede ir dentro de una transacción
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(
+            f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} "
+            "ON photo_reactions (photo_id, user_id, reaction_type_id)"
+        ))
+        valido = conn.execute(text(
+            "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"
+        ), {"name": INDEX_NAME}).scalar()
+
+    if valido:
+        print(f"[OK] Índice '{INDEX_NAME}' listo")
+    else:
+        print(f"[ERROR] El índice '{INDEX_NAME}' quedó INVALID: DROP INDEX {INDEX_NAME}; y vuelve a ejecutar el script")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Crea el índice ix_posts_created_at_id sobre posts (created_at, id) que usa la
+paginación por cursor del feed cronológico (declarado en Post.__table_args__).
+
+Se crea con CONCURRENTLY para no bloquear las escrituras en posts; si la
+creación se interrumpe queda INVALID y hay que borrarlo (DROP INDEX) y
+volver a ejecutar el script.
+
+Uso: python scripts/create_posts_keyset_index.py
+"""
+
+import sys
+import os
+
+# Agregar el directorio padre al path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.core.db import engine
+
+INDEX_NAME = "ix_posts_created_at_id"
+
+def main():
+    print("=" * 60)
+    print("ÍNDICE DE PAGINACIÓN DE posts")
+    print("=" * 60)
+
+    # CREATE INDEX CONCURRENTLY no puede ir dentro de una transacción
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} ON posts (created_at, id)"))
+        valido = conn.execute(text(
+            "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"
+        ), {"name": INDEX_NAME}).scalar()
+
+    if valido:
+        print(f"[OK] Índice '{INDEX_NAME}' listo")
+    else:
+        print(f"[ERROR] El índice '{INDEX_NAME}' quedó INVALID: DROP INDEX {INDEX_NAME}; y vuelve a ejecutar el script")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Prueba de carga de las lecturas calientes en modo sync vs async (DB_ASYNC).
+
+Con --spawn levanta uvicorn dos veces contra la base de datos de
+DATABASE_URL (primero DB_ASYNC=false, luego DB_ASYNC=true), lanza la misma
+carga contra cada uno y compara throughput y latencias. Sin --spawn mide un
+servidor ya levantado en --url.
+
+Requiere httpx (pip install httpx).
+
+Uso: python scripts/load_test_async.py --spawn [--user-id 1] [--concurrency 200] [--requests 5000]
+     python scripts/load_test_async.py --url http://localhost:8000 --token <jwt>
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import statistics
+import subprocess
+import time
+
+# Agregar el directorio padre al path para importar app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PATHS = [
+    "/posts/feed/for-you?limit=20",
+    "/posts/test-schema?limit=20",
+]
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+async def ejecutar_carga(url, token, paths, concurrencia, total):
+    import httpx
+
+    latencias = []
+    errores = 0
+    pendientes = iter(range(total))
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+
+    async with httpx.AsyncClient(base_url=url, headers={"Authorization": f"Bearer {token}"},
+                                 limits=limites, timeout=60) as cliente:
+        async def trabajador():
+            nonlocal errores
+            for i in pendientes:
+                inicio = time.perf_counter()
+                try:
+                    respuesta = await cliente.get(paths[i % len(paths)])
+                    if respuesta.status_code >= 400:
+                        errores += 1
+                except httpx.HTTPError:
+                    errores += 1
+                latencias.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+        duracion = time.perf_counter() - inicio
+
+    return {
+        "rps": total / duracion,
+        "p50": percentil(latencias, 0.50) * 1000,
+        "p95": percentil(latencias, 0.95) * 1000,
+        "p99": percentil(latencias, 0.99) * 1000,
+        "media": statistics.mean(latencias) * 1000 if latencias else 0.0,
+        "errores": errores,
+    }
+
+def imprimir(nombre, r):
+    print(f"{nombre:<6} | {r['rps']:8.1f} req/s | p50 {r['p50']:7.1f} ms | p95 {r['p95']:7.1f} ms "
+          f"| p99 {r['p99']:7.1f} ms | errores {r['errores']}")
+
+def esperar_servidor(url, segundos=30):
+    import httpx
+
+    limite = time.time() + segundos
+    while time.time() < limite:
+        try:
+            httpx.get(f"{url}/docs", timeout=1)
+            return True
+        except httpx.HTTPError:
+            time.sleep(0.3)
+    return False
+
+def medir_modo(modo_async, args, token):
+    url = f"http://127.0.0.1:{args.port}"
+    entorno = dict(os.environ, DB_ASYNC="true" if modo_async else "false")
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=BASE_DIR, env=entorno
+    )
+    try:
+        if not esperar_servidor(url):
+            raise RuntimeError("El servidor no respondió a tiempo")
+        # Calentamiento: construye el índice de tags y llena el pool
+        asyncio.run(ejecutar_carga(url, token, args.paths, 10, 50))
+        return asyncio.run(ejecutar_carga(url, token, args.paths, args.concurrency, args.requests))
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga sync vs async")
+    parser.add_argument("--spawn", action="store_true", help="Levanta uvicorn en ambos modos y compara")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--port", type=int, default=8077)
+    parser.add_argument("--token", help="JWT a usar (por defecto se genera para --user-id)")
+    parser.add_argument("--user-id", default="1")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+    args = parser.parse_args()
+
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        print("[ERROR] Falta httpx: pip install httpx")
+        return
+
+    token = args.token
+    if not token:
+        from app.security.jwt import create_access_token
+        token = create_access_token(data={"sub": str(args.user_id)})
+
+    print("=" * 60)
+    print(f"PRUEBA DE CARGA: {args.requests} requests, concurrencia {args.concurrency}")
+    print("=" * 60)
+
+    if args.spawn:
+        imprimir("sync", medir_modo(False, args, token))
+        imprimir("async", medir_modo(True, args, token))
+    else:
+        imprimir("server", asyncio.run(ejecutar_carga(args.url, token, args.paths, args.concurrency, args.requests)))
+
+if __name__ == "__main__":
+    main()
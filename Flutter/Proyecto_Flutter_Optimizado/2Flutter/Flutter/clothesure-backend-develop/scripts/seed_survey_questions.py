@@ -15,6 +15,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.core.db import get_db
 from app.models.preference_questions_model import PreferenceQuestion
 from app.models.preference_options_model import PreferenceOption
+from app.repositories.preference_questions_repository import PreferenceQuestionsRepository
+from app.repositories.preference_options_repository import PreferenceOptionsRepository
+from app.services.survey_catalog import SURVEY_CATALOG_CHECK_INTERVAL
 
 # Las 8 preguntas de la encuesta
 SURVEY_QUESTIONS = [
@@ -135,43 +138,47 @@ def seed_questions():
     db = next(get_db())
     
     try:
-        questions_created = 0
-        options_created = 0
-        
-        for q_data in SURVEY_QUESTIONS:
-            # Verificar si ya existe
-            existing = db.query(PreferenceQuestion).filter_by(
-                order=q_data["order"]
-            ).first()
-            
-            if existing:
-                print(f"⏭️  Pregunta {q_data['order']} ya existe, saltando...")
-                continue
-            
-            # Crear pregunta
-            question = PreferenceQuestion(
-                question_text=q_data["question_text"],
-                question_type=q_data["question_type"],
-                order=q_data["order"],
-                max_selections=q_data.get("max_selections"),
-                has_illustrations=q_data.get("has_illustrations", False),
-                has_color_circles=q_data.get("has_color_circles", False)
-            )
-            db.add(question)
-            db.flush()  # Para obtener el ID
-            
-            # Crear opciones
-            for opt_data in q_data["options"]:
-                option = PreferenceOption(
-                    question_id=question.id,
-                    text=opt_data["text"],
-                    value=opt_data["value"],
-                    requires_text=opt_data.get("requires_text", False)
-                )
-                db.add(option)
-                options_created += 1
-            
-            questions_created += 1
+        questions_repo = PreferenceQuestionsRepository(db)
+        options_repo = PreferenceOptionsRepository(db)
+
+        # Verificar cuáles ya existen (una sola consulta)
+        existing_orders = {q.order for q in questions_repo.get_many(
+            [q_data["order"] for q_data in SURVEY_QUESTIONS], PreferenceQuestion.order
+        )}
+        for order in sorted(existing_orders):
+            print(f"⏭️  Pregunta {order} ya existe, saltando...")
+        pending = [q_data for q_data in SURVEY_QUESTIONS if q_data["order"] not in existing_orders]
+
+        # Crear preguntas: un INSERT ... RETURNING devuelve los IDs
+        questions = questions_repo.bulk_create([
+            {
+                "question_text": q_data["question_text"],
+                "question_type": q_data["question_type"],
+                "order": q_data["order"],
+                "max_selections": q_data.get("max_selections"),
+                "has_illustrations": q_data.get("has_illustrations", False),
+                "has_color_circles": q_data.get("has_color_circles", False)
+            }
+            for q_data in pending
+        ], commit=False)
+        question_ids = {question.order: question.id for question in questions}
+
+        # Crear opciones de todas las preguntas en un solo INSERT
+        options = [
+            {
+                "question_id": question_ids[q_data["order"]],
+                "text": opt_data["text"],
+                "value": opt_data["value"],
+                "requires_text": opt_data.get("requires_text", False)
+            }
+            for q_data in pending
+            for opt_data in q_data["options"]
+        ]
+        options_repo.bulk_create(options, returning=False, commit=False)
+
+        questions_created = len(questions)
+        options_created = len(options)
+        for q_data in pending:
             print(f"✅ Pregunta {q_data['order']}: '{q_data['question_text'][:50]}...' creada")
         
         db.commit()
@@ -180,6 +187,7 @@ def seed_questions():
         print("=" * 60)
         print(f"📊 Preguntas creadas: {questions_created}")
         print(f"📊 Opciones creadas: {options_created}")
+        print(f"🔄 Las APIs en marcha recargan el catálogo en <= {SURVEY_CATALOG_CHECK_INTERVAL:.0f} s")
         print("=" * 60)
         
     except Exception as e:
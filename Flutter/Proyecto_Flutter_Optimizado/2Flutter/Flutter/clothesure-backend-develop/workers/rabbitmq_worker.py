@@ -1,35 +1,92 @@
+import argparse
 import time
 import logging
 from app.core.connection import RabbitMQConnection
-from app.services.consumer import MessageConsumer
+from app.services.consumer import (
+    MessageConsumer, CONSUMER_PREFETCH, CONSUMER_WORKERS, CONSUMER_ACK_BATCH, CONSUMER_ACK_INTERVAL,
+    CONSUMER_BATCH_SIZE, CONSUMER_BATCH_WAIT
+)
 from app.services.publisher import MessagePublisher
+from app.services.engagement_sink import ENGAGEMENT_EVENTS, EngagementSink
+from app.services.tagging_service import POST_TAG_EVENTS, handle_post_tags_event
+from app.services.outbox_service import OutboxRelay, OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL
 from app.core.config import RabbitMQConfig, LoggingConfig
 
 # Configurar logging
 LoggingConfig.setup_logging(level='INFO')
 logger = logging.getLogger(__name__)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Worker de RabbitMQ: consumidores y relay del outbox")
+    parser.add_argument("--no-outbox-relay", action="store_true",
+                        help="No publicar los eventos de la tabla outbox desde este proceso")
+    parser.add_argument("--outbox-batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+    parser.add_argument("--outbox-poll-interval", type=float, default=OUTBOX_POLL_INTERVAL)
+    parser.add_argument("--prefetch", type=int, default=CONSUMER_PREFETCH,
+                        help="Mensajes sin confirmar por cola (basic_qos)")
+    parser.add_argument("--workers", type=int, default=CONSUMER_WORKERS,
+                        help="Hilos que procesan mensajes; 1 = en el hilo de la conexión")
+    parser.add_argument("--ack-batch", type=int, default=CONSUMER_ACK_BATCH,
+                        help="Mensajes confirmados por cada basic_ack con multiple=True")
+    parser.add_argument("--ack-interval", type=float, default=CONSUMER_ACK_INTERVAL,
+                        help="Segundos máximos que un ack espera a completar su lote")
+    parser.add_argument("--batch-size", type=int, default=CONSUMER_BATCH_SIZE,
+                        help="Eventos de persistencia por micro-lote")
+    parser.add_argument("--batch-wait", type=float, default=CONSUMER_BATCH_WAIT,
+                        help="Segundos máximos para completar un micro-lote")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+
     # Crear conexión a RabbitMQ
     rabbit_conn = RabbitMQConnection(url=RabbitMQConfig.get_config()['url'])
-    consumer = MessageConsumer(rabbit_conn)
+    consumer = MessageConsumer(
+        rabbit_conn,
+        prefetch_count=max(args.prefetch, args.workers),  # Con menos prefetch sobran workers
+        workers=args.workers,
+        ack_batch_size=args.ack_batch,
+        ack_interval=args.ack_interval
+    )
     publisher = MessagePublisher(rabbit_conn)  # Opcional, si necesitas republicar
 
+    # Generación de style_tags fuera del request de la API
+    for event_type in POST_TAG_EVENTS:
+        consumer.register_persistence_handler(event_type, handle_post_tags_event)
+    # Vistas, reacciones y comentarios: se acumulan y se escriben en cada flush del sink
+    engagement_sink = EngagementSink()
+    consumer.register_persistence_batch_handler(ENGAGEMENT_EVENTS, engagement_sink)
+
     # Conectar y arrancar consumidores
     if rabbit_conn.connect():
-        consumer.start_all_consuming()
+        consumer.start_all_consuming(batch_size=args.batch_size, batch_wait=args.batch_wait)
         logger.info("🚀 Consumidores iniciados, escuchando colas...")
     else:
         logger.error("❌ No se pudo conectar a RabbitMQ. Saliendo...")
         return
 
+    # Relay del outbox con su propia conexión (SKIP LOCKED permite varios workers)
+    relay = None
+    if not args.no_outbox_relay:
+        relay = OutboxRelay(
+            RabbitMQConnection(url=RabbitMQConfig.get_config()['url']),
+            batch_size=args.outbox_batch_size,
+            poll_interval=args.outbox_poll_interval
+        )
+        relay.start()
+
     # Mantener el proceso vivo
     try:
         while True:
             time.sleep(3600)  # Mantener hilo principal vivo
     except KeyboardInterrupt:
         logger.info("👋 Deteniendo consumidores...")
+        if relay:
+            relay.stop()
         consumer.stop_all_consuming()
+        # El último flush resuelve los lotes pendientes y el consumidor los confirma
+        engagement_sink.close()
+        consumer.join()
         rabbit_conn.disconnect()
         logger.info("🛑 Worker detenido")
 